@@ -0,0 +1,47 @@
+"""
+Compare the per-turn agent setup cost with a cold and a warm agent cache.
+
+Cold mirrors what `Bot.answer` used to do on every message: build the Google
+client, provider, model and agent, then render the system prompt. Warm is a
+cache hit plus the per-run system prompt render.
+
+    uv run benchmarks/agent_setup.py
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from chat.agents import clear_agents, get_agent  # noqa: E402
+from chat.clients import create_google_client  # noqa: E402
+from chat.tools.toolset import main_toolset  # noqa: E402
+from prompts.system_prompt import SystemPromptParams, get_system_prompt  # noqa: E402
+
+API_KEY = "benchmark-key"
+NUMBER = 200
+
+
+def cold() -> None:
+    clear_agents()
+    create_google_client.cache_clear()
+    _ = get_agent(main_toolset, api_key=API_KEY)
+    _ = get_system_prompt(SystemPromptParams())
+
+
+def warm() -> None:
+    _ = get_agent(main_toolset, api_key=API_KEY)
+    _ = get_system_prompt(SystemPromptParams())
+
+
+def main() -> None:
+    warm()
+
+    for name, func in (("cold", cold), ("warm", warm)):
+        best = min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER
+        print(f"{name}: {best * 1e6:10.1f} µs per answer() setup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Measure the semantic answer cache on first questions, run offline against
+the fake Gemini model and the fake BigQuery client.
+
+Each conversation asks one question, picked at random from `FAQ` with
+Zipf-like weights, in a new conversation so it can be cached. Every answer
+calls `query_rag` first. Turns are run without the cache and with it at
+`--threshold`. Reported are the hit rate, the latency of a turn and the
+seconds the hits saved.
+
+    uv run benchmarks/answer_cache.py --turns 100 --threshold 0.9
+"""
+
+import argparse
+import asyncio
+from contextlib import redirect_stdout
+import io
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from pydantic_ai.messages import UserPromptPart  # noqa: E402
+
+from chat.answer_cache import get_answer_cache  # noqa: E402
+from fakes.backend import FakeBackend  # noqa: E402
+from fakes.model import fake_model, query_rag_call  # noqa: E402
+
+FAQ = [
+    "¿Qué cursos electivos puedo hacer en Ithaka?",
+    "¿Qué cursos electivos puedo hacer en ithaka",
+    "¿Cómo postulo mi proyecto a la incubadora?",
+    "¿Quiénes pueden postular a la incubadora?",
+    "¿Qué mentorías ofrece Ithaka?",
+    "¿Cuándo son los talleres de validación de ideas?",
+    "¿Qué financia el fondo semilla?",
+    "¿Cómo consulto por becas y convocatorias?",
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    _ = parser.add_argument("--turns", type=int, default=100)
+    _ = parser.add_argument("--threshold", type=float, default=0.9)
+    _ = parser.add_argument("--first-token-ms", type=float, default=300)
+    _ = parser.add_argument("--tokens-per-second", type=float, default=200)
+    _ = parser.add_argument("--bq-ms", type=float, default=50)
+    _ = parser.add_argument("--embedding-ms", type=float, default=30)
+    _ = parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+async def measure(name: str, args: argparse.Namespace, **variables: str) -> None:
+    questions = random.Random(args.seed).choices(
+        FAQ, weights=[1 / rank for rank in range(1, len(FAQ) + 1)], k=args.turns
+    )
+    model = fake_model(
+        first_token_delay=args.first_token_ms / 1000,
+        tokens_per_second=args.tokens_per_second,
+        tool_calls=[query_rag_call("¿Qué ofrece Ithaka?")],
+    )
+    totals = list[float]()
+
+    with tempfile.TemporaryDirectory() as directory:
+        backend = FakeBackend.create(
+            Path(directory),
+            bq_latency=args.bq_ms / 1000,
+            embedding_latency=args.embedding_ms / 1000,
+            **variables,
+        )
+
+        with backend.model(model), redirect_stdout(io.StringIO()):
+            for question in questions:
+                bot = await backend.bot()
+                start = time.perf_counter()
+
+                async for _ in bot.answer(UserPromptPart([question])):
+                    pass
+
+                totals.append(time.perf_counter() - start)
+
+    line = (
+        f"{name:>8}: turn p50 {statistics.median(totals) * 1e3:7.1f} ms, "
+        f"mean {statistics.fmean(totals) * 1e3:7.1f} ms"
+    )
+
+    if backend.environment.answer_cache_threshold is not None:
+        stats = get_answer_cache(
+            backend.environment.answer_cache_threshold,
+            backend.environment.answer_cache_entries,
+            backend.environment.answer_cache_ttl,
+        ).stats
+        line += f" | hit rate {stats.hit_rate:5.1%}, saved {stats.saved_seconds:6.1f} s"
+
+    print(line)
+
+
+async def main() -> None:
+    args = parse_args()
+
+    await measure("no cache", args)
+    await measure("cache", args, ANSWER_CACHE_THRESHOLD=str(args.threshold))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Compare the cost of streaming a ~4k token answer from the model to Gradio
+with full snapshots and with coalesced deltas: answers built, text bytes they
+carry, bytes handed to Gradio and peak traced memory.
+
+The model is a `FunctionModel` streaming one token at a time, pausing now and
+then like a real model does. The answers are built the same way `Bot.answer`
+builds them and go through the bridge's `render_answers`.
+
+    uv run benchmarks/answer_streaming.py
+"""
+
+import asyncio
+from collections.abc import AsyncIterator
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from pydantic_ai import Agent  # noqa: E402
+from pydantic_ai.messages import ModelMessage  # noqa: E402
+from pydantic_ai.models.function import AgentInfo, FunctionModel  # noqa: E402
+
+from chat.streaming import coalesce  # noqa: E402
+from chat.types import Answer, TextAnswer, TextDelta  # noqa: E402
+from ui.bridge import render_answers  # noqa: E402
+
+TOKENS = 4000
+TOKENS_PER_PAUSE = 16
+INTERVAL = 0.05
+MAX_CHARS = 256
+
+
+async def stream_tokens(_messages: list[ModelMessage], _info: AgentInfo) -> AsyncIterator[str]:
+    for index in range(TOKENS):
+        if index % TOKENS_PER_PAUSE == 0:
+            await asyncio.sleep(0.001)
+
+        yield f"tok{index % 100:02d} "
+
+
+agent = Agent(FunctionModel(stream_function=stream_tokens))
+
+
+async def full(debounce_by: float | None) -> AsyncIterator[Answer]:
+    async with agent.run_stream("Hello") as response:
+        async for text in response.stream(debounce_by=debounce_by):
+            yield Answer(content=TextAnswer(text=text))
+
+
+async def delta() -> AsyncIterator[Answer]:
+    async with agent.run_stream("Hello") as response:
+        deltas = response.stream_text(delta=True, debounce_by=None)
+
+        async for text in coalesce(deltas, interval=INTERVAL, max_chars=MAX_CHARS):
+            yield Answer(content=TextDelta(text=text))
+
+
+async def measure(name: str, answers: AsyncIterator[Answer]) -> None:
+    count = 0
+    answer_bytes = 0
+
+    async def counted() -> AsyncIterator[Answer]:
+        nonlocal count, answer_bytes
+
+        async for answer in answers:
+            count += 1
+            if isinstance(answer.content, TextAnswer | TextDelta):
+                answer_bytes += len(answer.content.text)
+
+            yield answer
+
+    updates = 0
+    ui_bytes = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    async for renderable in render_answers(counted()):
+        if isinstance(renderable, str):
+            updates += 1
+            ui_bytes += len(renderable)
+
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{name:>16}: {count:5} answers, {answer_bytes / 1e6:7.2f} MB in answers, "
+        f"{updates:5} UI updates, {ui_bytes / 1e6:7.2f} MB to Gradio, "
+        f"{peak / 1e3:8.1f} kB peak, {seconds:.2f}s"
+    )
+
+
+async def main() -> None:
+    await measure("full, per token", full(None))
+    await measure(f"full, {INTERVAL * 1000:.0f} ms", full(INTERVAL))
+    await measure("delta", delta())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
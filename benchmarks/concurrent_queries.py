@@ -0,0 +1,81 @@
+"""
+Show that a slow BigQuery call no longer stalls other sessions' streams.
+
+Several fake token streams run on the event loop while RAG-like vector
+searches hit a fake client that takes `QUERY_SECONDS` to answer. The report
+is the longest pause between two tokens of any stream, first with the client
+called directly on the loop (as before) and then through `AsyncQueryRunner`.
+
+    uv run benchmarks/concurrent_queries.py
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from repository.async_query import AsyncQueryRunner  # noqa: E402
+
+STREAMS = 8
+TOKENS = 100
+TOKEN_INTERVAL = 0.01
+QUERIES = 4
+QUERY_SECONDS = 0.5
+
+
+class SlowJob:
+    total_bytes_processed = 0
+
+    def result(self, timeout: float | None = None, page_size: int | None = None) -> list[object]:
+        time.sleep(QUERY_SECONDS)
+        return []
+
+
+class SlowClient:
+    def query(self, query: str, job_config: object = None) -> SlowJob:
+        return SlowJob()
+
+
+async def stream() -> float:
+    longest = 0.0
+    last = time.perf_counter()
+
+    for _ in range(TOKENS):
+        await asyncio.sleep(TOKEN_INTERVAL)
+        now = time.perf_counter()
+        longest = max(longest, now - last)
+        last = now
+
+    return longest
+
+
+async def blocking_search(client: SlowClient) -> None:
+    _ = list(client.query("SELECT 1").result())
+
+
+async def pooled_search(runner: AsyncQueryRunner, client: SlowClient) -> None:
+    _ = await runner.query(client, "SELECT 1")  # pyright: ignore[reportArgumentType]
+
+
+async def measure(name: str, search: Callable[[], Awaitable[None]]) -> None:
+    streams = [asyncio.create_task(stream()) for _ in range(STREAMS)]
+    await asyncio.sleep(TOKEN_INTERVAL * 5)
+    _ = await asyncio.gather(*(search() for _ in range(QUERIES)))
+    longest = max(await asyncio.gather(*streams))
+
+    print(f"{name:>9}: longest pause between tokens {longest * 1e3:7.1f} ms")
+
+
+async def main() -> None:
+    client = SlowClient()
+    runner = AsyncQueryRunner(max_concurrency=QUERIES, timeout=10)
+
+    await measure("blocking", lambda: blocking_search(client))
+    await measure("pooled", lambda: pooled_search(runner, client))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""
+Measure bulk form imports and exports, and the memory they take, against
+the SQLite form store or the fake BigQuery client.
+
+For each size, a CSV of that many generated forms (one in `--invalid-every`
+of them invalid) is imported and then exported to CSV. Reported are the
+throughput of both, and the peak memory traced while they run: it should
+stay about the same as the size grows. Not with `--store bigquery`, whose
+fake client reads whole load files and query results into memory.
+
+    uv run benchmarks/form_bulk.py --rows 10000 100000 --store sqlite
+"""
+
+import argparse
+import csv
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fakes.bigquery import FakeBigQueryClient  # noqa: E402
+from forms.bulk import LIST_FIELDS, export_forms, import_forms  # noqa: E402
+from forms.store import BigQueryFormBackend, FormStore, SQLiteFormBackend  # noqa: E402
+from repository.form import FormRepository  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    _ = parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    _ = parser.add_argument("--store", choices=["sqlite", "bigquery"], default="sqlite")
+    _ = parser.add_argument("--invalid-every", type=int, default=100)
+    return parser.parse_args()
+
+
+def write_forms(path: Path, rows: int, invalid_every: int) -> None:
+    with path.open("w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(
+            file,
+            [
+                "name",
+                "idea",
+                "sponsor",
+                "date_of_completion",
+                "ucu_community_members",
+                "stage",
+                "profile_type",
+                "potential_support",
+                "follow_up_personnel",
+                "internal_comments",
+                "message_for_applicant",
+            ],
+        )
+        writer.writeheader()
+
+        for index in range(rows):
+            row = {
+                "name": f"Evaluador {index % 50}",
+                "idea": f"Idea {index}",
+                "sponsor": f"Sponsor {index % 20}",
+                "date_of_completion": f"2025-{1 + index % 12:02}-{1 + index % 28:02}",
+                "ucu_community_members": ["Alumno/a", None],
+                "stage": ["Ideación" if index % invalid_every else "Otra", None],
+                "profile_type": ["Impacto Social"],
+                "potential_support": ["Valida Lab UCU", "Actividades de Networking"],
+                "follow_up_personnel": ["No", None],
+                "internal_comments": "Comentarios del comité, con comas y\nsaltos de línea.",
+                "message_for_applicant": "Gracias por postularte.",
+            }
+
+            for name in LIST_FIELDS & row.keys():
+                row[name] = json.dumps(row[name], ensure_ascii=False)
+
+            writer.writerow(row)
+
+
+def create_store(kind: str, directory: Path) -> FormStore:
+    match kind:
+        case "sqlite":
+            return FormStore(SQLiteFormBackend(directory / "forms.sqlite3"))
+        case _:
+            client = FakeBigQueryClient.for_dataset("fake", "ithaka")
+            return FormStore(BigQueryFormBackend(FormRepository(client, "fake", "ithaka")))
+
+
+def main() -> None:
+    args = parse_args()
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as name:
+            directory = Path(name)
+            store = create_store(args.store, directory)
+            write_forms(directory / "forms.csv", rows, args.invalid_every)
+
+            tracemalloc.start()
+            report = import_forms(store, directory / "forms.csv")
+            _, import_peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+
+            start = time.perf_counter()
+            exported = export_forms(store, directory / "export.csv")
+            export_seconds = time.perf_counter() - start
+            _, export_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(
+                f"{rows:7} rows: import {report.rows_per_second:8.0f} rows/s "
+                f"({report.failed} invalid), peak {import_peak / 2**20:6.1f} MiB | "
+                f"export {exported / export_seconds:8.0f} rows/s, "
+                f"peak {export_peak / 2**20:6.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Show how turns slow down as one conversation grows, run offline against the
+fake Gemini model and the fake BigQuery client.
+
+One `Bot` answers `--turns` turns of the same conversation. Every
+`--every` turns it reports the time to build the history, the whole turn,
+the estimated prompt tokens sent and saved by the `HISTORY` strategy, and
+the time to load the conversation again from BigQuery, as a new session of
+it would.
+
+    uv run benchmarks/history_growth.py --turns 200 --every 25
+"""
+
+import argparse
+import asyncio
+from contextlib import redirect_stdout
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import get_args
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from pydantic_ai.messages import ModelMessage, UserPromptPart  # noqa: E402
+
+from chat.bot import Bot  # noqa: E402
+from chat.clients import create_bq_writer  # noqa: E402
+from chat.history import HistoryManager  # noqa: E402
+from chat.tools.toolset import main_toolset  # noqa: E402
+from env import HistoryTag  # noqa: E402
+from fakes.backend import FakeBackend  # noqa: E402
+from fakes.model import fake_model  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    _ = parser.add_argument("--turns", type=int, default=200)
+    _ = parser.add_argument("--every", type=int, default=25)
+    _ = parser.add_argument("--history", choices=get_args(HistoryTag), default="tokens")
+    _ = parser.add_argument("--bq-ms", type=float, default=0)
+    return parser.parse_args()
+
+
+async def fake_summarizer(summary: str | None, messages: list[ModelMessage]) -> str:
+    return (summary or "") + f" {len(messages)} more messages about Ithaka."
+
+
+async def main() -> None:
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        backend = FakeBackend.create(
+            Path(directory), bq_latency=args.bq_ms / 1000, HISTORY=args.history
+        )
+        environment = backend.session_environment()
+        factory = backend.factory()
+        deps = await factory.get_default_dependencies(environment)
+        # Built here instead of by the factory, to read its stats.
+        history = HistoryManager.from_env(environment, fake_summarizer)
+        bot = Bot(deps=deps, toolset=main_toolset, history=history)
+
+        print(f"History strategy: {args.history}")
+        print(" turn | history ms | turn ms | tokens sent | tokens saved | reload ms")
+
+        with backend.model(fake_model()):
+            for turn in range(1, args.turns + 1):
+                start = time.perf_counter()
+
+                with redirect_stdout(io.StringIO()):
+                    async for _ in bot.answer(UserPromptPart(f"Pregunta {turn} sobre Ithaka")):
+                        pass
+
+                seconds = time.perf_counter() - start
+
+                if turn % args.every:
+                    continue
+
+                # Time the build alone, on the history the next turn will use.
+                build_start = time.perf_counter()
+                _ = await history.build(deps.conversation.messages)
+                build_seconds = time.perf_counter() - build_start
+                stats = history.last_stats
+
+                create_bq_writer(backend.bq_client).flush()
+                reload_start = time.perf_counter()
+                _ = await factory.get_default_dependencies(
+                    environment, last=history.messages_needed
+                )
+                reload_seconds = time.perf_counter() - reload_start
+
+                print(
+                    f"{turn:5} | {build_seconds * 1e3:10.2f} | {seconds * 1e3:7.1f} | "
+                    f"{stats.prompt_tokens:11} | {stats.saved_tokens:12} | "
+                    f"{reload_seconds * 1e3:9.2f}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
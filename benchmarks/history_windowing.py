@@ -0,0 +1,97 @@
+"""
+Compare the history strategies of `HistoryManager` over a synthetic
+500-turn conversation: time to build the history and estimated prompt tokens
+sent and saved per turn.
+
+    uv run benchmarks/history_windowing.py
+"""
+
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from pydantic_ai.messages import (  # noqa: E402
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    UserPromptPart,
+)
+
+from chat.history import HistoryManager  # noqa: E402
+from env import HistoryTag  # noqa: E402
+from repository.types import MessageModel  # noqa: E402
+
+TURNS = 500
+STRATEGIES: list[HistoryTag] = ["all", "window", "tokens", "summary"]
+
+
+async def fake_summarizer(summary: str | None, messages: list[ModelMessage]) -> str:
+    return (summary or "") + f" {len(messages)} more messages about Ithaka."
+
+
+def synthetic_conversation() -> list[MessageModel]:
+    messages = list[MessageModel]()
+
+    for turn in range(TURNS):
+        question = f"Pregunta {turn}: ¿qué apoyos ofrece Ithaka para emprendimientos? " * 3
+        answer = f"Respuesta {turn}: Ithaka ofrece mentorías, cursos y financiamiento. " * 12
+        request_parts = [UserPromptPart(question)]
+
+        if turn == 0:
+            request_parts.insert(0, SystemPromptPart("You are the Ithaka assistant. " * 50))
+
+        for sender, text in (("user", None), ("assistant", answer)):
+            message_text: list[ModelMessage] = [ModelRequest(parts=list(request_parts))]
+
+            if text is not None:
+                message_text.append(ModelResponse(parts=[TextPart(text)]))
+
+            messages.append(
+                MessageModel(
+                    message_id=f"{turn}-{sender}",
+                    conversation_id="benchmark",
+                    sender=sender,
+                    message_text=message_text,
+                    timestamp=datetime.now(timezone.utc),
+                )
+            )
+
+    return messages
+
+
+async def run(strategy: HistoryTag, conversation: list[MessageModel]) -> None:
+    manager = HistoryManager(
+        strategy, max_messages=20, token_budget=8_000, summarizer=fake_summarizer
+    )
+    sent = 0
+    start = time.perf_counter()
+
+    for end in range(2, len(conversation) + 1, 2):
+        _ = await manager.build(conversation[:end])
+        sent += manager.last_stats.prompt_tokens
+
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{strategy:>8}: {elapsed / TURNS * 1e3:7.3f} ms/turn, "
+        f"{sent / TURNS:9.0f} tokens sent/turn, "
+        f"{manager.saved_tokens / TURNS:9.0f} tokens saved/turn, "
+        f"{manager.last_stats.prompt_tokens:7} tokens on the last turn"
+    )
+
+
+async def main() -> None:
+    conversation = synthetic_conversation()
+
+    for strategy in STRATEGIES:
+        await run(strategy, conversation)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Report what importing a module costs, from `python -X importtime`, in a
+fresh interpreter: the slowest imports by cumulative time, and the time of
+each top-level package by the imports it runs itself.
+
+    uv run benchmarks/import_report.py ui.chat_ui --top 25
+"""
+
+import argparse
+from collections import defaultdict
+from dataclasses import dataclass
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).parent.parent / "src"
+
+# Enough for `env()`, which some modules read when imported.
+DUMMY_ENVIRONMENT = {
+    "GOOGLE_CLOUD_API_KEY": "x",
+    "PROJECT_ID": "project",
+    "BUCKET_NAME": "bucket",
+    "DATASET": "dataset",
+    "TABLE": "table",
+}
+
+
+@dataclass
+class Import:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    _ = parser.add_argument("module", nargs="?", default="ui.chat_ui")
+    _ = parser.add_argument("--top", type=int, default=20)
+    return parser.parse_args()
+
+
+def child_environment() -> dict[str, str]:
+    return {
+        **DUMMY_ENVIRONMENT,
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([str(SRC), os.environ.get("PYTHONPATH", "")]),
+    }
+
+
+def import_times(module: str) -> list[Import]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=child_environment(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = list[Import]()
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append(Import(name.strip(), int(self_us), int(cumulative_us), depth))
+
+    return imports
+
+
+def main() -> None:
+    args = parse_args()
+    imports = import_times(args.module)
+    by_package = defaultdict[str, int](int)
+
+    for entry in imports:
+        by_package[entry.module.split(".")[0]] += entry.self_us
+
+    total = sum(by_package.values())
+    print(f"import {args.module}: {total / 1e3:.0f} ms, {len(imports)} modules\n")
+
+    print("Slowest imports (cumulative):")
+    for entry in sorted(imports, key=lambda entry: entry.cumulative_us, reverse=True)[: args.top]:
+        print(f"  {entry.cumulative_us / 1e3:8.1f} ms  {'  ' * entry.depth}{entry.module}")
+
+    print("\nBy package (self):")
+    for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[
+        : args.top
+    ]:
+        print(f"  {self_us / 1e3:8.1f} ms  {package}")
+
+
+if __name__ == "__main__":
+    main()
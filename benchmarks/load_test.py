@@ -0,0 +1,133 @@
+"""
+Simulate concurrent chatters against the multi-user serving mode and report
+the time to first token (TTFT) they see.
+
+Every chatter is its own UI session, so it gets its own user, conversation
+and `Bot` through the bridge's session pool, like a browser tab does. The
+model is a `FunctionModel` that waits `--first-token-ms` and then streams
+`--tokens` tokens, one every `--token-ms`. At most `CONCURRENCY_LIMIT`
+answers run at once, like Gradio's queue does. Conversations are kept in a
+temporary directory and the fake clients of `fakes` stand in for Gemini's
+and BigQuery's.
+
+    uv run benchmarks/load_test.py --chatters 64 --turns 3
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+for name, value in {
+    "GOOGLE_CLOUD_API_KEY": "load-test",
+    "PROJECT_ID": "load-test",
+    "BUCKET_NAME": "load-test",
+    "DATASET": "load-test",
+    "TABLE": "load-test",
+    "MEMORY": "local",
+    "SERVE": "multi",
+}.items():
+    _ = os.environ.setdefault(name, value)
+
+import chat.memory  # noqa: E402
+import ui.bridge  # noqa: E402
+from chat.agents import get_agent  # noqa: E402
+from chat.clients import PoolSettings  # noqa: E402
+from chat.factory import BotFactory  # noqa: E402
+from chat.tools.toolset import main_toolset  # noqa: E402
+from env import env  # noqa: E402
+from fakes.bigquery import FakeBigQueryClient  # noqa: E402
+from fakes.genai import FakeGoogleClient  # noqa: E402
+from fakes.model import fake_model  # noqa: E402
+from ui.bridge import ui_to_chat  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    _ = parser.add_argument("--chatters", type=int, default=64)
+    _ = parser.add_argument("--turns", type=int, default=3)
+    _ = parser.add_argument("--think-ms", type=float, default=100)
+    _ = parser.add_argument("--first-token-ms", type=float, default=300)
+    _ = parser.add_argument("--tokens", type=int, default=200)
+    _ = parser.add_argument("--token-ms", type=float, default=5)
+    return parser.parse_args()
+
+
+async def chatter(index: int, args: argparse.Namespace, queue: asyncio.Semaphore) -> list[float]:
+    ttfts = list[float]()
+
+    for turn in range(args.turns):
+        await asyncio.sleep(args.think_ms / 1000)
+
+        # Time spent waiting in the queue counts, as users wait for it too.
+        start = time.perf_counter()
+        first = None
+
+        async with queue:
+            async for renderable in ui_to_chat(
+                {"text": f"Question {turn} of chatter {index}", "files": []},
+                session_id=f"chatter-{index}",
+            ):
+                if first is None and renderable:
+                    first = time.perf_counter() - start
+
+            ttfts.append(first if first is not None else float("nan"))
+
+    return ttfts
+
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
+
+
+async def main() -> None:
+    args = parse_args()
+    environment = env()
+    queue = asyncio.Semaphore(environment.concurrency_limit)
+    agent = get_agent(
+        main_toolset,
+        api_key=environment.google_cloud_api_key,
+        pool=PoolSettings.from_env(environment),
+    )
+
+    model = fake_model(
+        " ".join(f"token{index}" for index in range(args.tokens)),
+        first_token_delay=args.first_token_ms / 1000,
+        tokens_per_second=1000 / args.token_ms,
+    )
+
+    with agent.override(model=model):
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(chatter(index, args, queue) for index in range(args.chatters))
+        )
+        seconds = time.perf_counter() - start
+
+    ttfts = [ttft for result in results for ttft in result]
+
+    print(
+        f"{args.chatters} chatters, {len(ttfts)} turns in {seconds:.1f}s "
+        f"({len(ttfts) / seconds:.1f} turns/s), concurrency limit "
+        f"{environment.concurrency_limit}"
+    )
+    print(
+        f"TTFT p50 {percentile(ttfts, 50) * 1e3:7.1f} ms, "
+        f"p99 {percentile(ttfts, 99) * 1e3:7.1f} ms, "
+        f"mean {statistics.fmean(ttfts) * 1e3:7.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        chat.memory.MEMORY_DIR = Path(directory)
+        ui.bridge.factory = BotFactory(
+            bq_client=FakeBigQueryClient(), google_client=FakeGoogleClient()
+        )
+        asyncio.run(main())
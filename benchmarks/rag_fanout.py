@@ -0,0 +1,107 @@
+"""
+Measure turns whose model calls `query_rag` several times at once, run
+offline against the fake Gemini model and the fake BigQuery client.
+
+For each fan-out K, the model's first response calls `query_rag` K times
+with different queries; each call embeds its query (`--embedding-ms`) and
+runs a vector search (`--bq-ms`). Reported are the turn latency, and how
+much longer it is than a turn with one call: close to 0 when the searches
+overlap, close to (K - 1) searches when they run one after another.
+
+With `--tool query_rag_many`, the model instead makes one `query_rag_many`
+call with the K queries, which embeds them all in one request.
+
+    uv run benchmarks/rag_fanout.py --fanout 1 2 4 8 --bq-ms 200 --tool query_rag_many
+"""
+
+import argparse
+import asyncio
+from contextlib import redirect_stdout
+import io
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from pydantic_ai.messages import UserPromptPart  # noqa: E402
+
+from fakes.backend import TOPICS, FakeBackend  # noqa: E402
+from fakes.model import fake_model, query_rag_call, query_rag_many_call  # noqa: E402
+
+RUN = uuid4().hex[:8]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    _ = parser.add_argument("--fanout", type=int, nargs="+", default=[1, 2, 4, 8])
+    _ = parser.add_argument("--turns", type=int, default=5)
+    _ = parser.add_argument("--bq-ms", type=float, default=200)
+    _ = parser.add_argument("--embedding-ms", type=float, default=50)
+    _ = parser.add_argument("--fragments", type=int, default=1000)
+    _ = parser.add_argument("--tool", choices=["query_rag", "query_rag_many"], default="query_rag")
+    return parser.parse_args()
+
+
+async def measure(backend: FakeBackend, fanout: int, args: argparse.Namespace) -> float:
+    seconds = list[float]()
+
+    for turn in range(args.turns):
+        # Distinct queries every turn and run, so the embedding cache (kept
+        # on disk between runs) does not hide the embedding calls.
+        queries = [
+            f"{TOPICS[index % len(TOPICS)]} ({RUN}, {fanout}, {turn}, {index})"
+            for index in range(fanout)
+        ]
+
+        match args.tool:
+            case "query_rag":
+                calls = [query_rag_call(query) for query in queries]
+            case _:
+                calls = [query_rag_many_call(queries)]
+
+        with backend.model(fake_model("Listo.", tool_calls=calls)):
+            bot = await backend.bot()
+            start = time.perf_counter()
+
+            async for _ in bot.answer(UserPromptPart("¿Qué ofrece Ithaka?")):
+                pass
+
+            seconds.append(time.perf_counter() - start)
+
+    return statistics.median(seconds)
+
+
+async def main() -> None:
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        backend = FakeBackend.create(
+            Path(directory),
+            bq_latency=args.bq_ms / 1000,
+            embedding_latency=args.embedding_ms / 1000,
+            fragments=args.fragments,
+        )
+        baseline = None
+
+        for fanout in args.fanout:
+            embeddings = backend.google_client.models.calls
+
+            with redirect_stdout(io.StringIO()):
+                seconds = await measure(backend, fanout, args)
+
+            baseline = seconds if baseline is None else baseline
+            embeddings = (backend.google_client.models.calls - embeddings) / args.turns
+
+            print(
+                f"fan-out {fanout:2}: turn p50 {seconds * 1e3:7.1f} ms, "
+                f"{(seconds - baseline) * 1e3:+7.1f} ms over fan-out {args.fanout[0]}, "
+                f"{embeddings:4.1f} embedding calls/turn"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
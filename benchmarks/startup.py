@@ -0,0 +1,107 @@
+"""
+Measure the cold start of the UI: from launching `ui_entrypoint.py` in a
+new process until its server answers, and the time to import the UI and
+the chat stack on their own.
+
+Nothing is sent to Gemini or BigQuery: no message is ever sent, so the
+environment only needs placeholder values, which are used when missing.
+
+    uv run benchmarks/startup.py --runs 5
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+SRC = Path(__file__).parent.parent / "src"
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from import_report import child_environment  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    _ = parser.add_argument("--runs", type=int, default=5)
+    _ = parser.add_argument("--timeout", type=float, default=120)
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_ready(timeout: float) -> float:
+    port = free_port()
+    environment = {
+        **child_environment(),
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "GRADIO_ANALYTICS_ENABLED": "False",
+    }
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(SRC / "ui_entrypoint.py")],
+        env=environment,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"The UI exited with {process.returncode}")
+
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1):
+                    return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.02)
+
+        raise TimeoutError(f"The UI was not ready after {timeout}s")
+    finally:
+        process.terminate()
+        _ = process.wait()
+
+
+def time_to_import(module: str) -> float:
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env=child_environment(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout)
+
+
+def main() -> None:
+    args = parse_args()
+    os.chdir(SRC.parent)
+
+    for module in ("ui.chat_ui", "chat.factory"):
+        seconds = [time_to_import(module) for _ in range(args.runs)]
+        print(f"import {module:12}: p50 {statistics.median(seconds) * 1e3:7.0f} ms")
+
+    seconds = [time_to_ready(args.timeout) for _ in range(args.runs)]
+    print(
+        f"server ready       : p50 {statistics.median(seconds) * 1e3:7.0f} ms, "
+        f"min {min(seconds) * 1e3:7.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
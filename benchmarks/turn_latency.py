@@ -0,0 +1,101 @@
+"""
+Measure the latency of whole chat turns, run offline against the fake
+Gemini model and the fake BigQuery client.
+
+Each turn goes through `Bot.answer` like in the UI: the history is built,
+the user message is stored, the model streams its answer and the answer is
+stored. The model waits `--first-token-ms` and then streams at
+`--tokens-per-second`; every BigQuery call waits `--bq-ms`. Turns are run
+with plain answers and with one `query_rag` call first. Reported are the
+time to first token (TTFT) and to the last one, and the BigQuery calls per
+turn.
+
+    uv run benchmarks/turn_latency.py --turns 20 --bq-ms 50
+"""
+
+import argparse
+import asyncio
+from contextlib import redirect_stdout
+import io
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from pydantic_ai.messages import UserPromptPart  # noqa: E402
+
+from fakes.backend import FakeBackend  # noqa: E402
+from fakes.model import ToolCall, fake_model, query_rag_call  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    _ = parser.add_argument("--turns", type=int, default=20)
+    _ = parser.add_argument("--first-token-ms", type=float, default=300)
+    _ = parser.add_argument("--tokens-per-second", type=float, default=200)
+    _ = parser.add_argument("--bq-ms", type=float, default=50)
+    _ = parser.add_argument("--embedding-ms", type=float, default=30)
+    return parser.parse_args()
+
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
+
+
+async def measure(
+    name: str, backend: FakeBackend, args: argparse.Namespace, tool_calls: list[ToolCall]
+) -> None:
+    model = fake_model(
+        first_token_delay=args.first_token_ms / 1000,
+        tokens_per_second=args.tokens_per_second,
+        tool_calls=tool_calls,
+    )
+    first_tokens = list[float]()
+    totals = list[float]()
+    calls = backend.bq_client.queries + backend.bq_client.loads
+
+    with backend.model(model), redirect_stdout(io.StringIO()):
+        bot = await backend.bot()
+
+        for turn in range(args.turns):
+            start = time.perf_counter()
+            first = None
+
+            async for answer in bot.answer(UserPromptPart(f"¿Qué ofrece Ithaka? ({turn})")):
+                if first is None and answer.content:
+                    first = time.perf_counter() - start
+
+            first_tokens.append(first if first is not None else float("nan"))
+            totals.append(time.perf_counter() - start)
+
+    calls = backend.bq_client.queries + backend.bq_client.loads - calls
+
+    print(
+        f"{name:>10}: TTFT p50 {percentile(first_tokens, 50) * 1e3:7.1f} ms, "
+        f"p99 {percentile(first_tokens, 99) * 1e3:7.1f} ms | "
+        f"turn p50 {percentile(totals, 50) * 1e3:7.1f} ms, "
+        f"mean {statistics.fmean(totals) * 1e3:7.1f} ms | "
+        f"{calls / args.turns:4.1f} BigQuery calls/turn"
+    )
+
+
+async def main() -> None:
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        backend = FakeBackend.create(
+            Path(directory),
+            bq_latency=args.bq_ms / 1000,
+            embedding_latency=args.embedding_ms / 1000,
+        )
+
+        await measure("plain", backend, args, [])
+        await measure("query_rag", backend, args, [query_rag_call("¿Qué mentorías hay?")])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,159 @@
+from functools import cache
+
+from google.genai.types import HarmBlockThreshold, HarmCategory
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.google import GoogleModel, GoogleModelSettings
+from pydantic_ai.providers.google import GoogleProvider
+from pydantic_ai.toolsets import AbstractToolset
+
+from chat.clients import PoolSettings, create_google_client
+from chat.history import Summarizer
+from chat.types import Dependencies
+from prompts.system_prompt import SystemPromptParams, get_system_prompt
+
+DEFAULT_MODEL = "gemini-2.5-pro"
+SUMMARY_MODEL = "gemini-2.5-flash"
+
+DEFAULT_SETTINGS = GoogleModelSettings(
+    temperature=0.2,
+    google_safety_settings=[
+        {
+            "category": HarmCategory.HARM_CATEGORY_HATE_SPEECH,
+            "threshold": HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+        }
+    ],
+)
+
+type AgentKey = tuple[str, str, PoolSettings, str, int]
+
+# Agents are stateless between runs (deps and history are passed per run), so
+# one instance per configuration is shared by every Bot in the process.
+# Toolsets are dataclasses and not hashable, so they are keyed by identity; the
+# cached agent keeps a reference to its toolset, so the id is never reused.
+_agents = dict[AgentKey, Agent[Dependencies, str]]()
+
+
+def _system_prompt() -> str:
+    # Dynamic, so it is re-rendered on every run (and replaces the one stored
+    # in the history) instead of freezing the date at agent creation.
+    return get_system_prompt(SystemPromptParams())
+
+
+def _build_agent(
+    model_name: str,
+    api_key: str,
+    pool: PoolSettings,
+    settings: GoogleModelSettings,
+    toolset: AbstractToolset[Dependencies],
+) -> Agent[Dependencies, str]:
+    agent = Agent(
+        GoogleModel(
+            model_name,
+            provider=GoogleProvider(client=create_google_client(api_key, pool)),
+            settings=settings,
+        ),
+        toolsets=[toolset],
+        output_retries=10,
+        deps_type=Dependencies,
+    )
+    _ = agent.system_prompt(dynamic=True)(_system_prompt)
+
+    return agent
+
+
+def get_agent(
+    toolset: AbstractToolset[Dependencies],
+    *,
+    api_key: str,
+    pool: PoolSettings = PoolSettings(),
+    model_name: str = DEFAULT_MODEL,
+    settings: GoogleModelSettings = DEFAULT_SETTINGS,
+) -> Agent[Dependencies, str]:
+    """
+    Get the agent for the given configuration, building it on first use.
+
+    Args:
+        toolset: The tools the agent can call.
+        api_key: The Google API key used by the model provider.
+        pool: The connections of the Gemini client.
+        model_name: The Gemini model to use.
+        settings: The model settings.
+
+    Returns:
+        The shared agent for that configuration.
+    """
+    key = (model_name, api_key, pool, repr(settings), id(toolset))
+    agent = _agents.get(key)
+
+    if agent is None:
+        agent = _agents[key] = _build_agent(model_name, api_key, pool, settings, toolset)
+
+    return agent
+
+
+def system_prompt_part() -> SystemPromptPart:
+    """
+    The system prompt as the agent adds it when a conversation starts:
+    marked as dynamic, so later runs render it again.
+    """
+    return SystemPromptPart(_system_prompt(), dynamic_ref=_system_prompt.__qualname__)
+
+
+def first_request(message: UserPromptPart) -> ModelRequest:
+    """The request the agent makes for :message: when it starts a conversation."""
+    return ModelRequest(parts=[system_prompt_part(), message])
+
+
+def clear_agents() -> None:
+    """Drop every cached agent. The next `get_agent` call builds a new one."""
+    _agents.clear()
+
+
+@cache
+def _get_summary_agent(api_key: str, pool: PoolSettings) -> Agent[None, str]:
+    return Agent(
+        GoogleModel(
+            SUMMARY_MODEL, provider=GoogleProvider(client=create_google_client(api_key, pool))
+        ),
+        instructions=(
+            "You summarize conversations between a user and the Ithaka Center assistant. "
+            "Keep names, ids, dates, decisions, form data and open questions. "
+            "Answer only with the summary, in the language of the conversation."
+        ),
+    )
+
+
+def _transcript(messages: list[ModelMessage]) -> str:
+    lines = list[str]()
+
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, UserPromptPart):
+                content = part.content if isinstance(part.content, str) else " ".join(
+                    item if isinstance(item, str) else f"[{item.kind}]" for item in part.content
+                )
+                lines.append(f"User: {content}")
+            elif isinstance(part, TextPart) and isinstance(message, ModelResponse):
+                lines.append(f"Assistant: {part.content}")
+
+    return "\n".join(lines)
+
+
+def get_summarizer(api_key: str, pool: PoolSettings = PoolSettings()) -> Summarizer:
+    """Get a summarizer for `HistoryManager` backed by a fast Gemini model."""
+    agent = _get_summary_agent(api_key, pool)
+
+    async def summarize(summary: str | None, messages: list[ModelMessage]) -> str:
+        previous = f"Summary so far:\n{summary}\n\n" if summary else ""
+        result = await agent.run(f"{previous}Conversation to add:\n{_transcript(messages)}")
+        return result.output
+
+    return summarize
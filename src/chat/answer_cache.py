@@ -0,0 +1,168 @@
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from functools import cache
+import itertools
+import threading
+import time
+from typing import final
+
+import numpy as np
+
+from chat.types import Quote
+from telemetry import get_telemetry
+
+
+@dataclass(frozen=True)
+class CachedAnswer:
+    text: str
+    quotes: list[Quote]
+    # How long generating the answer took, to tell the time a hit saves.
+    seconds: float
+
+
+@dataclass
+class AnswerCacheStats:
+    hits: int = 0
+    misses: int = 0
+    saved_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class _Entry:
+    answer: CachedAnswer
+    created_at: float
+    embedding: np.ndarray = field(repr=False)
+
+
+@final
+class AnswerCache:
+    """
+    Answers to the first question of conversations, served again for a new
+    question whose embedding is at least `threshold` similar (cosine) to the
+    one they answered.
+
+    Answers come from the RAG corpus, so entries are kept for one version
+    of it: when another version is seen, every entry is dropped. They also
+    expire after `ttl` seconds, since the system prompt has the date. At
+    most `max_entries` are kept, the least recently used dropped first.
+    """
+
+    def __init__(
+        self, *, threshold: float = 0.95, max_entries: int = 1024, ttl: float = 24 * 60 * 60
+    ) -> None:
+        self.threshold = threshold
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries = OrderedDict[int, _Entry]()
+        self._ids = itertools.count()
+        self._version: str | None = None
+        # The embeddings of the entries as rows, rebuilt after they change.
+        self._matrix: tuple[list[int], np.ndarray] | None = None
+        self._lock = threading.Lock()
+        self.stats = AnswerCacheStats()
+
+    def get(self, embedding: Sequence[float], corpus_version: str) -> CachedAnswer | None:
+        """
+        Get the answer to the question most similar to :embedding:, if it is
+        similar enough and was answered from :corpus_version:.
+        """
+        query = _normalized(embedding)
+        telemetry = get_telemetry()
+
+        with self._lock:
+            self._set_version(corpus_version)
+            self._expire()
+            best = self._nearest(query)
+
+            if best is None:
+                self.stats.misses += 1
+                telemetry.increment("answer_cache_misses")
+                return None
+
+            self._entries.move_to_end(best)
+            self.stats.hits += 1
+            telemetry.increment("answer_cache_hits")
+            return self._entries[best].answer
+
+    def put(self, embedding: Sequence[float], corpus_version: str, answer: CachedAnswer) -> None:
+        """Keep :answer: for the question of :embedding:, from :corpus_version:."""
+        with self._lock:
+            self._set_version(corpus_version)
+            self._entries[next(self._ids)] = _Entry(
+                answer, time.monotonic(), _normalized(embedding)
+            )
+            self._matrix = None
+
+            while len(self._entries) > self._max_entries:
+                _ = self._entries.popitem(last=False)
+
+    def record_saved(self, seconds: float) -> None:
+        """Count :seconds: as saved by a hit, against generating the answer."""
+        with self._lock:
+            self.stats.saved_seconds += seconds
+
+        get_telemetry().increment("answer_cache_saved_seconds", seconds)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def _set_version(self, corpus_version: str) -> None:
+        if corpus_version != self._version:
+            self._entries.clear()
+            self._matrix = None
+            self._version = corpus_version
+
+    def _expire(self) -> None:
+        oldest = time.monotonic() - self._ttl
+        expired = [key for key, entry in self._entries.items() if entry.created_at < oldest]
+
+        for key in expired:
+            del self._entries[key]
+
+        if expired:
+            self._matrix = None
+
+    def _nearest(self, query: np.ndarray) -> int | None:
+        if not self._entries:
+            return None
+
+        if self._matrix is None:
+            keys = list(self._entries)
+            self._matrix = keys, np.stack([self._entries[key].embedding for key in keys])
+
+        keys, matrix = self._matrix
+
+        if matrix.shape[1] != query.shape[0]:
+            return None
+
+        similarities = matrix @ query
+        best = int(np.argmax(similarities))
+        return keys[best] if similarities[best] >= self.threshold else None
+
+
+def _normalized(embedding: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@cache
+def get_answer_cache(threshold: float, max_entries: int, ttl: float) -> AnswerCache:
+    answer_cache = AnswerCache(threshold=threshold, max_entries=max_entries, ttl=ttl)
+
+    telemetry = get_telemetry()
+    telemetry.gauge("answer_cache_hit_rate", lambda: answer_cache.stats.hit_rate)
+    telemetry.gauge("answer_cache_entries", lambda: len(answer_cache))
+
+    return answer_cache
@@ -0,0 +1,216 @@
+from collections.abc import Callable, Sequence
+from dataclasses import replace
+from functools import cache
+import hashlib
+from pathlib import Path
+import tempfile
+from typing import final
+from urllib.parse import parse_qs, quote, urlsplit
+
+from pydantic_ai import BinaryContent
+from pydantic_ai.messages import (
+    AudioUrl,
+    DocumentUrl,
+    FileUrl,
+    ImageUrl,
+    ModelMessage,
+    ModelRequest,
+    UserContent,
+    UserPromptPart,
+    VideoUrl,
+)
+
+SCHEME = "blob"
+CHUNK_SIZE = 1024 * 1024
+
+
+class BlobTooLargeError(ValueError):
+    pass
+
+
+def reference(digest: str, media_type: str) -> FileUrl:
+    """
+    A reference to the blob :digest: to keep in the history instead of its
+    bytes. The media type goes in the URL, since pydantic_ai does not persist
+    it.
+    """
+    url = f"{SCHEME}:{digest}?media_type={quote(media_type, safe='')}"
+
+    match media_type.split("/")[0]:
+        case "image":
+            return ImageUrl(url=url)
+        case "audio":
+            return AudioUrl(url=url)
+        case "video":
+            return VideoUrl(url=url)
+        case _:
+            return DocumentUrl(url=url)
+
+
+def parse_reference(item: UserContent) -> tuple[str, str] | None:
+    """The digest and media type of :item: if it is a blob reference."""
+    if not isinstance(item, FileUrl) or not item.url.startswith(f"{SCHEME}:"):
+        return None
+
+    url = urlsplit(item.url)
+    return url.path, parse_qs(url.query)["media_type"][0]
+
+
+@final
+class BlobStore:
+    """
+    Content-addressed store for uploaded files, so the conversation history
+    only keeps a reference to them.
+
+    Each blob is saved once under :root:, named by the SHA-256 of its bytes.
+    Files are copied in chunks, so an upload is never fully held in memory,
+    and those over `max_bytes` are rejected.
+    """
+
+    def __init__(self, root: Path, *, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def put(self, source: Path, media_type: str) -> FileUrl:
+        """
+        Copy :source: into the store, unless it already holds the same bytes.
+
+        Returns:
+            A reference to keep in the message instead of the bytes.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+
+        with (
+            source.open("rb") as file,
+            tempfile.NamedTemporaryFile(dir=self.root, delete=False) as temporary,
+        ):
+            temporary_path = Path(temporary.name)
+
+            try:
+                while chunk := file.read(CHUNK_SIZE):
+                    size += len(chunk)
+
+                    if size > self.max_bytes:
+                        raise BlobTooLargeError(
+                            f"{source.name} is larger than {self.max_bytes} bytes."
+                        )
+
+                    digest.update(chunk)
+                    _ = temporary.write(chunk)
+            except BaseException:
+                temporary.close()
+                temporary_path.unlink(missing_ok=True)
+                raise
+
+        self._move(temporary_path, digest.hexdigest())
+        return reference(digest.hexdigest(), media_type)
+
+    def put_bytes(self, data: bytes, media_type: str) -> FileUrl:
+        """Like `put`, for bytes already in memory."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256(data).hexdigest()
+
+        if not self.path(digest).exists():
+            with tempfile.NamedTemporaryFile(dir=self.root, delete=False) as temporary:
+                _ = temporary.write(data)
+
+            self._move(Path(temporary.name), digest)
+
+        return reference(digest, media_type)
+
+    def _move(self, temporary_path: Path, digest: str) -> None:
+        path = self.path(digest)
+
+        if path.exists():
+            temporary_path.unlink()
+        else:
+            path.parent.mkdir(exist_ok=True)
+            _ = temporary_path.replace(path)
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def rehydrate_content(self, content: str | Sequence[UserContent]) -> str | list[UserContent]:
+        """Replace the blob references in :content: with the bytes they point to."""
+        if isinstance(content, str):
+            return content
+
+        output = list[UserContent]()
+
+        for item in content:
+            blob = parse_reference(item)
+
+            if blob is None:
+                output.append(item)
+            else:
+                digest, media_type = blob
+                output.append(
+                    BinaryContent(data=self.path(digest).read_bytes(), media_type=media_type)
+                )
+
+        return output
+
+    def dehydrate_content(self, content: str | Sequence[UserContent]) -> str | list[UserContent]:
+        """Replace the bytes in :content: with references to them, storing them if needed."""
+        if isinstance(content, str):
+            return content
+
+        return [
+            self.put_bytes(item.data, item.media_type) if isinstance(item, BinaryContent) else item
+            for item in content
+        ]
+
+    def rehydrate(self, messages: Sequence[ModelMessage]) -> list[ModelMessage]:
+        """
+        Rehydrate the blob references of the user prompts in :messages:.
+        Messages without references are returned as they are.
+        """
+        return _map_prompts(
+            messages, lambda item: parse_reference(item) is not None, self.rehydrate_content
+        )
+
+    def dehydrate(self, messages: Sequence[ModelMessage]) -> list[ModelMessage]:
+        """
+        Store the bytes in the user prompts of :messages: and replace them with
+        references, so they can be persisted. Messages without bytes are
+        returned as they are.
+        """
+        return _map_prompts(
+            messages, lambda item: isinstance(item, BinaryContent), self.dehydrate_content
+        )
+
+
+def _map_prompts(
+    messages: Sequence[ModelMessage],
+    matches: Callable[[UserContent], bool],
+    convert: Callable[[str | Sequence[UserContent]], str | list[UserContent]],
+) -> list[ModelMessage]:
+    output = list[ModelMessage]()
+
+    for message in messages:
+        if isinstance(message, ModelRequest) and any(
+            isinstance(part, UserPromptPart)
+            and not isinstance(part.content, str)
+            and any(matches(item) for item in part.content)
+            for part in message.parts
+        ):
+            message = replace(
+                message,
+                parts=[
+                    replace(part, content=convert(part.content))
+                    if isinstance(part, UserPromptPart)
+                    else part
+                    for part in message.parts
+                ],
+            )
+
+        output.append(message)
+
+    return output
+
+
+@cache
+def get_blob_store(root: Path, max_bytes: int) -> BlobStore:
+    return BlobStore(root, max_bytes=max_bytes)
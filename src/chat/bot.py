@@ -1,16 +1,51 @@
-from collections.abc import AsyncGenerator
-from typing import final
+import asyncio
+from collections.abc import AsyncGenerator, Sequence
+from dataclasses import dataclass, replace
+import logging
+import time
+from typing import assert_never, final
 
-from google.genai.types import HarmBlockThreshold, HarmCategory
 from pydantic_ai import Agent
-from pydantic_ai.messages import ModelMessage, ModelRequest, UserPromptPart
-from pydantic_ai.models.google import GoogleModel, GoogleModelSettings
-from pydantic_ai.providers.google import GoogleProvider
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    UserPromptPart,
+)
 from pydantic_ai.toolsets import AbstractToolset
 
+from chat.agents import first_request, get_agent, system_prompt_part
+from chat.answer_cache import AnswerCache, CachedAnswer, get_answer_cache
+from chat.blobs import get_blob_store
+from chat.clients import PoolSettings
+from chat.history import HistoryManager
 from chat.memory import add_message
-from chat.types import Answer, Dependencies, TextAnswer
-from prompts.system_prompt import SystemPromptParams, get_system_prompt
+from chat.streaming import coalesce
+from chat.types import (
+    Answer,
+    AnswerPart,
+    Dependencies,
+    QuoteCollector,
+    TextAnswer,
+    TextDelta,
+)
+from rag.rag import RAGTool
+from telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+# Answers that called other tools (e.g. to fill a form) are not cached.
+CACHEABLE_TOOLS = frozenset({"query_rag", "query_rag_many"})
+
+
+@dataclass
+class _Lookup:
+    cache: AnswerCache
+    embedding: list[float]
+    corpus_version: str
+    answer: CachedAnswer | None
 
 
 @final
@@ -20,29 +55,16 @@ class Bot:
         *,
         deps: Dependencies,
         toolset: AbstractToolset[Dependencies],
+        history: HistoryManager | None = None,
     ) -> None:
         self._deps = deps
         self.__toolset = toolset
+        self._history = history or HistoryManager(system_prompt=system_prompt_part)
 
     def make_agent(self) -> Agent[Dependencies, str]:
-        return Agent(
-            GoogleModel(
-                "gemini-2.5-pro",
-                provider=GoogleProvider(api_key=self.get_dependencies().env.google_cloud_api_key),
-                settings=GoogleModelSettings(
-                    temperature=0.2,
-                    google_safety_settings=[
-                        {
-                            "category": HarmCategory.HARM_CATEGORY_HATE_SPEECH,
-                            "threshold": HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-                        }
-                    ],
-                ),
-            ),
-            toolsets=[self.__toolset],
-            output_retries=10,
-            deps_type=Dependencies,
-            system_prompt=get_system_prompt(SystemPromptParams())
+        env = self.get_dependencies().env
+        return get_agent(
+            self.__toolset, api_key=env.google_cloud_api_key, pool=PoolSettings.from_env(env)
         )
 
     def get_dependencies(self) -> Dependencies:
@@ -58,28 +80,165 @@ class Bot:
 
     async def answer(self, message: UserPromptPart, /) -> AsyncGenerator[Answer]:
         deps = self.get_dependencies()
-        agent = self.make_agent()
-        dependencies = self.get_dependencies()
+        telemetry = get_telemetry()
+
+        with telemetry.span("chat.turn", conversation_id=deps.conversation.conversation_id):
+            start_ns = time.time_ns()
+            lookup = await self._lookup_answer(message)
+
+            if lookup is not None and lookup.answer is not None:
+                cached = lookup.answer
+                add_message(deps, "user", [ModelRequest(parts=[message])])
+                _ = telemetry.record_since("chat.first_token", start_ns)
+                # All at once, in either streaming mode.
+                yield Answer(content=TextAnswer(text=cached.text), quotes=list(cached.quotes))
+
+                add_message(
+                    deps,
+                    "assistant",
+                    [first_request(message), ModelResponse(parts=[TextPart(content=cached.text)])],
+                )
+                elapsed = (time.time_ns() - start_ns) / 1e9
+                lookup.cache.record_saved(max(0.0, cached.seconds - elapsed))
+                return
+
+            with telemetry.span("chat.agent"):
+                agent = self.make_agent()
+
+            # The tools of this run add their quotes to a collector of its own,
+            # so only the quotes of this answer are returned.
+            dependencies = replace(deps, quotes=QuoteCollector())
+
+            blobs = get_blob_store(deps.env.blob_dir, deps.env.upload_max_bytes)
+
+            with telemetry.span("chat.history") as span:
+                # Uploads are kept as references; the bytes are only read back
+                # for the messages actually sent.
+                history = blobs.rehydrate(await self._history.build(deps.conversation.messages))
+                stats = self._history.last_stats
+                span.attributes["prompt_tokens"] = stats.prompt_tokens
+                span.attributes["saved_tokens"] = stats.saved_tokens
+
+            logger.debug(
+                "History: %d tokens sent, %d saved.", stats.prompt_tokens, stats.saved_tokens
+            )
+
+            add_message(deps, "user", [ModelRequest(parts=[message])])
+
+            env = dependencies.env
+            chunk: AnswerPart = TextAnswer(text="")
+            first_token = True
+
+            async with agent.run_stream(
+                user_prompt=blobs.rehydrate_content(message.content),
+                deps=dependencies,
+                message_history=history,
+            ) as response:
+                match env.stream:
+                    case "full":
+                        # Each answer carries the whole text so far.
+                        async for text in response.stream(debounce_by=env.stream_interval):
+                            if first_token:
+                                _ = telemetry.record_since("chat.first_token", start_ns)
+                                first_token = False
+
+                            chunk = TextAnswer(text=text)
+                            yield Answer(content=chunk)
+                    case "delta":
+                        # Each answer carries only the text appended since the
+                        # previous one, so the last one is empty.
+                        deltas = response.stream_text(delta=True, debounce_by=None)
+
+                        async for text in coalesce(
+                            deltas, interval=env.stream_interval, max_chars=env.stream_chars
+                        ):
+                            if first_token:
+                                _ = telemetry.record_since("chat.first_token", start_ns)
+                                first_token = False
+
+                            yield Answer(content=TextDelta(text=text))
+
+                        chunk = TextDelta(text="")
+                    case _:
+                        assert_never(env.stream)
+
+                new_messages = response.new_messages()
+
+            yield Answer(content=chunk, quotes=list(dependencies.quotes))
+
+            # The new messages repeat the prompt as sent, with the bytes in it.
+            add_message(deps, "assistant", blobs.dehydrate(new_messages))
+
+            if lookup is not None and (text := _cacheable_text(new_messages)) is not None:
+                lookup.cache.put(
+                    lookup.embedding,
+                    lookup.corpus_version,
+                    CachedAnswer(
+                        text=text,
+                        quotes=list(dependencies.quotes),
+                        seconds=(time.time_ns() - start_ns) / 1e9,
+                    ),
+                )
+
+    async def _lookup_answer(self, message: UserPromptPart) -> _Lookup | None:
+        """
+        Look :message: up in the answer cache, if it is enabled and the
+        message is the first of the conversation, and only text.
+
+        Returns:
+            The lookup, to keep the answer with if there was no hit, or `None`
+            if the message is not cached.
+        """
+        deps = self.get_dependencies()
+        env = deps.env
+        question = _question(message.content)
+
+        if env.answer_cache_threshold is None or deps.conversation.messages or not question:
+            return None
+
+        answer_cache = get_answer_cache(
+            env.answer_cache_threshold, env.answer_cache_entries, env.answer_cache_ttl
+        )
+        tool = RAGTool(deps)
+
+        with get_telemetry().span("chat.answer_cache") as span:
+            try:
+                embedding, corpus_version = await asyncio.gather(
+                    tool.get_similarity_embedding(question), tool.corpus_version()
+                )
+            except Exception:
+                logger.warning("Could not look up the answer cache", exc_info=True)
+                return None
+
+            if embedding is None:
+                return None
+
+            answer = answer_cache.get(embedding, corpus_version)
+            span.attributes["hit"] = answer is not None
+
+        return _Lookup(answer_cache, embedding, corpus_version, answer)
 
-        print("\n\nStart message.")
-        print("Saving user message.")
 
-        add_message(deps, "user", [ModelRequest(parts=[message])])
+def _question(content: str | Sequence[object]) -> str | None:
+    """The text of a prompt, or `None` if it has anything else, like files."""
+    if isinstance(content, str):
+        return content.strip()
 
-        chunk = TextAnswer(text="")
+    if not all(isinstance(item, str) for item in content):
+        return None
 
-        async with agent.run_stream(
-            user_prompt=message.content, deps=dependencies, message_history=self.get_history()
-        ) as response:
-            async for chunk in response.stream():
-                chunk = TextAnswer(text=chunk)
-                yield Answer(content=chunk)
+    return " ".join(str(item) for item in content).strip()
 
-            new_messages = response.new_messages()
 
-        yield Answer(content=chunk, quotes=dependencies.quotes)
-        print("End message.")
+def _cacheable_text(messages: Sequence[ModelMessage]) -> str | None:
+    """The text of the final answer in :messages:, unless it called other tools than the RAG."""
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, ToolCallPart) and part.tool_name not in CACHEABLE_TOOLS:
+                return None
 
-        add_message(deps, "assistant", new_messages)
+    if not messages or not isinstance(messages[-1], ModelResponse):
+        return None
 
-        print("Saved message.")
+    text = "".join(part.content for part in messages[-1].parts if isinstance(part, TextPart))
+    return text or None
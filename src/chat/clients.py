@@ -1,13 +1,185 @@
+import asyncio
+from dataclasses import dataclass
 from functools import cache
+import logging
+import os
+import ssl
+from typing import Self
 
+import certifi
 from google import genai
+import google.auth
+from google.auth.transport.requests import AuthorizedSession
 from google.cloud import bigquery
+from google.genai import types
+import httpx
+from requests.adapters import HTTPAdapter
 
+from env import Environment
+from repository.write_behind import WriteBehindQueue
+from telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+# Everything created here, to be closed by `close_clients`.
+_bq_clients = list[bigquery.Client]()
+_google_clients = list[genai.Client]()
+_writers = list[WriteBehindQueue]()
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    """The HTTP connections of a client, as set by the `CLIENT_*` variables."""
+
+    max_connections: int = 100
+    max_keepalive: int = 50
+    keepalive_seconds: float = 60.0
+    http2: bool = False
+
+    @classmethod
+    def from_env(cls, environment: Environment) -> Self:
+        return cls(
+            max_connections=environment.client_max_connections,
+            max_keepalive=environment.client_max_keepalive,
+            keepalive_seconds=environment.client_keepalive_seconds,
+            http2=environment.client_http2,
+        )
+
+
+@cache
+def create_bq_client(project_id: str, pool: PoolSettings = PoolSettings()):
+    credentials, _ = google.auth.default(scopes=bigquery.Client.SCOPE)
+    # The default pool keeps 10 connections per host, fewer than concurrent
+    # sessions use. Idle connections are kept open until the server closes them.
+    adapter = HTTPAdapter(pool_maxsize=pool.max_connections)
+    session = AuthorizedSession(credentials)
+    session.mount("https://", adapter)
+    client = bigquery.Client(project_id, credentials=credentials, _http=session)
+
+    telemetry = get_telemetry()
+    telemetry.gauge("bigquery_connections_in_use", lambda: _bq_pool_stats(adapter)[0])
+    telemetry.gauge("bigquery_connections_idle", lambda: _bq_pool_stats(adapter)[1])
+    telemetry.gauge("bigquery_connections_max", lambda: pool.max_connections)
+
+    _bq_clients.append(client)
+    return client
 
 @cache
-def create_bq_client(project_id: str):
-    return bigquery.Client(project_id)
+def create_google_client(api_key: str, pool: PoolSettings = PoolSettings()):
+    limits = httpx.Limits(
+        max_connections=pool.max_connections,
+        max_keepalive_connections=pool.max_keepalive,
+        keepalive_expiry=pool.keepalive_seconds,
+    )
+    # The transport is made here, rather than by the client, to read its pool.
+    transport = httpx.AsyncHTTPTransport(verify=_ssl_context(), http2=pool.http2, limits=limits)
+    client = genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(
+            client_args={"limits": limits},
+            async_client_args={"transport": transport},
+        ),
+    )
+
+    telemetry = get_telemetry()
+    telemetry.gauge("genai_connections_in_use", lambda: _httpx_pool_stats(transport)[0])
+    telemetry.gauge("genai_connections_idle", lambda: _httpx_pool_stats(transport)[1])
+    telemetry.gauge("genai_connections_max", lambda: pool.max_connections)
+
+    _google_clients.append(client)
+    return client
 
 @cache
-def create_google_client(api_key: str):
-    return genai.Client(api_key=api_key)
+def create_bq_writer(client: bigquery.Client):
+    writer = WriteBehindQueue(client)
+    _writers.append(writer)
+    return writer
+
+
+def warm_up(environment: Environment) -> None:
+    """
+    Create the clients of :environment: before the first message needs them.
+    If BigQuery is used, its credentials are fetched and a connection opened.
+
+    Gemini's connections belong to the event loop of the server, so they are
+    opened by the first message.
+    """
+    try:
+        pool = PoolSettings.from_env(environment)
+        _ = create_google_client(environment.google_cloud_api_key, pool)
+        client = create_bq_client(environment.project_id, pool)
+
+        if "bigquery" in (environment.memory, environment.rag, environment.forms):
+            _ = client.get_dataset(f"{environment.project_id}.{environment.dataset}")
+    except Exception:
+        logger.warning("Could not warm up the clients", exc_info=True)
+
+
+def close_clients() -> None:
+    """Write what is buffered for BigQuery, then close every client."""
+    for writer in _writers:
+        writer.close()
+
+    for client in _bq_clients:
+        client.close()
+
+    for client in _google_clients:
+        client.close()
+
+        try:
+            asyncio.run(client.aio.aclose())
+        except Exception:
+            logger.debug("Could not close the async Gemini client", exc_info=True)
+
+    _writers.clear()
+    _bq_clients.clear()
+    _google_clients.clear()
+    create_bq_writer.cache_clear()
+    create_bq_client.cache_clear()
+    create_google_client.cache_clear()
+
+
+def _ssl_context() -> ssl.SSLContext:
+    # The same as the Gemini client makes for itself.
+    return ssl.create_default_context(
+        cafile=os.environ.get("SSL_CERT_FILE", certifi.where()),
+        capath=os.environ.get("SSL_CERT_DIR"),
+    )
+
+
+def _bq_pool_stats(adapter: HTTPAdapter) -> tuple[int, int]:
+    """
+    The connections of :adapter: in use and idle, over every host. The
+    queues of urllib3 are not public, so nothing is reported without them.
+    """
+    in_use = idle = 0
+    pools = adapter.poolmanager.pools
+
+    for key in pools.keys():
+        pool = pools.get(key)
+        # The queue holds the idle connections, and None for each one that
+        # can still be opened.
+        queue = getattr(pool, "pool", None)
+
+        if queue is None or not hasattr(queue, "queue"):
+            continue
+
+        waiting = list(queue.queue)
+        in_use += queue.maxsize - len(waiting)
+        idle += sum(1 for connection in waiting if connection is not None)
+
+    return in_use, idle
+
+
+def _httpx_pool_stats(transport: httpx.AsyncHTTPTransport) -> tuple[int, int]:
+    """
+    The connections of :transport: in use and idle. Its pool is not public,
+    so nothing is reported if httpx no longer has it.
+    """
+    connections = getattr(getattr(transport, "_pool", None), "connections", None)
+
+    if connections is None:
+        return 0, 0
+
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return len(connections) - idle, idle
@@ -0,0 +1,298 @@
+from collections import deque
+from collections.abc import Iterator
+import gzip
+import os
+from pathlib import Path
+import threading
+import time
+from typing import BinaryIO, final
+
+from repository.types import ConversationCreationModel, ConversationModel, MessageModel
+
+
+@final
+class ConversationLog:
+    """
+    Append-only storage for a single local conversation.
+
+    A conversation is stored next to :base: (a path without suffix) as:
+
+    - `<base>.json`: the conversation itself, without messages.
+    - `<base>.jsonl`: the active segment, one `MessageModel` per line.
+    - `<base>.<n>.jsonl.gz`: sealed segments, oldest first.
+
+    Appending a message writes a single line instead of rewriting the whole
+    conversation. Writes are flushed immediately but only fsynced every
+    `fsync_every` messages or `fsync_interval` seconds. Once the active segment
+    grows past `segment_bytes` it is compressed into a sealed segment.
+
+    The last `tail_size` messages are kept in memory, so resuming a
+    conversation does not need to read all of it.
+    """
+
+    def __init__(
+        self,
+        base: Path,
+        *,
+        fsync_every: int = 8,
+        fsync_interval: float = 1.0,
+        tail_size: int = 64,
+        segment_bytes: int = 4 * 1024 * 1024,
+    ) -> None:
+        self._base = base
+        self._fsync_every = fsync_every
+        self._fsync_interval = fsync_interval
+        self._segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._file: BinaryIO | None = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._tail = deque[MessageModel](maxlen=tail_size)
+        self._tail_loaded = False
+
+        self._recover()
+
+    @property
+    def header_path(self) -> Path:
+        return self._base.with_name(f"{self._base.name}.json")
+
+    @property
+    def active_path(self) -> Path:
+        return self._base.with_name(f"{self._base.name}.jsonl")
+
+    def _sealed_path(self, number: int) -> Path:
+        return self._base.with_name(f"{self._base.name}.{number:05d}.jsonl.gz")
+
+    @property
+    def _sealing_path(self) -> Path:
+        return self._base.with_name(f"{self._base.name}.jsonl.sealing")
+
+    def exists(self) -> bool:
+        return self.header_path.is_file()
+
+    def create(self, conversation: ConversationCreationModel) -> None:
+        """Write the conversation header. Existing messages are left untouched."""
+        header = ConversationCreationModel(
+            conversation_id=conversation.conversation_id,
+            user_id=conversation.user_id,
+            started_at=conversation.started_at,
+        )
+        _atomic_write(self.header_path, header.model_dump_json().encode())
+
+    def read(self, last: int | None = None) -> ConversationModel | None:
+        """
+        Read the conversation.
+
+        Args:
+            last: Only read the last :last: messages. `None` reads all of them.
+
+        Returns:
+            The conversation, or None if it was never created.
+        """
+        if not self.exists():
+            return None
+
+        header = ConversationCreationModel.model_validate_json(self.header_path.read_bytes())
+
+        with self._lock:
+            messages = self._read_all() if last is None else self._read_last(last)
+
+        return ConversationModel(**dict(header), messages=messages)
+
+    def append(self, message: MessageModel) -> None:
+        line = message.model_dump_json().encode() + b"\n"
+
+        with self._lock:
+            file = self._open()
+            _ = file.write(line)
+            file.flush()
+
+            self._pending += 1
+
+            if self._tail_loaded:
+                self._tail.append(message)
+
+            if (
+                self._pending >= self._fsync_every
+                or time.monotonic() - self._last_sync >= self._fsync_interval
+            ):
+                self._sync()
+
+            if file.tell() >= self._segment_bytes:
+                self._seal()
+
+    def sync(self) -> None:
+        """Force every appended message to disk."""
+        with self._lock:
+            self._sync()
+
+    def compact(self) -> None:
+        """Seal the active segment, whatever its size."""
+        with self._lock:
+            self._seal()
+
+    def close(self) -> None:
+        with self._lock:
+            self._sync()
+
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open(self) -> BinaryIO:
+        if self._file is None:
+            self._file = open(self.active_path, "ab")
+
+        return self._file
+
+    def _sync(self) -> None:
+        if self._file is not None and self._pending:
+            os.fsync(self._file.fileno())
+
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _sealed_numbers(self) -> list[int]:
+        prefix = f"{self._base.name}."
+        numbers = list[int]()
+
+        for path in self._base.parent.glob(f"{self._base.name}.*.jsonl.gz"):
+            number = path.name.removeprefix(prefix).removesuffix(".jsonl.gz")
+
+            if number.isdigit():
+                numbers.append(int(number))
+
+        return sorted(numbers)
+
+    def _seal(self) -> None:
+        self._sync()
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if not self.active_path.is_file() or self.active_path.stat().st_size == 0:
+            return
+
+        # Renaming first makes the seal recoverable: a leftover `.sealing` file
+        # means the compressed copy may be missing or incomplete.
+        _ = self.active_path.rename(self._sealing_path)
+        self._finish_seal()
+
+    def _finish_seal(self) -> None:
+        numbers = self._sealed_numbers()
+        target = self._sealed_path(numbers[-1] + 1 if numbers else 0)
+
+        _atomic_write(target, gzip.compress(self._sealing_path.read_bytes()))
+        self._sealing_path.unlink()
+
+    def _recover(self) -> None:
+        if self._sealing_path.is_file():
+            self._finish_seal()
+
+        self._migrate_legacy()
+
+        # Drop a line torn by a crash in the middle of a write.
+        if self.active_path.is_file() and self.active_path.stat().st_size:
+            with open(self.active_path, "rb+") as file:
+                _ = file.seek(-1, os.SEEK_END)
+
+                if file.read(1) != b"\n":
+                    _ = file.seek(0)
+                    data = file.read()
+                    _ = file.truncate(data.rfind(b"\n") + 1)
+
+    def _migrate_legacy(self) -> None:
+        # Conversations used to be a single JSON file with every message in it.
+        if not self.header_path.is_file():
+            return
+
+        legacy = ConversationModel.model_validate_json(self.header_path.read_bytes())
+
+        if not legacy.messages:
+            return
+
+        lines = b"".join(message.model_dump_json().encode() + b"\n" for message in legacy.messages)
+        _atomic_write(self.active_path, lines)
+        self.create(legacy)
+
+    def _iter_segment(self, path: Path) -> Iterator[MessageModel]:
+        data = gzip.decompress(path.read_bytes()) if path.suffix == ".gz" else path.read_bytes()
+
+        for line in data.splitlines():
+            if line:
+                yield MessageModel.model_validate_json(line)
+
+    def _read_all(self) -> list[MessageModel]:
+        messages = list[MessageModel]()
+
+        for number in self._sealed_numbers():
+            messages.extend(self._iter_segment(self._sealed_path(number)))
+
+        if self.active_path.is_file():
+            messages.extend(self._iter_segment(self.active_path))
+
+        return messages
+
+    def _read_last(self, count: int) -> list[MessageModel]:
+        if count <= 0:
+            return []
+
+        tail_size = self._tail.maxlen or 0
+
+        if not self._tail_loaded:
+            self._tail.extend(self._read_last_from_disk(tail_size))
+            self._tail_loaded = True
+
+        if count <= tail_size or len(self._tail) < tail_size:
+            return list(self._tail)[-count:]
+
+        return self._read_last_from_disk(count)
+
+    def _read_last_from_disk(self, count: int) -> list[MessageModel]:
+        if count <= 0:
+            return []
+
+        lines = _read_last_lines(self.active_path, count) if self.active_path.is_file() else []
+        messages = [MessageModel.model_validate_json(line) for line in lines]
+
+        for number in reversed(self._sealed_numbers()):
+            if len(messages) >= count:
+                break
+
+            sealed = list(self._iter_segment(self._sealed_path(number)))
+            messages = sealed[max(0, len(sealed) - (count - len(messages))):] + messages
+
+        return messages
+
+
+def _read_last_lines(path: Path, count: int, block_size: int = 64 * 1024) -> list[bytes]:
+    """Read the last :count: non-empty lines of :path: without reading all of it."""
+    with open(path, "rb") as file:
+        end = file.seek(0, os.SEEK_END)
+        position = end
+        data = b""
+
+        while position > 0 and data.count(b"\n") <= count:
+            position = max(0, position - block_size)
+            _ = file.seek(position)
+            data = file.read(end - position)
+
+    lines = [line for line in data.splitlines() if line]
+
+    # Unless the whole file was read, the first line may be cut in half.
+    if position > 0:
+        lines = lines[1:]
+
+    return lines[-count:]
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    temporary = path.with_name(f"{path.name}.tmp")
+
+    with open(temporary, "wb") as file:
+        _ = file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+    _ = temporary.replace(path)
@@ -1,36 +1,90 @@
+from google.cloud import bigquery
+from google.genai.client import AsyncClient
+
+from chat.agents import get_summarizer, system_prompt_part
 from chat.bot import Bot
-from chat.clients import create_bq_client, create_google_client
-from chat.memory import get_path
+from chat.clients import (
+    PoolSettings,
+    create_bq_client,
+    create_bq_writer,
+    create_google_client,
+)
+from chat.history import HistoryManager
+from chat.memory import get_log
 from chat.tools.toolset import main_toolset
-from chat.types import Dependencies
+from chat.types import Dependencies, QuoteCollector
 from env import Environment, env
 from repository.conversation import ConversationRepository
 from repository.types import ConversationModel, UserModel
 from repository.user import UserRepository
+from telemetry import get_telemetry
 
 
 class BotFactory:
-    def default(self) -> Bot:
-        return self.from_env(env())
+    def __init__(
+        self,
+        *,
+        bq_client: bigquery.Client | None = None,
+        google_client: AsyncClient | None = None,
+    ) -> None:
+        """
+        :param bq_client: If set, used instead of the client of the project.
+        :param google_client: If set, used instead of the client of the API key.
+        """
+        self._bq_client = bq_client
+        self._google_client = google_client
+
+    async def default(self) -> Bot:
+        return await self.from_env(env())
+
+    async def from_env(self, env: Environment) -> Bot:
+        summarizer = get_summarizer(env.google_cloud_api_key, PoolSettings.from_env(env))
+        history = HistoryManager.from_env(env, summarizer, system_prompt_part)
+        # Only what the history may send is loaded.
+        deps = await self.get_default_dependencies(env, last=history.messages_needed)
+        return Bot(deps=deps, toolset=main_toolset, history=history)
 
-    def from_env(self, env: Environment) -> Bot:
-        deps = self.get_default_dependencies(env)
-        return Bot(deps=deps, toolset=main_toolset)
+    async def get_default_dependencies(self, env: Environment, *, last: int | None = None):
+        """
+        :param last: If set, only the last :last: messages of the conversation
+            are loaded.
+        """
+        with get_telemetry().span("chat.dependencies", memory=env.memory):
+            user, conversation = await self._load_conversation(env, last)
+
+        return Dependencies(
+            env=env,
+            bq_client=self._get_bq_client(env),
+            google_client=self._google_client
+            or create_google_client(env.google_cloud_api_key, PoolSettings.from_env(env)).aio,
+            quotes=QuoteCollector(),
+            user=user,
+            conversation=conversation,
+        )
 
-    def get_default_dependencies(self, env: Environment):
+    async def _load_conversation(
+        self, env: Environment, last: int | None
+    ) -> tuple[UserModel, ConversationModel]:
         match env.memory:
             case "bigquery":
-                bq_client = create_bq_client(env.project_id)
+                bq_client = self._get_bq_client(env)
+                bq_writer = create_bq_writer(bq_client)
 
-                user_repo = UserRepository(bq_client, env.project_id, env.dataset)
-                user = user_repo.read(env.user_id)
+                user_repo = UserRepository(bq_client, env.project_id, env.dataset, bq_writer)
+                user = await user_repo.aread(env.user_id)
 
                 if user is None:
                     user_id = user_repo.create()
                     user = UserModel(user_id=user_id)
 
-                conversation_repo = ConversationRepository(bq_client, env.project_id, env.dataset)
-                conversation = conversation_repo.read(env.conversation_id)
+                conversation_repo = ConversationRepository(
+                    bq_client,
+                    env.project_id,
+                    env.dataset,
+                    bq_writer,
+                    lookback=env.partition_lookback,
+                )
+                conversation = await conversation_repo.aread(env.conversation_id, last=last)
 
                 if conversation is None:
                     _ = conversation_repo.create(user.user_id, conversation_id=env.conversation_id)
@@ -42,25 +96,18 @@ class BotFactory:
             case "local":
                 user = UserModel(user_id=env.user_id)
 
-                path = get_path(user.user_id, env.conversation_id)
+                log = get_log(user.user_id, env.conversation_id)
+                conversation = log.read(last=last)
 
-                if not path.is_file():
+                if conversation is None:
                     conversation = ConversationModel(
                         conversation_id=env.conversation_id,
                         user_id=user.user_id,
                     )
 
-                    _ = get_path(user.user_id, conversation.conversation_id).write_text(
-                        conversation.model_dump_json()
-                    )
-                else:
-                    conversation = ConversationModel.model_validate_json(path.read_text())
+                    log.create(conversation)
 
-        return Dependencies(
-            env=env,
-            bq_client=create_bq_client(env.project_id),
-            google_client=create_google_client(env.google_cloud_api_key).aio,
-            quotes=[],
-            user=user,
-            conversation=conversation,
-        )
+        return user, conversation
+
+    def _get_bq_client(self, env: Environment) -> bigquery.Client:
+        return self._bq_client or create_bq_client(env.project_id, PoolSettings.from_env(env))
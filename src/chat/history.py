@@ -0,0 +1,252 @@
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from math import ceil
+from typing import assert_never, final
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelRequestPart,
+    ModelResponsePart,
+    RetryPromptPart,
+    SystemPromptPart,
+    TextPart,
+    ThinkingPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+from env import Environment, HistoryTag
+from repository.types import MessageModel
+
+# Rough average for Spanish and English text with Gemini's tokenizer.
+CHARS_PER_TOKEN = 4
+
+# Gemini bills small images as a fixed 258 tokens. Larger media costs more,
+# but this is only meant to keep the estimate in the right ballpark.
+FILE_TOKENS = 258
+
+type Summarizer = Callable[[str | None, list[ModelMessage]], Awaitable[str]]
+"""Takes the previous summary (if any) and the messages to fold into it."""
+
+
+def _text_tokens(text: str) -> int:
+    return ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _part_tokens(part: ModelRequestPart | ModelResponsePart) -> int:
+    match part:
+        case SystemPromptPart() | TextPart() | ThinkingPart():
+            return _text_tokens(part.content)
+        case UserPromptPart():
+            if isinstance(part.content, str):
+                return _text_tokens(part.content)
+
+            return sum(
+                _text_tokens(item) if isinstance(item, str) else FILE_TOKENS
+                for item in part.content
+            )
+        case ToolReturnPart():
+            return _text_tokens(part.model_response_str())
+        case RetryPromptPart():
+            return _text_tokens(part.model_response())
+        case ToolCallPart():
+            return _text_tokens(part.tool_name) + _text_tokens(part.args_as_json_str())
+
+    assert_never(part)
+
+
+def estimate_tokens(messages: Sequence[ModelMessage]) -> int:
+    """Estimate how many prompt tokens :messages: take, without calling the API."""
+    return sum(_part_tokens(part) for message in messages for part in message.parts)
+
+
+def flatten(messages: Sequence[MessageModel]) -> list[ModelMessage]:
+    return [model_message for message in messages for model_message in message.message_text]
+
+
+@dataclass
+class HistoryStats:
+    total_tokens: int = 0
+    """Estimated tokens of the whole conversation."""
+    prompt_tokens: int = 0
+    """Estimated tokens of the history actually sent to the model."""
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.total_tokens - self.prompt_tokens
+
+
+@final
+class HistoryManager:
+    """
+    Decides which part of a conversation is sent to the model on each turn.
+
+    Strategies:
+        - `all`: the whole conversation.
+        - `window`: the last `max_messages` messages.
+        - `tokens`: as many of the latest messages as fit in `token_budget`.
+        - `summary`: like `tokens`, but older messages are folded into a
+          rolling summary instead of being dropped. The summary is cached and
+          only extended once the recent messages outgrow the budget again.
+
+    Messages are never split, so tool calls always keep their returns. The
+    system prompt of dropped messages is kept. The agent only adds its system
+    prompt to an empty history, so if a history has none (e.g. its first
+    messages were not loaded), the one of `system_prompt` is added.
+    """
+
+    def __init__(
+        self,
+        strategy: HistoryTag = "all",
+        *,
+        max_messages: int = 20,
+        token_budget: int = 32_000,
+        summarizer: Summarizer | None = None,
+        system_prompt: Callable[[], SystemPromptPart] | None = None,
+    ) -> None:
+        if strategy == "summary" and summarizer is None:
+            raise ValueError("The summary strategy needs a summarizer.")
+
+        self._strategy: HistoryTag = strategy
+        self._max_messages = max_messages
+        self._token_budget = token_budget
+        self._summarizer = summarizer
+        self._system_prompt = system_prompt
+
+        self._summary: str | None = None
+        self._summarized_ids = set[str]()
+
+        self.last_stats = HistoryStats()
+        self.saved_tokens = 0
+        """Estimated prompt tokens saved across every turn so far."""
+
+    @classmethod
+    def from_env(
+        cls,
+        env: Environment,
+        summarizer: Summarizer | None = None,
+        system_prompt: Callable[[], SystemPromptPart] | None = None,
+    ) -> "HistoryManager":
+        return cls(
+            env.history,
+            max_messages=env.history_max_messages,
+            token_budget=env.history_token_budget,
+            summarizer=summarizer,
+            system_prompt=system_prompt,
+        )
+
+    @property
+    def messages_needed(self) -> int | None:
+        """
+        How many of the latest messages `build` may keep, so a resumed
+        conversation only needs those loaded. `None` if it may keep them all.
+        """
+        match self._strategy:
+            case "all" | "summary":
+                return None
+            case "window":
+                return max(self._max_messages, 0)
+            case "tokens":
+                # Each message takes at least a token, and the latest one is
+                # kept even past the budget.
+                return self._token_budget + 1
+            case _:
+                assert_never(self._strategy)
+
+    async def build(self, messages: Sequence[MessageModel]) -> list[ModelMessage]:
+        """
+        Build the message history for the next run.
+
+        Args:
+            messages: Every message in the conversation, oldest first.
+
+        Returns:
+            The history to send to the model.
+        """
+        match self._strategy:
+            case "all":
+                kept = list(messages)
+            case "window":
+                kept = list(messages[-self._max_messages :]) if self._max_messages > 0 else []
+            case "tokens":
+                kept = self._fit(messages, self._token_budget)
+            case "summary":
+                kept = await self._summarize(messages)
+            case _:
+                assert_never(self._strategy)
+
+        dropped = messages[: len(messages) - len(kept)]
+        history = flatten(kept)
+
+        prefix = list[ModelRequestPart](_system_prompts(dropped))
+
+        if self._strategy == "summary" and self._summary is not None:
+            summary = f"Summary of the earlier part of this conversation:\n{self._summary}"
+            prefix.append(SystemPromptPart(summary))
+
+        if self._system_prompt is not None and history and not _has_system_prompt(prefix, history):
+            prefix.insert(0, self._system_prompt())
+
+        if prefix:
+            history.insert(0, ModelRequest(parts=prefix))
+
+        self.last_stats = HistoryStats(
+            total_tokens=estimate_tokens(flatten(messages)),
+            prompt_tokens=estimate_tokens(history),
+        )
+        self.saved_tokens += self.last_stats.saved_tokens
+
+        return history
+
+    def _fit(self, messages: Sequence[MessageModel], budget: int) -> list[MessageModel]:
+        kept = list[MessageModel]()
+        used = 0
+
+        for message in reversed(messages):
+            used += estimate_tokens(message.message_text)
+
+            if used > budget and kept:
+                break
+
+            kept.append(message)
+
+        kept.reverse()
+        return kept
+
+    async def _summarize(self, messages: Sequence[MessageModel]) -> list[MessageModel]:
+        assert self._summarizer is not None
+
+        recent = [message for message in messages if message.message_id not in self._summarized_ids]
+
+        if estimate_tokens(flatten(recent)) <= self._token_budget:
+            return recent
+
+        # Fold until only half the budget is left, so the summary is not
+        # extended again on the very next turn.
+        kept = self._fit(recent, self._token_budget // 2)
+        folded = recent[: len(recent) - len(kept)]
+
+        self._summary = await self._summarizer(self._summary, flatten(folded))
+        self._summarized_ids.update(message.message_id for message in folded)
+
+        return kept
+
+
+def _system_prompts(messages: Sequence[MessageModel]) -> list[SystemPromptPart]:
+    return [
+        part
+        for message in messages
+        for model_message in message.message_text
+        if isinstance(model_message, ModelRequest)
+        for part in model_message.parts
+        if isinstance(part, SystemPromptPart)
+    ]
+
+
+def _has_system_prompt(prefix: Sequence[ModelRequestPart], history: Sequence[ModelMessage]) -> bool:
+    """Whether a part of :prefix: or :history: is the agent's own, dynamic, system prompt."""
+    requests = [message for message in history if isinstance(message, ModelRequest)]
+    parts = [*prefix, *(part for request in requests for part in request.parts)]
+    return any(isinstance(part, SystemPromptPart) and part.dynamic_ref for part in parts)
@@ -1,18 +1,38 @@
+import atexit
+from collections import OrderedDict
 from collections.abc import Sequence
 from datetime import datetime, timezone
+import logging
 from pathlib import Path
+import threading
 from typing import assert_never
 from uuid import uuid4
 
 from pydantic_ai.messages import ModelMessage
 
+from chat.clients import create_bq_writer
+from chat.conversation_log import ConversationLog
 from chat.types import Dependencies
 from repository.conversation import ConversationRepository
 from repository.message import MessageRepository
 from repository.types import ConversationModel, MessageModel, SenderType
+from telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
 
 MEMORY_DIR = Path(__file__).parent / "../../memory/"
 
+# How many of the latest messages of a conversation log are kept in memory,
+# to resume it without reading them from the file.
+LOG_TAIL_SIZE = 64
+
+# How many conversation logs are kept open. The least recently used one is
+# closed past that, and opened again if its conversation goes on.
+MAX_OPEN_LOGS = 256
+
+_logs = OrderedDict[Path, ConversationLog]()
+_logs_lock = threading.Lock()
+
 def add_message(
     deps: Dependencies,
     sender: SenderType,
@@ -22,28 +42,45 @@ def add_message(
     user_id = deps.user.user_id
     conversation_id = deps.conversation.conversation_id
 
-    match memory:
-        case "bigquery":
-            _ = MessageRepository(deps.bq_client, deps.env.project_id, deps.env.dataset).create(conversation_id, sender, message)
-            return
-        case "local":
-            conversation = retrieve_conversation(deps)
-
-            assert conversation is not None
-
-            conversation.messages.append(MessageModel(
-                message_id=str(uuid4()),
-                conversation_id=conversation_id,
-                message_text=list(message),
-                sender=sender,
-                timestamp=datetime.now(timezone.utc)
-            ))
-
-            _ = get_path(user_id, conversation_id).write_text(conversation.model_dump_json())
-            return
-
-    assert_never(memory)
-
+    with get_telemetry().span("chat.persist", memory=memory, sender=sender):
+        match memory:
+            case "bigquery":
+                message_id = MessageRepository(
+                    deps.bq_client,
+                    deps.env.project_id,
+                    deps.env.dataset,
+                    writer=create_bq_writer(deps.bq_client),
+                ).create(conversation_id, sender, message)
+            case "local":
+                message_id = str(uuid4())
+                get_log(user_id, conversation_id).append(
+                    _make_message(message_id, conversation_id, sender, message)
+                )
+            case _:
+                assert_never(memory)
+
+    logger.debug("Saved %s message %s.", sender, message_id)
+
+    # Bots are kept alive between turns, so the in-process conversation must
+    # follow what was persisted.
+    deps.conversation.messages.append(
+        _make_message(message_id, conversation_id, sender, message)
+    )
+
+
+def _make_message(
+    message_id: str,
+    conversation_id: str,
+    sender: SenderType,
+    message: Sequence[ModelMessage],
+) -> MessageModel:
+    return MessageModel(
+        message_id=message_id,
+        conversation_id=conversation_id,
+        message_text=list(message),
+        sender=sender,
+        timestamp=datetime.now(timezone.utc)
+    )
 
 
 def retrieve_conversation(
@@ -56,18 +93,49 @@ def retrieve_conversation(
     match memory:
         case "bigquery":
             return ConversationRepository(
-                deps.bq_client, deps.env.project_id, deps.env.dataset
+                deps.bq_client,
+                deps.env.project_id,
+                deps.env.dataset,
+                lookback=deps.env.partition_lookback,
             ).read(conversation_id)
         case "local":
-            path = get_path(user_id, conversation_id)
-
-            if not path.exists():
-                return None
-
-            return ConversationModel.model_validate_json(path.read_text())
+            return get_log(user_id, conversation_id).read()
 
     assert_never(memory)
 
 
 def get_path(user_id: str, conversation_id: str):
-    return MEMORY_DIR / f"conversation_{conversation_id}_of_user_{user_id}.json"
+    """The path of a local conversation, without suffix. See `ConversationLog`."""
+    return MEMORY_DIR / f"conversation_{conversation_id}_of_user_{user_id}"
+
+
+def get_log(user_id: str, conversation_id: str) -> ConversationLog:
+    path = get_path(user_id, conversation_id)
+    evicted = list[ConversationLog]()
+
+    with _logs_lock:
+        log = _logs.get(path)
+
+        if log is None:
+            log = _logs[path] = ConversationLog(path, tail_size=LOG_TAIL_SIZE)
+        else:
+            _logs.move_to_end(path)
+
+        while len(_logs) > MAX_OPEN_LOGS:
+            evicted.append(_logs.popitem(last=False)[1])
+
+    for old in evicted:
+        old.close()
+
+    return log
+
+
+@atexit.register
+def close_logs() -> None:
+    """Close every open conversation log, and forget them."""
+    with _logs_lock:
+        logs = list(_logs.values())
+        _logs.clear()
+
+    for log in logs:
+        log.close()
@@ -0,0 +1,33 @@
+from collections.abc import AsyncIterable, AsyncIterator, Callable
+import time
+
+
+async def coalesce(
+    deltas: AsyncIterable[str],
+    *,
+    interval: float,
+    max_chars: int,
+    clock: Callable[[], float] = time.monotonic,
+) -> AsyncIterator[str]:
+    """
+    Group the text :deltas: of a stream, yielding what was buffered once it
+    is at least :max_chars: long or :interval: seconds have passed since the
+    previous yield, whichever comes first. What is left is yielded at the end.
+    """
+    buffer = list[str]()
+    buffered = 0
+    last = clock()
+
+    async for delta in deltas:
+        buffer.append(delta)
+        buffered += len(delta)
+        now = clock()
+
+        if buffered >= max_chars or now - last >= interval:
+            yield "".join(buffer)
+            buffer.clear()
+            buffered = 0
+            last = now
+
+    if buffer:
+        yield "".join(buffer)
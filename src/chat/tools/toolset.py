@@ -1,9 +1,17 @@
+from dataclasses import dataclass
+import logging
+from typing import Any
+
 from pydantic_ai import RunContext
-from pydantic_ai.toolsets import CombinedToolset, FunctionToolset
+from pydantic_ai.toolsets import CombinedToolset, FunctionToolset, WrapperToolset
+from pydantic_ai.toolsets.abstract import ToolsetTool
 
 from chat.types import Dependencies
 from forms.toolset import form_tools
 from rag.toolset import rag_toolset
+from telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
 
 
 _local_funcs = FunctionToolset[Dependencies](max_retries=3)
@@ -26,15 +34,32 @@ def dev_debug_dependencies(ctx: RunContext[Dependencies], input: str) -> Depende
         The dependencies object.
     """
 
-    print(f"{input = }")
-    # Avoid printing sensitive data - only print safe fields
-    print(f"Environment: {ctx.deps.env.environment}")
+    logger.debug("input = %r", input)
+    # Avoid logging sensitive data - only log safe fields
+    logger.debug("Environment: %s", ctx.deps.env.environment)
 
     return ctx.deps
 
 
+@dataclass
+class TimedToolset(WrapperToolset[Dependencies]):
+    """Times every call to a tool of the wrapped toolset as a `tool.<name>` span."""
+
+    async def call_tool(
+        self,
+        name: str,
+        tool_args: dict[str, Any],
+        ctx: RunContext[Dependencies],
+        tool: ToolsetTool[Dependencies],
+    ) -> Any:
+        with get_telemetry().span(f"tool.{name}"):
+            return await super().call_tool(name, tool_args, ctx, tool)
+
+
 # If you make other toolsets, add them here.
 # This is what is loaded into the bot.
-main_toolset = CombinedToolset[Dependencies]([_local_funcs, form_tools, rag_toolset]).filtered(
-    lambda ctx, tool: ctx.deps.env.environment == "dev" or not tool.name.startswith("dev_")
+main_toolset = TimedToolset(
+    CombinedToolset[Dependencies]([_local_funcs, form_tools, rag_toolset]).filtered(
+        lambda ctx, tool: ctx.deps.env.environment == "dev" or not tool.name.startswith("dev_")
+    )
 )
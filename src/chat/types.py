@@ -1,4 +1,6 @@
-from typing import Literal
+from collections.abc import Iterator
+import hashlib
+from typing import Literal, final
 from google.cloud import bigquery
 from google.genai.client import AsyncClient
 from pydantic import BaseModel, ConfigDict, TypeAdapter
@@ -11,13 +13,13 @@ from repository.types import ConversationModel, UserModel
 
 UserId = str
 
-class Citation(BaseModel):
+class Citation(BaseModel, frozen=True):
     tag: Literal["citation"] = "citation"
     text: str
     author: str
 
 
-class Link(BaseModel):
+class Link(BaseModel, frozen=True):
     tag: Literal["link"] = "link"
     text: str
     author: str
@@ -26,11 +28,44 @@ class Link(BaseModel):
 type Quote = Citation | Link
 
 
+@final
+class QuoteCollector:
+    """
+    The quotes of a single run, in the order they were first added. A quote
+    of the same document with the same text is only kept once.
+    """
+
+    def __init__(self) -> None:
+        self._quotes = dict[tuple[str, str], Quote]()
+
+    def add(self, quote: Quote) -> None:
+        match quote:
+            case Citation():
+                content = quote.text
+            case Link():
+                content = quote.link
+
+        key = (quote.author, hashlib.sha256(content.encode()).hexdigest())
+        _ = self._quotes.setdefault(key, quote)
+
+    def __iter__(self) -> Iterator[Quote]:
+        return iter(self._quotes.values())
+
+    def __len__(self) -> int:
+        return len(self._quotes)
+
+
 class TextAnswer(BaseModel):
     kind: Literal["text"] = "text"
     text: str
 
-AnswerPart = TextAnswer | BinaryContent
+
+class TextDelta(BaseModel):
+    """Text to append to the answer streamed so far."""
+    kind: Literal["delta"] = "delta"
+    text: str
+
+AnswerPart = TextAnswer | TextDelta | BinaryContent
 
 class Answer(BaseModel):
     content: AnswerPart
@@ -41,7 +76,7 @@ class Dependencies:
     env: Environment
     google_client: AsyncClient
     bq_client: bigquery.Client
-    quotes: list[Quote]
+    quotes: QuoteCollector
     conversation: ConversationModel
     user: UserModel
 
@@ -1,6 +1,6 @@
 """
 In this module we should:
 
-- [ ] Define a method to generate embeddings.
-- [ ] Vectorize
+- [x] Define a method to generate embeddings.
+- [x] Vectorize
 """
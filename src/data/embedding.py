@@ -1 +1,436 @@
-def create_embeddings(): ...
+# pyright: reportUnknownMemberType=false, reportUnknownVariableType=false
+import asyncio
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import hashlib
+import io
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Protocol, final
+
+from google.cloud import bigquery
+from google.genai.client import AsyncClient
+import numpy as np
+from pydantic import BaseModel
+
+from rag.local_index import LocalVectorIndex
+from rag.types import DocumentFragment
+
+EMBEDDING_MODEL = "models/embedding-001"
+
+# Gemini embedding pricing, in USD per million input tokens. Only used for the
+# estimate in the report.
+PRICE_PER_MILLION_TOKENS = 0.15
+CHARS_PER_TOKEN = 4
+
+
+class SourceDocument(BaseModel):
+    """A document to split into fragments. Its id is what the bot cites."""
+
+    document_id: str
+    text: str
+
+
+def read_documents(directory: Path, pattern: str = "**/*.md") -> Iterator[SourceDocument]:
+    """Lazily read every file matching :pattern: under :directory:."""
+    for path in sorted(directory.glob(pattern)):
+        if path.is_file():
+            yield SourceDocument(
+                document_id=path.relative_to(directory).as_posix(),
+                text=path.read_text(encoding="utf-8"),
+            )
+
+
+def chunk_text(text: str, size: int = 1000, overlap: int = 200) -> list[str]:
+    """
+    Split :text: into chunks of at most :size: characters, each repeating the
+    last :overlap: characters of the previous one. Chunks end at whitespace
+    when possible, so words are not cut in half.
+    """
+    if overlap >= size:
+        raise ValueError("The overlap must be smaller than the chunk size.")
+
+    text = text.strip()
+    chunks = list[str]()
+    start = 0
+
+    while start < len(text):
+        end = min(start + size, len(text))
+
+        if end < len(text):
+            space = text.rfind(" ", start + overlap + 1, end)
+            newline = text.rfind("\n", start + overlap + 1, end)
+            end = max(space, newline) if max(space, newline) > 0 else end
+
+        chunk = text[start:end].strip()
+
+        if chunk:
+            chunks.append(chunk)
+
+        if end == len(text):
+            break
+
+        start = end - overlap
+
+    return chunks
+
+
+def content_hash(text: str) -> str:
+    """Hex SHA-256 of the UTF-8 text, the same as BigQuery's `TO_HEX(SHA256(text))`."""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+type EmbeddedFragment = tuple[DocumentFragment, list[float]]
+
+
+class FragmentSink(Protocol):
+    """Where embedded fragments are written."""
+
+    def existing(self) -> dict[str, set[str]]:
+        """The content hashes already stored, by document id."""
+        ...
+
+    def write(self, fragments: list[EmbeddedFragment]) -> None: ...
+
+    def remove(self, document_id: str, hashes: set[str]) -> None:
+        """Remove the fragments of :document_id: with the given content hashes."""
+        ...
+
+    def close(self) -> None: ...
+
+
+@final
+class LocalIndexSink:
+    """
+    Writes fragments to the `LocalVectorIndex` at :path:, saved once when the
+    sink is closed.
+
+    Until then embeddings are kept as float32 arrays, one per write, and the
+    index that was already at :path: as a single matrix. Saving replaces the
+    files of the index, so a server using the previous one is not disturbed.
+    Writes and removals may come from several threads.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._fragments = list[DocumentFragment]()
+        self._blocks = list[np.ndarray]()
+
+        if path.with_name(f"{path.name}.npy").is_file():
+            index = LocalVectorIndex.load(path)
+            self._fragments = list(index.fragments)
+            # A copy, rather than the memory-mapped file the index is read from.
+            self._blocks = [np.array(index.embeddings, dtype=np.float32)]
+
+    def existing(self) -> dict[str, set[str]]:
+        existing = dict[str, set[str]]()
+
+        with self._lock:
+            for fragment in self._fragments:
+                existing.setdefault(fragment.document_id, set()).add(
+                    content_hash(fragment.fragment_text)
+                )
+
+        return existing
+
+    def write(self, fragments: list[EmbeddedFragment]) -> None:
+        if not fragments:
+            return
+
+        block = np.asarray([vector for _, vector in fragments], dtype=np.float32)
+
+        with self._lock:
+            self._fragments.extend(fragment for fragment, _ in fragments)
+            self._blocks.append(block)
+
+    def remove(self, document_id: str, hashes: set[str]) -> None:
+        with self._lock:
+            keep = [
+                fragment.document_id != document_id
+                or content_hash(fragment.fragment_text) not in hashes
+                for fragment in self._fragments
+            ]
+
+            if all(keep):
+                return
+
+            self._fragments = [fragment for fragment, kept in zip(self._fragments, keep) if kept]
+            self._blocks = [self._matrix()[np.asarray(keep)]]
+
+    def close(self) -> None:
+        with self._lock:
+            LocalVectorIndex.from_matrix(self._fragments, self._matrix()).save(self._path)
+
+    def _matrix(self) -> np.ndarray:
+        blocks = [block for block in self._blocks if block.size]
+        return np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+
+
+@final
+class BigQuerySink:
+    """Appends fragments to the fragments table with one load job per write."""
+
+    def __init__(self, client: bigquery.Client, table_ref: str) -> None:
+        self.client: bigquery.Client = client
+        self.table_ref: str = table_ref
+
+    def existing(self) -> dict[str, set[str]]:
+        query = f"""
+            SELECT document_id, ARRAY_AGG(DISTINCT TO_HEX(SHA256(fragment_text))) AS hashes
+            FROM `{self.table_ref}`
+            GROUP BY document_id"""
+
+        return {row.document_id: set(row.hashes) for row in self.client.query(query).result()}
+
+    def write(self, fragments: list[EmbeddedFragment]) -> None:
+        rows = "".join(
+            json.dumps({**fragment.model_dump(mode="json"), "embedding": vector}) + "\n"
+            for fragment, vector in fragments
+        )
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        )
+        load_job = self.client.load_table_from_file(
+            io.BytesIO(rows.encode()), self.table_ref, job_config=job_config
+        )
+        _ = load_job.result()
+
+    def remove(self, document_id: str, hashes: set[str]) -> None:
+        query = f"""
+            DELETE FROM `{self.table_ref}`
+            WHERE document_id = @document_id
+            AND TO_HEX(SHA256(fragment_text)) IN UNNEST(@hashes)"""
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("document_id", "STRING", document_id),
+                bigquery.ArrayQueryParameter("hashes", "STRING", sorted(hashes)),
+            ]
+        )
+        _ = self.client.query(query, job_config=job_config).result()
+
+    def close(self) -> None:
+        pass
+
+
+@final
+class RateLimiter:
+    """Spaces calls so there are at most :per_minute: of them each minute."""
+
+    def __init__(self, per_minute: float) -> None:
+        self._interval = 60 / per_minute
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self._interval
+
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+@dataclass
+class IngestionReport:
+    documents: int = 0
+    chunks: int = 0
+    duplicates: int = 0
+    """Chunks skipped because an identical one was already seen in this run."""
+    unchanged: int = 0
+    """Chunks skipped because they were already stored."""
+    embedded: int = 0
+    removed: int = 0
+    """Stored chunks removed because their document no longer contains them."""
+    embedded_characters: int = 0
+    seconds: float = 0.0
+    errors: list[str] = field(default_factory=list)
+    failed_documents: set[str] = field(default_factory=set)
+    """Documents with fragments not embedded or written. Their stale chunks are kept."""
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    @property
+    def estimated_cost(self) -> float:
+        """Estimated embedding cost of this run, in USD."""
+        tokens = self.embedded_characters / CHARS_PER_TOKEN
+        return tokens / 1_000_000 * PRICE_PER_MILLION_TOKENS
+
+    def __str__(self) -> str:
+        return (
+            f"{self.documents} documents, {self.chunks} chunks "
+            f"({self.embedded} embedded, {self.unchanged} unchanged, "
+            f"{self.duplicates} duplicated, {self.removed} removed) "
+            f"in {self.seconds:.1f}s: {self.chunks_per_second:.1f} chunks/s, "
+            f"~${self.estimated_cost:.4f}"
+        )
+
+
+async def create_embeddings(
+    documents: Iterable[SourceDocument],
+    sink: FragmentSink,
+    google_client: AsyncClient,
+    *,
+    chunk_size: int = 1000,
+    overlap: int = 200,
+    batch_size: int = 100,
+    concurrency: int = 4,
+    requests_per_minute: float = 300,
+    embedding_model: str = EMBEDDING_MODEL,
+) -> IngestionReport:
+    """
+    Split :documents: into fragments, embed them and write them to :sink:.
+
+    Documents are consumed lazily and at most :concurrency: batches of
+    :batch_size: fragments are in flight. The embeddings are only kept by the
+    sink: `BigQuerySink` writes each batch out, while `LocalIndexSink` keeps
+    the whole index in memory until it is saved. The sink is closed even if
+    the run fails. Fragments whose content is already stored for their
+    document are not embedded again, and stored fragments that are no longer
+    part of their document are removed once all of its new ones are written,
+    so re-running on a changed corpus only pays for what changed.
+
+    Returns:
+        What was done, with throughput and estimated cost.
+    """
+    report = IngestionReport()
+    start = time.perf_counter()
+    limiter = RateLimiter(requests_per_minute)
+    existing = sink.existing()
+    seen = set[str]()
+    pending = set[asyncio.Task[None]]()
+    batch = list[DocumentFragment]()
+    # The hashes of the stored fragments of each document it no longer has.
+    stale = dict[str, set[str]]()
+
+    async def embed(fragments: list[DocumentFragment]) -> None:
+        await limiter.acquire()
+
+        try:
+            response = await google_client.models.embed_content(
+                model=embedding_model,
+                contents=[fragment.fragment_text for fragment in fragments],
+                config={"task_type": "retrieval_document"},
+            )
+            embeddings = response.embeddings or []
+            rows = [
+                (fragment, embedding.values)
+                for fragment, embedding in zip(fragments, embeddings)
+                if embedding.values
+            ]
+
+            await asyncio.to_thread(sink.write, rows)
+        except Exception as error:
+            report.errors.append(f"{len(fragments)} fragments not embedded: {error!r}")
+            report.failed_documents.update(fragment.document_id for fragment in fragments)
+            return
+
+        written = {id(fragment) for fragment, _ in rows}
+        report.failed_documents.update(
+            fragment.document_id for fragment in fragments if id(fragment) not in written
+        )
+        report.embedded += len(rows)
+        report.embedded_characters += sum(len(fragment.fragment_text) for fragment, _ in rows)
+
+    async def submit(fragments: list[DocumentFragment]) -> None:
+        while len(pending) >= concurrency:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending.difference_update(done)
+
+        pending.add(asyncio.create_task(embed(fragments)))
+
+    try:
+        for document in documents:
+            report.documents += 1
+            created_at = datetime.now(timezone.utc)
+            stored = existing.get(document.document_id, set())
+            hashes = set[str]()
+
+            for text in chunk_text(document.text, chunk_size, overlap):
+                report.chunks += 1
+                fragment_hash = content_hash(text)
+                hashes.add(fragment_hash)
+
+                if fragment_hash in seen:
+                    report.duplicates += 1
+                    continue
+
+                seen.add(fragment_hash)
+
+                if fragment_hash in stored:
+                    report.unchanged += 1
+                    continue
+
+                batch.append(
+                    DocumentFragment(
+                        document_id=document.document_id, fragment_text=text, created_at=created_at
+                    )
+                )
+
+                if len(batch) >= batch_size:
+                    await submit(batch)
+                    batch = []
+
+            if stored - hashes:
+                stale[document.document_id] = stored - hashes
+
+        if batch:
+            await submit(batch)
+
+        _ = await asyncio.gather(*pending)
+
+        # Only once the new fragments are written, so a failed batch does not
+        # leave its document out of the index.
+        for document_id, hashes in stale.items():
+            if document_id not in report.failed_documents:
+                await asyncio.to_thread(sink.remove, document_id, hashes)
+                report.removed += len(hashes)
+    finally:
+        for task in pending:
+            _ = task.cancel()
+
+        _ = await asyncio.gather(*pending, return_exceptions=True)
+        sink.close()
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+async def main(directory: Path) -> None:
+    from chat.clients import create_bq_client, create_google_client
+    from env import env
+
+    environment = env()
+
+    match environment.rag:
+        case "local":
+            sink = LocalIndexSink(environment.rag_index)
+        case "bigquery":
+            sink = BigQuerySink(
+                create_bq_client(environment.project_id),
+                f"{environment.project_id}.{environment.dataset}.{environment.table}",
+            )
+
+    report = await create_embeddings(
+        read_documents(directory),
+        sink,
+        create_google_client(environment.google_cloud_api_key).aio,
+    )
+
+    print(report)
+
+    for error in report.errors:
+        print(error)
+
+
+if __name__ == "__main__":
+    import sys
+
+    asyncio.run(main(Path(sys.argv[1])))
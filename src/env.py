@@ -1,11 +1,18 @@
+from datetime import timedelta
 from functools import cache
 import os
+from pathlib import Path
 from typing import Literal
 from uuid import uuid4
 from pydantic import BaseModel, Field
 
 EnvironmentTag = Literal["prod", "dev"]
 MemoryTag = Literal["local", "bigquery"]
+HistoryTag = Literal["all", "window", "tokens", "summary"]
+RagTag = Literal["bigquery", "local"]
+StreamTag = Literal["full", "delta"]
+ServeTag = Literal["single", "multi"]
+FormsTag = Literal["local", "bigquery"]
 
 class Environment(BaseModel, frozen=True):
     google_cloud_api_key: str = Field(alias="GOOGLE_CLOUD_API_KEY")
@@ -17,6 +24,70 @@ class Environment(BaseModel, frozen=True):
     dataset: str = Field(alias='DATASET')
     table: str = Field(alias='TABLE')
     memory: MemoryTag = Field(default="local", alias="MEMORY")
+    rag: RagTag = Field(default="bigquery", alias="RAG")
+    rag_index: Path = Field(
+        default=Path(__file__).parent / "../memory/rag_index", alias="RAG_INDEX"
+    )
+    forms: FormsTag = Field(default="local", alias="FORMS")
+    forms_path: Path = Field(
+        default=Path(__file__).parent / "../memory/forms.sqlite3", alias="FORMS_PATH"
+    )
+    # The whole conversation is sent by default, as before there was a choice;
+    # "tokens", "window" and "summary" send less of long ones.
+    history: HistoryTag = Field(default="all", alias="HISTORY")
+    history_max_messages: int = Field(default=20, alias="HISTORY_MAX_MESSAGES")
+    history_token_budget: int = Field(default=32_000, alias="HISTORY_TOKEN_BUDGET")
+    # Gradio is sent the whole message on every update either way, so what it
+    # gets depends on how many updates there are: "full" debounces them every
+    # STREAM_INTERVAL, "delta" also every STREAM_CHARS characters, so it only
+    # saves building and passing the snapshots in the process.
+    stream: StreamTag = Field(default="full", alias="STREAM")
+    stream_interval: float = Field(default=0.05, alias="STREAM_INTERVAL")
+    stream_chars: int = Field(default=256, alias="STREAM_CHARS")
+    blob_dir: Path = Field(default=Path(__file__).parent / "../memory/blobs", alias="BLOB_DIR")
+    upload_max_bytes: int = Field(default=20 * 1024 * 1024, alias="UPLOAD_MAX_BYTES")
+    # With "multi", every UI session chats as its own user in its own
+    # conversation, and the UI may run as several worker processes.
+    serve: ServeTag = Field(default="single", alias="SERVE")
+    workers: int = Field(default=1, alias="WORKERS")
+    host: str = Field(default="127.0.0.1", alias="HOST")
+    port: int = Field(default=7860, alias="PORT")
+    concurrency_limit: int = Field(default=16, alias="CONCURRENCY_LIMIT")
+    max_queue: int = Field(default=256, alias="MAX_QUEUE")
+    log_level: str = Field(default="INFO", alias="LOG_LEVEL")
+    # If set, timings are served on this port (on the next ones for the
+    # other workers), on /metrics for Prometheus and /spans as OTLP/JSON.
+    metrics_port: int | None = Field(default=None, alias="METRICS_PORT")
+    # BigQuery reads of messages only look at the partitions of these last
+    # days, and older messages are not resumed. 0 reads every partition.
+    partition_lookback_days: int = Field(default=365, alias="PARTITION_LOOKBACK_DAYS")
+    # The same for forms, which are kept for good, so all of them are read
+    # unless set.
+    forms_lookback_days: int = Field(default=0, alias="FORMS_LOOKBACK_DAYS")
+    # HTTP connections of the BigQuery and Gemini clients, each. Idle ones are
+    # kept open for reuse up to `client_keepalive_seconds`.
+    client_max_connections: int = Field(default=100, alias="CLIENT_MAX_CONNECTIONS")
+    client_max_keepalive: int = Field(default=50, alias="CLIENT_MAX_KEEPALIVE")
+    client_keepalive_seconds: float = Field(default=60.0, alias="CLIENT_KEEPALIVE_SECONDS")
+    # HTTP/2 for Gemini, which needs the `h2` package (`httpx[http2]`).
+    client_http2: bool = Field(default=False, alias="CLIENT_HTTP2")
+    # If set, the first question of a conversation is answered from an earlier
+    # answer when their embeddings are at least this similar (cosine).
+    answer_cache_threshold: float | None = Field(default=None, alias="ANSWER_CACHE_THRESHOLD")
+    answer_cache_entries: int = Field(default=1024, alias="ANSWER_CACHE_ENTRIES")
+    answer_cache_ttl: float = Field(default=24 * 60 * 60, alias="ANSWER_CACHE_TTL")
+
+    @property
+    def partition_lookback(self) -> timedelta | None:
+        return _lookback(self.partition_lookback_days)
+
+    @property
+    def forms_lookback(self) -> timedelta | None:
+        return _lookback(self.forms_lookback_days)
+
+
+def _lookback(days: int) -> timedelta | None:
+    return timedelta(days=days) if days > 0 else None
 
 
 # This is the only global state, but that's intentional.
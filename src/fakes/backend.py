@@ -0,0 +1,127 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, final
+from uuid import uuid4
+
+from pydantic_ai.models import Model
+
+from chat.agents import get_agent
+from chat.bot import Bot
+from chat.clients import PoolSettings
+from chat.factory import BotFactory
+from chat.tools.toolset import main_toolset
+from data.embedding import BigQuerySink
+from env import Environment
+from fakes.bigquery import FakeBigQueryClient
+from fakes.genai import FakeGoogleClient, fake_embedding
+from rag.types import DocumentFragment
+
+TOPICS = [
+    "Ithaka ofrece mentorías a emprendedores de la Universidad Católica del Uruguay.",
+    "Los talleres de validación de ideas se dictan cada semestre en el campus de Montevideo.",
+    "Estudiantes, docentes y egresados pueden postular sus proyectos a la incubadora.",
+    "El fondo semilla financia prototipos de emprendimientos con impacto social.",
+    "La red de contactos de Ithaka conecta proyectos con inversores y empresas.",
+    "Las consultas sobre becas y convocatorias se responden por correo electrónico.",
+]
+
+
+def synthetic_fragments(count: int) -> list[DocumentFragment]:
+    """:count: fragments cycling over `TOPICS`, each with a distinct suffix."""
+    now = datetime.now(timezone.utc)
+
+    return [
+        DocumentFragment(
+            document_id=f"faq-{index % len(TOPICS)}",
+            fragment_text=f"{TOPICS[index % len(TOPICS)]} Referencia {index}.",
+            created_at=now,
+        )
+        for index in range(count)
+    ]
+
+
+@final
+@dataclass
+class FakeBackend:
+    """
+    Fake Gemini and BigQuery clients, and an environment that uses them for
+    the memory and the RAG, so whole turns of a `Bot` run offline.
+    """
+
+    environment: Environment
+    bq_client: FakeBigQueryClient
+    google_client: FakeGoogleClient
+
+    @classmethod
+    def create(
+        cls,
+        directory: Path,
+        *,
+        bq_latency: float = 0.0,
+        embedding_latency: float = 0.0,
+        fragments: int = 200,
+        **variables: Any,
+    ) -> "FakeBackend":
+        """
+        :param directory: Where uploads are stored.
+        :param fragments: How many synthetic fragments the RAG table has.
+        :param variables: Environment variables to override, e.g. `HISTORY`.
+        """
+        environment = Environment.model_validate(
+            {
+                "GOOGLE_CLOUD_API_KEY": "fake",
+                "PROJECT_ID": "fake",
+                "BUCKET_NAME": "fake",
+                "DATASET": "fake",
+                "TABLE": "fragments",
+                "MEMORY": "bigquery",
+                "RAG": "bigquery",
+                "BLOB_DIR": directory / "blobs",
+                **variables,
+            }
+        )
+        bq_client = FakeBigQueryClient.for_dataset(
+            environment.project_id, environment.dataset, environment.table, latency=bq_latency
+        )
+
+        BigQuerySink(
+            bq_client, f"{environment.project_id}.{environment.dataset}.{environment.table}"
+        ).write(
+            [
+                (fragment, fake_embedding(fragment.fragment_text))
+                for fragment in synthetic_fragments(fragments)
+            ]
+        )
+
+        # Loading the corpus is setup, not part of what is measured.
+        bq_client.loads = 0
+
+        return cls(environment, bq_client, FakeGoogleClient(latency=embedding_latency))
+
+    def factory(self) -> BotFactory:
+        return BotFactory(bq_client=self.bq_client, google_client=self.google_client)
+
+    def session_environment(self) -> Environment:
+        """The environment with a new user and conversation."""
+        return self.environment.model_copy(
+            update={"user_id": str(uuid4()), "conversation_id": str(uuid4())}
+        )
+
+    async def bot(self, environment: Environment | None = None) -> Bot:
+        """A `Bot` for :environment:, or for a new conversation if `None`."""
+        return await self.factory().from_env(environment or self.session_environment())
+
+    @contextmanager
+    def model(self, model: Model) -> Iterator[None]:
+        """Answer with :model: instead of Gemini inside the block."""
+        agent = get_agent(
+            main_toolset,
+            api_key=self.environment.google_cloud_api_key,
+            pool=PoolSettings.from_env(self.environment),
+        )
+
+        with agent.override(model=model):
+            yield
@@ -0,0 +1,308 @@
+# pyright: reportIncompatibleMethodOverride=false, reportUnknownMemberType=false, reportUnknownVariableType=false, reportUnknownArgumentType=false
+from collections.abc import Callable, Iterable, Mapping
+from datetime import date, datetime, timezone
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import IO, Any, final
+
+from google.api_core.exceptions import BadRequest, NotFound
+from google.cloud import bigquery
+import numpy as np
+
+from rag.types import DocumentFragment
+from repository.form import FormModel
+from repository.types import ConversationCreationModel, MessageModel, UserModel
+
+_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:\d{2})?$")
+_VECTOR_SEARCH = re.compile(
+    r"VECTOR_SEARCH\(\s*TABLE\s+`(?P<table>[^`]+)`\s*,\s*'(?P<column>\w+)'.*?"
+    r"@(?P<embedding>\w+)\s+AS.*?top_k\s*=>\s*@(?P<top_k>\w+)",
+    re.DOTALL,
+)
+_THRESHOLD = re.compile(r"1\s*-\s*distance\s*>=\s*@(\w+)")
+_ARRAY_AGG_ALIAS = re.compile(r"ARRAY_AGG\(.*?\)\s+AS\s+(\w+)", re.DOTALL)
+_DML_TABLE = re.compile(
+    r"^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|MERGE(?:\s+INTO)?)\s+`([^`]+)`", re.IGNORECASE
+)
+
+
+def _timestamp(value: datetime) -> str:
+    # One fixed format, so timestamps sort and compare as strings.
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+@final
+class FakeJob:
+    def __init__(self, rows: list[bigquery.Row] | None = None) -> None:
+        self._rows = rows or []
+        self.total_bytes_processed = 0
+
+    def result(self, timeout: float | None = None, **_kwargs: Any) -> list[bigquery.Row]:
+        return self._rows
+
+
+@final
+class FakeBigQueryClient(bigquery.Client):
+    """
+    In-memory stand-in for `bigquery.Client`, backed by SQLite, to run and
+    benchmark the BigQuery paths without Google Cloud.
+
+    It supports what the repositories do: NDJSON load jobs, parameterized
+    queries and DML, `TO_HEX(SHA256(...))`, `ARRAY_AGG`, `IN UNNEST(@array)`
+    and `VECTOR_SEARCH` with cosine distance, and `get_table` for the row
+    count, the columns and the last modification of a table, which
+    `update_table` can add columns to. Other BigQuery SQL may not
+    translate. Nested values are kept as JSON. Every call waits `latency`
+    seconds first, to mimic the round trip.
+    """
+
+    def __init__(
+        self,
+        tables: Mapping[str, Iterable[str]] | None = None,
+        *,
+        latency: float = 0.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        # The real constructor is not called; it looks for credentials.
+        self.project = "fake"
+        self.latency = latency
+        self.queries = 0
+        self.loads = 0
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._columns = dict[str, list[str]]()
+        self._json_columns = set[str]()
+        self._modified = dict[str, float]()
+        # Decoded rows and embeddings of each searched table, until it changes.
+        self._vectors = dict[tuple[str, str], tuple[list[dict[str, Any]], np.ndarray]]()
+        self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._db.create_function("SHA256", 1, lambda text: hashlib.sha256(text.encode()).digest())
+        self._db.create_function("TO_HEX", 1, lambda data: data.hex())
+
+        for table_ref, columns in (tables or {}).items():
+            self.create_table(table_ref, columns)
+
+    @classmethod
+    def for_dataset(
+        cls, project_id: str, dataset_id: str, fragments_table: str = "fragments", **kwargs: Any
+    ) -> "FakeBigQueryClient":
+        """A client with the tables the repositories and the RAG use."""
+        prefix = f"{project_id}.{dataset_id}"
+        return cls(
+            {
+                f"{prefix}.users": UserModel.model_fields,
+                f"{prefix}.conversations": ConversationCreationModel.model_fields,
+                f"{prefix}.messages": MessageModel.model_fields,
+                f"{prefix}.forms": FormModel.model_fields,
+                f"{prefix}.{fragments_table}": [*DocumentFragment.model_fields, "embedding"],
+            },
+            **kwargs,
+        )
+
+    def create_table(self, table_ref: str, columns: Iterable[str]) -> None:
+        with self._lock:
+            self._add_columns(table_ref, columns)
+
+    def load_table_from_file(
+        self, file_obj: IO[bytes], destination: Any, job_config: Any = None, **_kwargs: Any
+    ) -> FakeJob:
+        self._sleep(self.latency)
+        table_ref = str(destination)
+        rows = [json.loads(line) for line in file_obj.read().splitlines() if line.strip()]
+
+        with self._lock:
+            self.loads += 1
+            self._vectors.clear()
+            self._modified[table_ref] = time.time()
+
+            if job_config is not None and job_config.write_disposition == "WRITE_TRUNCATE":
+                _ = self._db.execute(f'DELETE FROM "{table_ref}"')
+
+            for row in rows:
+                self._add_columns(table_ref, row)
+                values = [self._to_sqlite(column, value) for column, value in row.items()]
+                columns = ", ".join(f'"{column}"' for column in row)
+                placeholders = ", ".join("?" for _ in row)
+                _ = self._db.execute(
+                    f'INSERT INTO "{table_ref}" ({columns}) VALUES ({placeholders})', values
+                )
+
+            self._db.commit()
+
+        return FakeJob()
+
+    def query(self, query: str, job_config: Any = None, **_kwargs: Any) -> FakeJob:
+        self._sleep(self.latency)
+        parameters = {
+            parameter.name: parameter
+            for parameter in (job_config.query_parameters if job_config is not None else [])
+        }
+
+        with self._lock:
+            self.queries += 1
+
+            if (search := _VECTOR_SEARCH.search(query)) is not None:
+                return FakeJob(self._vector_search(query, search, parameters))
+
+            for alias in _ARRAY_AGG_ALIAS.findall(query):
+                self._json_columns.add(alias)
+
+            try:
+                cursor = self._db.execute(
+                    _translate(query),
+                    {name: _parameter_value(parameter) for name, parameter in parameters.items()},
+                )
+            except sqlite3.OperationalError as error:
+                if "no such table" in str(error):
+                    raise NotFound(str(error)) from error
+                raise BadRequest(str(error)) from error
+
+            self._db.commit()
+
+            if cursor.description is None:
+                self._vectors.clear()
+
+                if (table := _DML_TABLE.match(query)) is not None:
+                    self._modified[table.group(1)] = time.time()
+
+                return FakeJob()
+
+            names = [column[0] for column in cursor.description]
+            return FakeJob(
+                [
+                    bigquery.Row(
+                        [self._from_sqlite(name, value) for name, value in zip(names, row)],
+                        {name: index for index, name in enumerate(names)},
+                    )
+                    for row in cursor.fetchall()
+                ]
+            )
+
+    def get_table(self, table: Any, **_kwargs: Any) -> bigquery.Table:
+        self._sleep(self.latency)
+        table_ref = str(table)
+
+        with self._lock:
+            if table_ref not in self._columns:
+                raise NotFound(f"Not found: Table {table_ref}")
+
+            [rows] = self._db.execute(f'SELECT COUNT(*) FROM "{table_ref}"').fetchone()
+            result = bigquery.Table(table_ref)
+            result._properties["numRows"] = str(rows)
+            result._properties["lastModifiedTime"] = str(int(self._modified[table_ref] * 1000))
+            # Types are not tracked: every column is reported as a string.
+            result.schema = [
+                bigquery.SchemaField(column, "STRING") for column in self._columns[table_ref]
+            ]
+            return result
+
+    def update_table(
+        self, table: bigquery.Table, fields: Iterable[str], **_kwargs: Any
+    ) -> bigquery.Table:
+        """Only new columns of `schema` are applied; other fields are ignored."""
+        self._sleep(self.latency)
+        table_ref = str(table.reference)
+
+        with self._lock:
+            if "schema" in fields:
+                self._add_columns(table_ref, [field.name for field in table.schema])
+                self._modified[table_ref] = time.time()
+
+        return table
+
+    def _vector_search(
+        self,
+        query: str,
+        search: re.Match[str],
+        parameters: Mapping[str, bigquery.ScalarQueryParameter | bigquery.ArrayQueryParameter],
+    ) -> list[bigquery.Row]:
+        table_ref, column = search["table"], search["column"]
+        embedding = np.asarray(parameters[search["embedding"]].values, dtype=np.float32)
+        top_k = int(parameters[search["top_k"]].value)
+        threshold = _THRESHOLD.search(query)
+        minimum = float(parameters[threshold[1]].value) if threshold is not None else -1.0
+
+        if (table_ref, column) not in self._vectors:
+            cursor = self._db.execute(f'SELECT * FROM "{table_ref}"')
+            names = [description[0] for description in cursor.description]
+            rows = [
+                {name: self._from_sqlite(name, value) for name, value in zip(names, row)}
+                for row in cursor.fetchall()
+            ]
+            self._vectors[table_ref, column] = (
+                rows,
+                np.asarray([row[column] for row in rows], dtype=np.float32),
+            )
+
+        rows, matrix = self._vectors[table_ref, column]
+
+        if not rows:
+            return []
+
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(embedding) or 1.0)
+        similarities = matrix @ embedding / np.where(norms == 0, 1, norms)
+        nearest = np.argsort(-similarities)[:top_k]
+
+        return [
+            bigquery.Row([rows[index], float(1 - similarities[index])], {"base": 0, "distance": 1})
+            for index in nearest
+            if similarities[index] >= minimum
+        ]
+
+    def _add_columns(self, table_ref: str, columns: Iterable[str]) -> None:
+        known = self._columns.get(table_ref)
+
+        if known is None:
+            known = self._columns[table_ref] = list(columns)
+            self._modified[table_ref] = time.time()
+            definition = ", ".join(f'"{column}"' for column in known)
+            _ = self._db.execute(f'CREATE TABLE IF NOT EXISTS "{table_ref}" ({definition})')
+            return
+
+        for column in columns:
+            if column not in known:
+                known.append(column)
+                _ = self._db.execute(f'ALTER TABLE "{table_ref}" ADD COLUMN "{column}"')
+
+    def _to_sqlite(self, column: str, value: Any) -> Any:
+        if isinstance(value, list | dict):
+            self._json_columns.add(column)
+            return json.dumps(value)
+
+        if isinstance(value, str) and _TIMESTAMP.match(value):
+            return _timestamp(datetime.fromisoformat(value))
+
+        return value
+
+    def _from_sqlite(self, column: str, value: Any) -> Any:
+        if column in self._json_columns and isinstance(value, str):
+            return json.loads(value)
+
+        return value
+
+
+def _translate(query: str) -> str:
+    """Rewrite the BigQuery SQL the repositories use into SQLite."""
+    query = query.replace("`", '"')
+    query = re.sub(r"ARRAY_AGG\(", "json_group_array(", query)
+    query = re.sub(r"IN\s+UNNEST\(@(\w+)\)", r"IN (SELECT value FROM json_each(:\1))", query)
+    return re.sub(r"@(\w+)", r":\1", query)
+
+
+def _parameter_value(
+    parameter: bigquery.ScalarQueryParameter | bigquery.ArrayQueryParameter,
+) -> Any:
+    if isinstance(parameter, bigquery.ArrayQueryParameter):
+        return json.dumps(list(parameter.values))
+
+    if isinstance(parameter.value, datetime):
+        return _timestamp(parameter.value)
+
+    if isinstance(parameter.value, date):
+        return parameter.value.isoformat()
+
+    return parameter.value
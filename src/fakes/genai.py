@@ -0,0 +1,65 @@
+# pyright: reportIncompatibleMethodOverride=false, reportIncompatibleVariableOverride=false
+import asyncio
+import hashlib
+import math
+from typing import Any, final
+
+from google.genai.client import AsyncClient
+from google.genai.types import ContentEmbedding, EmbedContentResponse
+
+from rag.embedding_cache import normalize
+
+DIMENSIONS = 768
+
+
+def fake_embedding(text: str, dimensions: int = DIMENSIONS) -> list[float]:
+    """
+    A deterministic, normalized bag of words embedding, so texts sharing
+    words are close to each other like with a real model.
+    """
+    vector = [0.0] * dimensions
+
+    for word in normalize(text).split():
+        digest = hashlib.sha256(word.encode()).digest()
+        index = int.from_bytes(digest[:4]) % dimensions
+        vector[index] += 1.0 if digest[4] % 2 else -1.0
+
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+@final
+class FakeModels:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.calls = 0
+
+    async def embed_content(
+        self, *, model: str, contents: Any, config: Any = None
+    ) -> EmbedContentResponse:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        texts = [contents] if isinstance(contents, str) else list(contents)
+
+        return EmbedContentResponse(
+            embeddings=[ContentEmbedding(values=fake_embedding(str(text))) for text in texts]
+        )
+
+
+@final
+class FakeGoogleClient(AsyncClient):
+    """
+    Stand-in for the async Gemini client of `Dependencies`, with the
+    embeddings of `fake_embedding` after `latency` seconds.
+    """
+
+    def __init__(self, *, latency: float = 0.0) -> None:
+        # The real constructor is not called; it needs an API client.
+        self._fake_models = FakeModels(latency)
+
+    @property
+    def models(self) -> FakeModels:
+        return self._fake_models
+
+    async def aclose(self) -> None:
+        pass
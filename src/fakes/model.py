@@ -0,0 +1,89 @@
+import asyncio
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
+import json
+from typing import Any
+
+from pydantic import BaseModel
+from pydantic_ai.messages import ModelMessage, ModelRequest, RetryPromptPart, ToolReturnPart
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, DeltaToolCalls, FunctionModel
+
+DEFAULT_TEXT = (
+    "Ithaka es el centro de emprendimiento e innovación de la Universidad Católica del "
+    "Uruguay. Acompaña a estudiantes, docentes y egresados desde la idea hasta el "
+    "lanzamiento de sus proyectos, con mentorías, talleres y una red de contactos. "
+) * 4
+
+
+@dataclass(frozen=True)
+class ToolCall:
+    name: str
+    args: dict[str, Any]
+
+
+def query_rag_call(query: str, top_k: int = 3) -> ToolCall:
+    # A tool whose only argument is a model takes the fields of the model.
+    return ToolCall("query_rag", {"query": query, "top_k": top_k})
+
+
+def query_rag_many_call(queries: list[str], top_k: int = 3) -> ToolCall:
+    return ToolCall("query_rag_many", {"queries": queries, "top_k": top_k})
+
+
+def complete_form_call(form: BaseModel) -> ToolCall:
+    return ToolCall("complete_form", {"form": form.model_dump(mode="json")})
+
+
+def fake_model(
+    text: str = DEFAULT_TEXT,
+    *,
+    first_token_delay: float = 0.0,
+    tokens_per_second: float | None = None,
+    tool_calls: Sequence[ToolCall] = (),
+) -> FunctionModel:
+    """
+    A model that streams :text: word by word instead of calling Gemini.
+
+    The first token comes after :first_token_delay: seconds, and the rest at
+    :tokens_per_second: (as fast as possible if `None`). When :tool_calls: are
+    given, the first response of each run calls all of them at once, and
+    :text: is streamed once the tools have returned.
+    """
+    words = [f"{word} " for word in text.split()]
+
+    async def stream(messages: list[ModelMessage], _info: AgentInfo) -> AsyncIterator[str]:
+        await asyncio.sleep(first_token_delay)
+
+        for word in words:
+            yield word
+
+            if tokens_per_second:
+                await asyncio.sleep(1 / tokens_per_second)
+
+    async def call_tools(
+        _messages: list[ModelMessage], _info: AgentInfo
+    ) -> AsyncIterator[DeltaToolCalls]:
+        await asyncio.sleep(first_token_delay)
+        yield {
+            index: DeltaToolCall(
+                name=call.name, json_args=json.dumps(call.args), tool_call_id=f"call-{index}"
+            )
+            for index, call in enumerate(tool_calls)
+        }
+
+    def stream_function(
+        messages: list[ModelMessage], info: AgentInfo
+    ) -> AsyncIterator[str] | AsyncIterator[DeltaToolCalls]:
+        if tool_calls and not _after_tools(messages):
+            return call_tools(messages, info)
+
+        return stream(messages, info)
+
+    return FunctionModel(stream_function=stream_function, model_name="fake")
+
+
+def _after_tools(messages: list[ModelMessage]) -> bool:
+    last = messages[-1]
+    return isinstance(last, ModelRequest) and any(
+        isinstance(part, ToolReturnPart | RetryPromptPart) for part in last.parts
+    )
@@ -0,0 +1,310 @@
+"""
+Import forms in bulk from CSV or JSONL files, and export them to CSV or
+Parquet, for committee sessions that evaluate many ideas at once.
+
+Every row is validated on its own: invalid rows are reported with their
+line and skipped, and the valid ones are stored in a single write. Rows are
+streamed from the file to the store, so memory does not grow with the file.
+
+    uv run python -m forms.bulk import committee.csv
+    uv run python -m forms.bulk export ana.parquet --field sponsor --value "Ana"
+
+In CSV files, fields with several values (like `stage`) are JSON lists, and
+empty cells take the default of their field. A `form_id` column, if present,
+replaces the forms with those ids; otherwise every row is a new form.
+"""
+
+from collections.abc import Iterable, Iterator
+import csv
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+import json
+from pathlib import Path
+import time
+from typing import Any, TextIO, get_origin
+from uuid import uuid4
+
+from pydantic import TypeAdapter, ValidationError
+
+from forms.store import FormStore
+from forms.test_form import IthakaEvaluationSupportForm
+from repository.form import FormModel, IndexedField
+
+# Built once: building the validator is much slower than running it.
+FORM_ADAPTER = TypeAdapter(IthakaEvaluationSupportForm)
+
+FIELDS = tuple(IthakaEvaluationSupportForm.model_fields)
+EXPORTED_FIELDS = ("form_id", *FIELDS, "updated_at")
+
+# Fields with several values, kept as JSON in CSV cells.
+LIST_FIELDS = frozenset(
+    name
+    for name, info in IthakaEvaluationSupportForm.model_fields.items()
+    if get_origin(info.annotation) in (tuple, list)
+)
+
+# How many forms are written to a Parquet file at a time.
+PARQUET_BATCH_SIZE = 1000
+
+
+@dataclass
+class RowError:
+    line: int
+    message: str
+
+    def __str__(self) -> str:
+        return f"line {self.line}: {self.message}"
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    imported: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    errors: list[RowError] = field(default_factory=list)
+    """The first `max_errors` errors; `failed` counts all of them."""
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.rows} rows ({self.imported} imported, {self.failed} failed) "
+            f"in {self.seconds:.1f}s: {self.rows_per_second:.0f} rows/s"
+        )
+
+
+def import_forms(store: FormStore, path: Path, *, max_errors: int = 100) -> ImportReport:
+    """
+    Validate the rows of the CSV or JSONL file at :path: and store the valid
+    ones in :store:, in one write.
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+
+    with path.open(newline="", encoding="utf-8") as file:
+        forms = validate_rows(read_rows(file, _format(path, ("csv", "jsonl"))), report, max_errors)
+        report.imported = store.save_many(forms)
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def read_rows(file: TextIO, format: str) -> Iterator[tuple[int, dict[str, Any] | Exception]]:
+    """
+    The rows of :file: as (line, row) pairs, or (line, error) for the rows
+    that cannot be parsed.
+    """
+    match format:
+        case "csv":
+            reader = csv.DictReader(file)
+            # Where the row starts: quoted cells may span several lines.
+            line = 2
+
+            for row in reader:
+                try:
+                    yield line, _parse_csv_row(row)
+                except json.JSONDecodeError as error:
+                    yield line, error
+
+                line = reader.line_num + 1
+        case "jsonl":
+            for line, text in enumerate(file, start=1):
+                if not text.strip():
+                    continue
+
+                try:
+                    yield line, json.loads(text)
+                except json.JSONDecodeError as error:
+                    yield line, error
+        case _:
+            raise ValueError(f"Cannot read forms from {format!r} files")
+
+
+def validate_rows(
+    rows: Iterable[tuple[int, dict[str, Any] | Exception]],
+    report: ImportReport,
+    max_errors: int = 100,
+) -> Iterator[FormModel]:
+    """
+    The forms of the valid :rows:. The invalid ones are counted in :report:,
+    with their errors.
+    """
+    updated_at = datetime.now(timezone.utc)
+
+    for line, row in rows:
+        report.rows += 1
+
+        try:
+            if isinstance(row, Exception):
+                raise row
+
+            form = FORM_ADAPTER.validate_python(row)
+        except (ValidationError, ValueError) as error:
+            report.failed += 1
+
+            if len(report.errors) < max_errors:
+                report.errors.append(RowError(line, _describe(error)))
+
+            continue
+
+        # Already validated, so the storage fields are added without doing it again.
+        yield FormModel.model_construct(
+            **dict(form),
+            form_id=str(row.get("form_id") or uuid4()),
+            updated_at=updated_at,
+        )
+
+
+def export_forms(
+    store: FormStore,
+    path: Path,
+    *,
+    field: IndexedField | None = None,
+    value: str | date | None = None,
+) -> int:
+    """
+    Write the forms of :store: (whose :field: is :value:, if given) to the
+    CSV or Parquet file at :path:.
+
+    :return: How many forms were written.
+    """
+    forms = store.scan(field, value)
+
+    match _format(path, ("csv", "parquet")):
+        case "csv":
+            with path.open("w", newline="", encoding="utf-8") as file:
+                return write_csv(forms, file)
+        case _:
+            return write_parquet(forms, path)
+
+
+def write_csv(forms: Iterable[FormModel], file: TextIO) -> int:
+    writer = csv.DictWriter(file, EXPORTED_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+
+    for form in forms:
+        row = form.model_dump(mode="json")
+
+        for name in LIST_FIELDS:
+            row[name] = json.dumps(row[name], ensure_ascii=False)
+
+        writer.writerow(row)
+        count += 1
+
+    return count
+
+
+def write_parquet(forms: Iterable[FormModel], path: Path) -> int:
+    """Needs `pyarrow`, which is not installed with the rest."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise RuntimeError("Exporting to Parquet needs pyarrow: `uv add pyarrow`") from error
+
+    schema = pa.schema(
+        [
+            ("form_id", pa.string()),
+            *((name, _arrow_type(pa, name)) for name in FIELDS),
+            ("updated_at", pa.timestamp("us", tz="UTC")),
+        ]
+    )
+    count = 0
+
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = list[dict[str, Any]]()
+
+        for form in forms:
+            batch.append(form.model_dump(include=set(EXPORTED_FIELDS)))
+
+            if len(batch) == PARQUET_BATCH_SIZE:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch.clear()
+
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+
+    return count
+
+
+def _parse_csv_row(row: dict[str, str]) -> dict[str, Any]:
+    return {
+        name: json.loads(cell) if name in LIST_FIELDS else cell
+        for name, cell in row.items()
+        if cell
+    }
+
+
+def _arrow_type(pa: Any, name: str) -> Any:
+    if name in LIST_FIELDS:
+        return pa.list_(pa.string())
+    if IthakaEvaluationSupportForm.model_fields[name].annotation is date:
+        return pa.date32()
+
+    return pa.string()
+
+
+def _format(path: Path, formats: tuple[str, ...]) -> str:
+    format = path.suffix.removeprefix(".").lower()
+    format = "jsonl" if format == "ndjson" else format
+
+    if format not in formats:
+        raise ValueError(f"{path.name}: expected a {' or '.join(formats)} file")
+
+    return format
+
+
+def _describe(error: Exception) -> str:
+    if not isinstance(error, ValidationError):
+        return str(error)
+
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}"
+        for detail in error.errors(include_url=False)
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from chat.clients import create_bq_client
+    from env import env
+    from forms.store import INDEXED_FIELDS, get_bigquery_form_store, get_local_form_store
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    _ = parser.add_argument("command", choices=["import", "export"])
+    _ = parser.add_argument("path", type=Path)
+    _ = parser.add_argument("--field", choices=INDEXED_FIELDS)
+    _ = parser.add_argument("--value")
+    args = parser.parse_args()
+
+    environment = env()
+
+    match environment.forms:
+        case "local":
+            store = get_local_form_store(environment.forms_path)
+        case "bigquery":
+            store = get_bigquery_form_store(
+                create_bq_client(environment.project_id),
+                environment.project_id,
+                environment.dataset,
+                environment.forms_lookback,
+            )
+
+    match args.command:
+        case "import":
+            report = import_forms(store, args.path)
+            print(report)
+
+            for error in report.errors:
+                print(error)
+        case _:
+            value = args.value
+            value = date.fromisoformat(value) if args.field == "date_of_completion" else value
+            print(f"Exported {export_forms(store, args.path, field=args.field, value=value)} forms")
@@ -0,0 +1,267 @@
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from datetime import date, timedelta
+from functools import cache
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Protocol, final, get_args
+
+from google.cloud import bigquery
+
+from repository.form import SCAN_PAGE_SIZE, FormModel, FormRepository, IndexedField
+
+INDEXED_FIELDS: tuple[IndexedField, ...] = get_args(IndexedField.__value__)
+
+
+class FormBackend(Protocol):
+    """Where forms are kept durably."""
+
+    def save(self, form: FormModel) -> None:
+        """Store :form:, replacing the one with its id if any."""
+        ...
+
+    def save_many(self, forms: Iterable[FormModel]) -> int:
+        """Store every form in :forms: at once; return how many there were."""
+        ...
+
+    def load(self, form_id: str) -> FormModel | None: ...
+
+    def find(self, field: IndexedField, value: str | date, *, limit: int) -> list[FormModel]:
+        """Up to :limit: forms whose :field: is :value:, latest completed first."""
+        ...
+
+    def scan(
+        self, field: IndexedField | None = None, value: str | date | None = None
+    ) -> Iterator[FormModel]:
+        """Every form (whose :field: is :value:, if given), a page at a time."""
+        ...
+
+
+@final
+class SQLiteFormBackend:
+    """Forms in a SQLite file, with an index on each of `INDEXED_FIELDS`."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        _ = self._db.execute("PRAGMA journal_mode=WAL")
+        _ = self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS forms (
+                form_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                idea TEXT NOT NULL,
+                sponsor TEXT NOT NULL,
+                date_of_completion TEXT NOT NULL,
+                form TEXT NOT NULL
+            )
+            """
+        )
+
+        for field in INDEXED_FIELDS:
+            _ = self._db.execute(f"CREATE INDEX IF NOT EXISTS forms_{field} ON forms ({field})")
+
+    def save(self, form: FormModel) -> None:
+        with self._lock:
+            _ = self._db.execute(_INSERT, _row(form))
+
+    def save_many(self, forms: Iterable[FormModel]) -> int:
+        count = 0
+
+        def rows() -> Iterator[tuple[str, ...]]:
+            nonlocal count
+
+            for form in forms:
+                count += 1
+                yield _row(form)
+
+        # One transaction: much faster than one per form, and all or nothing.
+        with self._lock:
+            _ = self._db.execute("BEGIN")
+
+            try:
+                _ = self._db.executemany(_INSERT, rows())
+            except BaseException:
+                _ = self._db.execute("ROLLBACK")
+                raise
+
+            _ = self._db.execute("COMMIT")
+
+        return count
+
+    def load(self, form_id: str) -> FormModel | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT form FROM forms WHERE form_id = ?", (form_id,)
+            ).fetchone()
+
+        return FormModel.model_validate_json(row[0]) if row is not None else None
+
+    def find(self, field: IndexedField, value: str | date, *, limit: int) -> list[FormModel]:
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Forms are not indexed by {field!r}")
+
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT form FROM forms WHERE {field} = ? "
+                "ORDER BY date_of_completion DESC LIMIT ?",
+                (value.isoformat() if isinstance(value, date) else value, limit),
+            ).fetchall()
+
+        return [FormModel.model_validate_json(row[0]) for row in rows]
+
+    def scan(
+        self, field: IndexedField | None = None, value: str | date | None = None
+    ) -> Iterator[FormModel]:
+        if field is not None and field not in INDEXED_FIELDS:
+            raise ValueError(f"Forms are not indexed by {field!r}")
+
+        condition = f"AND {field} = ?" if field is not None else ""
+        parameters = (value.isoformat() if isinstance(value, date) else value,) if field else ()
+        after = ""
+
+        # A page per query, so the lock is not held while the caller works.
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    f"SELECT form_id, form FROM forms WHERE form_id > ? {condition} "
+                    "ORDER BY form_id LIMIT ?",
+                    (after, *parameters, SCAN_PAGE_SIZE),
+                ).fetchall()
+
+            for _, form in rows:
+                yield FormModel.model_validate_json(form)
+
+            if len(rows) < SCAN_PAGE_SIZE:
+                return
+
+            after = rows[-1][0]
+
+
+_INSERT = "INSERT OR REPLACE INTO forms VALUES (?, ?, ?, ?, ?, ?)"
+
+
+def _row(form: FormModel) -> tuple[str, ...]:
+    return (
+        form.form_id,
+        form.name,
+        form.idea,
+        form.sponsor,
+        form.date_of_completion.isoformat(),
+        form.model_dump_json(),
+    )
+
+
+@final
+class BigQueryFormBackend:
+    """Forms in the `forms` table of BigQuery, through `FormRepository`."""
+
+    def __init__(self, repository: FormRepository) -> None:
+        self.repository = repository
+
+    def save(self, form: FormModel) -> None:
+        self.repository.save(form)
+
+    def save_many(self, forms: Iterable[FormModel]) -> int:
+        return self.repository.save_many(forms)
+
+    def load(self, form_id: str) -> FormModel | None:
+        return self.repository.read_by_id(form_id)
+
+    def find(self, field: IndexedField, value: str | date, *, limit: int) -> list[FormModel]:
+        return self.repository.find(field, value, limit=limit)
+
+    def scan(
+        self, field: IndexedField | None = None, value: str | date | None = None
+    ) -> Iterator[FormModel]:
+        return self.repository.scan(field, value)
+
+
+@final
+class FormStore:
+    """
+    Forms kept in :backend:, with a write-through cache of the latest
+    `max_entries` used.
+
+    Writes go to the backend before the cache, so a form is never cached
+    unless it is stored. Other processes may change a form in the backend,
+    so cached forms older than `ttl` seconds are read again. Searches always
+    go to the backend, which has the indexes, and their results are cached.
+    """
+
+    def __init__(self, backend: FormBackend, *, max_entries: int = 1024, ttl: float = 60.0) -> None:
+        self.backend = backend
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._memory = OrderedDict[str, tuple[float, FormModel]]()
+
+    def save(self, form: FormModel) -> None:
+        self.backend.save(form)
+        self._remember(form)
+
+    def save_many(self, forms: Iterable[FormModel]) -> int:
+        """
+        Store :forms: in one write to the backend. They are not cached, and
+        since any cached form may be among them, the cache is emptied.
+        """
+        count = self.backend.save_many(forms)
+
+        with self._lock:
+            self._memory.clear()
+
+        return count
+
+    def get(self, form_id: str) -> FormModel | None:
+        with self._lock:
+            entry = self._memory.get(form_id)
+
+            if entry is not None and time.monotonic() - entry[0] < self._ttl:
+                self._memory.move_to_end(form_id)
+                return entry[1]
+
+        form = self.backend.load(form_id)
+
+        if form is not None:
+            self._remember(form)
+
+        return form
+
+    def find(self, field: IndexedField, value: str | date, *, limit: int = 100) -> list[FormModel]:
+        forms = self.backend.find(field, value, limit=limit)
+
+        for form in forms:
+            self._remember(form)
+
+        return forms
+
+    def scan(
+        self, field: IndexedField | None = None, value: str | date | None = None
+    ) -> Iterator[FormModel]:
+        """Every form (whose :field: is :value:, if given), straight from the backend."""
+        return self.backend.scan(field, value)
+
+    def _remember(self, form: FormModel) -> None:
+        with self._lock:
+            self._memory[form.form_id] = (time.monotonic(), form)
+            self._memory.move_to_end(form.form_id)
+
+            while len(self._memory) > self._max_entries:
+                _ = self._memory.popitem(last=False)
+
+
+@cache
+def get_local_form_store(path: Path) -> FormStore:
+    return FormStore(SQLiteFormBackend(path))
+
+
+@cache
+def get_bigquery_form_store(
+    client: bigquery.Client, project_id: str, dataset: str, lookback: timedelta | None = None
+) -> FormStore:
+    return FormStore(
+        BigQueryFormBackend(FormRepository(client, project_id, dataset, lookback=lookback))
+    )
@@ -1,22 +1,38 @@
+import logging
+from typing import assert_never
 from uuid import UUID, uuid4
 from pydantic_ai import RunContext
 from pydantic_ai.toolsets import FunctionToolset
 
 from chat.types import Dependencies
+from forms.store import FormStore, get_bigquery_form_store, get_local_form_store
 from forms.test_form import IthakaEvaluationSupportForm
 from forms.types import BadInput, ErrorResult, FormInformation
+from repository.form import FormModel
 
 
+logger = logging.getLogger(__name__)
+
 form_tools = FunctionToolset[Dependencies](max_retries=3)
 
 
-# Pretend this is storage for now
-_forms = dict[UUID, IthakaEvaluationSupportForm]()
+def get_form_store(deps: Dependencies) -> FormStore:
+    env = deps.env
+
+    match env.forms:
+        case "local":
+            return get_local_form_store(env.forms_path)
+        case "bigquery":
+            return get_bigquery_form_store(
+                deps.bq_client, env.project_id, env.dataset, env.forms_lookback
+            )
+        case _:
+            assert_never(env.forms)
 
 
 @form_tools.tool
 def complete_form(
-    _ctx: RunContext[Dependencies], form: IthakaEvaluationSupportForm, form_id: UUID | None = None
+    ctx: RunContext[Dependencies], form: IthakaEvaluationSupportForm, form_id: UUID | None = None
 ) -> FormInformation | BadInput | ErrorResult:
     """
     Complete a form based on the information provided by the user. If the user
@@ -42,21 +58,29 @@ def complete_form(
         Whether the transaction was succesful, a failure, or the input provided
         was bad.
     """
-    print(f"Completing {form_id = }")
-    if form_id is not None and _forms.get(form_id) is None:
-        return BadInput(bad_input_explanation="Form with that id does not exist")
+    logger.debug("Completing form_id = %r", form_id)
+    store = get_form_store(ctx.deps)
 
-    if form_id is None:
-        form_id = uuid4()
+    try:
+        if form_id is not None and store.get(str(form_id)) is None:
+            return BadInput(bad_input_explanation="Form with that id does not exist")
 
-    print(f"{form = }")
-    _forms[form_id] = form
+        if form_id is None:
+            form_id = uuid4()
+
+        logger.debug("form = %r", form)
+        store.save(FormModel.model_validate({**form.model_dump(), "form_id": str(form_id)}))
+    except Exception as error:
+        logger.exception("Could not save form %s", form_id)
+        return ErrorResult(error_explanation=f"The form could not be saved: {error}")
 
     return FormInformation(form_id=form_id)
 
 
 @form_tools.tool
-def get_form(_ctx: RunContext[Dependencies], form_id: UUID) -> IthakaEvaluationSupportForm | BadInput | ErrorResult:
+def get_form(
+    ctx: RunContext[Dependencies], form_id: UUID
+) -> IthakaEvaluationSupportForm | BadInput | ErrorResult:
     """
     Get the form with id :form_id:.
 
@@ -67,11 +91,17 @@ def get_form(_ctx: RunContext[Dependencies], form_id: UUID) -> IthakaEvaluationS
         The form, error, or if the input was incorrect.
 
     """
-    print(f"Getting {form_id = }")
-    form = _forms.get(form_id)
+    logger.debug("Getting form_id = %r", form_id)
+
+    try:
+        form = get_form_store(ctx.deps).get(str(form_id))
+    except Exception as error:
+        logger.exception("Could not read form %s", form_id)
+        return ErrorResult(error_explanation=f"The form could not be read: {error}")
 
     if form is None:
         return BadInput(bad_input_explanation="Form with that id does not exist.")
 
-    print(f"{form = }")
-    return form
+    logger.debug("form = %r", form)
+    # Without the fields of the storage.
+    return IthakaEvaluationSupportForm.model_validate(form.model_dump())
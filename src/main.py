@@ -1,7 +1,7 @@
 # Rabbit, you son of a lovely lady, this file is for goofing around and testing
 # stuff. Please, for all that is holy, do not bother me in prs with this file
 # or duplicated functionality because of the mess that this file is.
-from datetime import datetime
+from datetime import date
 
 from chat.factory import BotFactory
 from env import env
@@ -13,7 +13,7 @@ from rag.types import RAGQuery
 
 
 async def main() -> None:
-    tool = RAGTool(deps=BotFactory().get_default_dependencies(env()))
+    tool = RAGTool(deps=await BotFactory().get_default_dependencies(env()))
 
     result = await tool.retrieve_with_vector_search(
         RAGQuery(query="Qué cursos electivos puedo hacer en ithaka?")
@@ -21,7 +21,7 @@ async def main() -> None:
 
     print(f"{result = }")
 
-    system_prompt = get_system_prompt(params=SystemPromptParams(date=datetime.now()))
+    system_prompt = get_system_prompt(params=SystemPromptParams(date=date.today()))
     print(system_prompt)
 
 
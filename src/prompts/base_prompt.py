@@ -1,45 +1,96 @@
 # pyright: reportAny=false
 from collections.abc import Mapping
-from jinja2 import Template
-from functools import cache
+from functools import cache, lru_cache
+import json
+import os
+from pathlib import Path
+from typing import final
 
-@cache
-def _load_base_prompt(file_path: str) -> str:
-    """
-    Load a prompt from a file.
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
 
-    Args:
-        file_path (str): The path to the base prompt file.
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+BYTECODE_DIR = Path(__file__).parent / "../../memory/prompt_cache"
 
-    Returns:
-        str: The content of the base prompt file.
+
+@final
+class PromptRegistry:
     """
-    with open(file_path, 'r') as file:
-        return file.read()
+    The templates of a directory, each compiled once into a shared
+    `jinja2.Environment`.
 
-def _generate_base_prompt(template_str: str, prompt_params: Mapping[str, object]) -> str:
+    The compiled templates are also kept on disk, so new processes do not
+    compile them again. With `auto_reload`, a template is compiled again
+    when its file changes, so edits show up without a restart.
     """
-    Generate a prompt using a template string and parameters.
 
-    Args:
-        template_str (str): The template string to use for generating the prompt.
-        prompt_params (dict[str, object]): Parameters to render in the template.
+    def __init__(
+        self,
+        directory: Path = TEMPLATES_DIR,
+        *,
+        bytecode_dir: Path | None = BYTECODE_DIR,
+        auto_reload: bool = False,
+    ) -> None:
+        if bytecode_dir is not None:
+            bytecode_dir.mkdir(parents=True, exist_ok=True)
+
+        self.environment = Environment(
+            loader=FileSystemLoader(directory),
+            bytecode_cache=FileSystemBytecodeCache(str(bytecode_dir)) if bytecode_dir else None,
+            auto_reload=auto_reload,
+        )
+
+    def get(self, name: str) -> Template:
+        """
+        Get the template :name:, a path relative to the directory.
+
+        Args:
+            name (str): The name of the template, such as `system_prompt_template.md`.
+
+        Returns:
+            Template: The compiled template.
+        """
+        return self.environment.get_template(name)
+
+    def render(self, name: str, prompt_params: Mapping[str, object]) -> str:
+        """
+        Render the template :name: with :prompt_params:. Renders are memoized,
+        so parameters should not change more than needed (e.g. a date, rather
+        than the time).
+
+        Args:
+            name (str): The name of the template.
+            prompt_params (dict[str, object]): Parameters to render in the
+                template, JSON values (as from `model_dump(mode="json")`).
+
+        Returns:
+            str: The rendered template.
+        """
+        key = json.dumps(prompt_params, sort_keys=True)
+        # The template is part of the key: it is another one once reloaded.
+        return _render(self.get(name), key)
+
+
+@lru_cache(maxsize=256)
+def _render(template: Template, prompt_params: str) -> str:
+    return template.render(**json.loads(prompt_params))
+
+
+@cache
+def get_prompt_registry() -> PromptRegistry:
+    # Only `ENVIRONMENT` is read, rather than the whole `env()`, so prompts
+    # render without the cloud settings (e.g. in the offline benchmarks).
+    return PromptRegistry(auto_reload=os.environ.get("ENVIRONMENT", "dev") == "dev")
 
-    Returns:
-        str: The generated base prompt.
-    """
-    template = Template(template_str)
-    return template.render(**prompt_params)
 
-def get_base_prompt(file_path: str, prompt_params: Mapping[str, object]) -> str:
+def get_base_prompt(name: str, prompt_params: Mapping[str, object]) -> str:
     """
     Get a prompt for the chatbot.
 
     Args:
-        file_path (str): The path to the base prompt file.
+        name (str): The name of the template, in `TEMPLATES_DIR`.
         prompt_params (dict[str, object]): Parameters to render in the template.
 
     Returns:
         str: The base prompt.
     """
-    return _generate_base_prompt(_load_base_prompt(file_path), prompt_params)
+    return get_prompt_registry().render(name, prompt_params)
@@ -1,12 +1,13 @@
 from pydantic import BaseModel, Field
 
-from datetime import datetime
+import datetime
 
 from prompts.base_prompt import get_base_prompt
 
 
 class SystemPromptParams(BaseModel):
-    date: datetime = Field(default_factory=datetime.now)
+    # The day, not the time: the prompt is only rendered again when it changes.
+    date: datetime.date = Field(default_factory=datetime.date.today)
 
 def get_system_prompt(params: SystemPromptParams) -> str:
     """
@@ -18,4 +19,6 @@ def get_system_prompt(params: SystemPromptParams) -> str:
     Returns:
         str: The system prompt.
     """
-    return get_base_prompt(file_path=r"src/prompts/templates/system_prompt_template.md", prompt_params=params.model_dump(mode="json"))
+    return get_base_prompt(
+        name="system_prompt_template.md", prompt_params=params.model_dump(mode="json")
+    )
@@ -0,0 +1,238 @@
+from array import array
+import atexit
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass
+from functools import cache
+import logging
+from pathlib import Path
+import queue
+import sqlite3
+import threading
+import time
+from typing import final
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = Path(__file__).parent / "../../memory/embedding_cache.sqlite3"
+
+type CacheKey = tuple[str, str, str]
+type _Row = tuple[str, str, str, bytes, float]
+
+
+def normalize(text: str) -> str:
+    """
+    Normalize a query so trivially different spellings share an embedding:
+    case, accents, punctuation and repeated whitespace are ignored.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    kept = (
+        " " if unicodedata.category(char).startswith("P") else char
+        for char in decomposed
+        if not unicodedata.combining(char)
+    )
+    return " ".join("".join(kept).split())
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / total if total else 0.0
+
+
+@final
+class EmbeddingCache:
+    """
+    Two-tier cache for embeddings, keyed by model, task type and normalized
+    text.
+
+    The first tier is an in-process LRU of `memory_entries` embeddings. The
+    second is a SQLite file at :path: (skipped if `None`) holding up to
+    `disk_entries`, oldest evicted first. Entries older than `ttl` seconds are
+    treated as missing in both tiers.
+
+    Writes to the file are made by a background thread, so `put` does not
+    wait for the disk: they are batched into one transaction, and expired
+    or excess entries are deleted every `prune_every` writes. A batch that
+    fails (e.g. the disk is full) is logged and dropped; the entries are
+    still in memory. Everything still pending is written when the process
+    exits.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = DEFAULT_PATH,
+        *,
+        memory_entries: int = 1024,
+        disk_entries: int = 100_000,
+        ttl: float = 30 * 24 * 60 * 60,
+        prune_every: int = 1000,
+    ) -> None:
+        self._path = path
+        self._memory_entries = memory_entries
+        self._disk_entries = disk_entries
+        self._ttl = ttl
+        self._prune_every = prune_every
+        self._memory = OrderedDict[CacheKey, tuple[float, list[float]]]()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self._pending = queue.Queue[_Row | None]()
+        self._writer: threading.Thread | None = None
+        self.stats = CacheStats()
+
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            _ = self._db.execute("PRAGMA journal_mode=WAL")
+            _ = self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    task_type TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (model, task_type, text)
+                )
+                """
+            )
+            _ = self._db.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_created_at ON embeddings (created_at)"
+            )
+            _ = atexit.register(self.close)
+
+    def get(self, model: str, task_type: str, text: str) -> list[float] | None:
+        key = (model, task_type, normalize(text))
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+
+            if entry is not None and now - entry[0] < self._ttl:
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+                return entry[1]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector, created_at FROM embeddings "
+                    "WHERE model = ? AND task_type = ? AND text = ? AND created_at > ?",
+                    (*key, now - self._ttl),
+                ).fetchone()
+
+                if row is not None:
+                    vector = array("f", row[0]).tolist()
+                    self._remember(key, row[1], vector)
+                    self.stats.disk_hits += 1
+                    return vector
+
+            self.stats.misses += 1
+            return None
+
+    def put(self, model: str, task_type: str, text: str, vector: list[float]) -> None:
+        key = (model, task_type, normalize(text))
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, now, vector)
+
+            if self._db is None:
+                return
+
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write, name="embedding-cache", daemon=True
+                )
+                self._writer.start()
+
+        self._pending.put((*key, array("f", vector).tobytes(), now))
+
+    def flush(self) -> None:
+        """Block until every embedding put so far has been written to the file."""
+        if self._writer is not None:
+            self._pending.join()
+
+    def close(self) -> None:
+        """Write the embeddings still pending and stop the background thread."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+
+        if writer is not None:
+            self._pending.put(None)
+            writer.join()
+
+    def _write(self) -> None:
+        assert self._path is not None
+        # A connection of its own, as SQLite connections are not to be shared
+        # between threads; WAL lets `get` read while this one writes.
+        db: sqlite3.Connection | None = None
+        unpruned = 0
+        stop = False
+
+        while not stop:
+            rows = list[_Row]()
+            item = self._pending.get()
+
+            # Batch whatever else is already pending.
+            while True:
+                if item is None:
+                    stop = True
+                else:
+                    rows.append(item)
+
+                try:
+                    item = self._pending.get_nowait()
+                except queue.Empty:
+                    break
+
+            try:
+                if db is None:
+                    db = sqlite3.connect(self._path, isolation_level=None)
+
+                _ = db.execute("BEGIN")
+                _ = db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+                _ = db.execute("COMMIT")
+
+                unpruned += len(rows)
+
+                if unpruned >= self._prune_every or stop:
+                    self._prune(db)
+                    unpruned = 0
+            except Exception as error:
+                logger.error("Dropping %d cached embeddings: %r", len(rows), error)
+
+                if db is not None and db.in_transaction:
+                    with suppress(sqlite3.Error):
+                        _ = db.execute("ROLLBACK")
+            finally:
+                for _ in range(len(rows) + 1 if stop else len(rows)):
+                    self._pending.task_done()
+
+        if db is not None:
+            db.close()
+
+    def _prune(self, db: sqlite3.Connection) -> None:
+        _ = db.execute(
+            "DELETE FROM embeddings WHERE created_at <= ? OR rowid IN ("
+            "SELECT rowid FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (time.time() - self._ttl, self._disk_entries),
+        )
+
+    def _remember(self, key: CacheKey, created_at: float, vector: list[float]) -> None:
+        self._memory[key] = (created_at, vector)
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self._memory_entries:
+            _ = self._memory.popitem(last=False)
+
+
+@cache
+def get_embedding_cache() -> EmbeddingCache:
+    return EmbeddingCache()
@@ -0,0 +1,183 @@
+# pyright: reportUnknownVariableType=false, reportUnknownMemberType=false
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import final
+
+from google.cloud import bigquery
+import numpy as np
+import numpy.typing as npt
+from pydantic import TypeAdapter
+
+from rag.types import DocumentFragment
+
+type Matrix = npt.NDArray[np.float32]
+
+_fragments_adapter = TypeAdapter(list[DocumentFragment])
+
+# The index loaded from each path, with the version of its files it was loaded from.
+_indexes = dict[Path, tuple[tuple[int, ...], "LocalVectorIndex"]]()
+
+
+@final
+class LocalVectorIndex:
+    """
+    In-process replacement for BigQuery's `VECTOR_SEARCH` over the fragments
+    table.
+
+    Embeddings are kept L2-normalized in a float32 matrix, so the cosine
+    similarity of every fragment is a single matrix-vector product. When loaded
+    from disk the matrix is memory-mapped, so large corpora are paged in by
+    the OS instead of read up front.
+
+    An index saved at `<path>` is two files: `<path>.npy` with the embeddings
+    and `<path>.json` with the fragments, in the same order.
+    """
+
+    def __init__(self, fragments: Sequence[DocumentFragment], embeddings: Matrix) -> None:
+        if len(fragments) != embeddings.shape[0]:
+            raise ValueError(
+                f"Got {len(fragments)} fragments but {embeddings.shape[0]} embeddings."
+            )
+
+        self.fragments = list(fragments)
+        self.embeddings = embeddings
+
+    @classmethod
+    def from_embeddings(
+        cls, rows: Iterable[tuple[DocumentFragment, Sequence[float]]]
+    ) -> "LocalVectorIndex":
+        fragments = list[DocumentFragment]()
+        vectors = list[Sequence[float]]()
+
+        for fragment, vector in rows:
+            fragments.append(fragment)
+            vectors.append(vector)
+
+        if not vectors:
+            return cls([], np.zeros((0, 0), dtype=np.float32))
+
+        return cls.from_matrix(fragments, np.asarray(vectors, dtype=np.float32))
+
+    @classmethod
+    def from_matrix(
+        cls, fragments: Sequence[DocumentFragment], embeddings: Matrix
+    ) -> "LocalVectorIndex":
+        """An index of :fragments:, with the rows of :embeddings: in the same order."""
+        return cls(fragments, _normalized(embeddings) if embeddings.size else embeddings)
+
+    @classmethod
+    def load(cls, path: Path) -> "LocalVectorIndex":
+        embeddings = np.load(path.with_name(f"{path.name}.npy"), mmap_mode="r")
+        fragments = _fragments_adapter.validate_json(
+            path.with_name(f"{path.name}.json").read_bytes()
+        )
+        return cls(fragments, embeddings)
+
+    def save(self, path: Path) -> None:
+        """
+        Save the index at :path:. Each file is written next to its final name
+        and then renamed over it, so a process that has the previous index
+        loaded (or memory-mapped) keeps reading it unchanged.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        embeddings = path.with_name(f"{path.name}.npy")
+        fragments = path.with_name(f"{path.name}.json")
+        embeddings_tmp = path.with_name(f"{path.name}.tmp.npy")
+        fragments_tmp = path.with_name(f"{path.name}.json.tmp")
+
+        np.save(embeddings_tmp, self.embeddings)
+        _ = fragments_tmp.write_bytes(_fragments_adapter.dump_json(self.fragments))
+        _ = embeddings_tmp.replace(embeddings)
+        _ = fragments_tmp.replace(fragments)
+
+    def __len__(self) -> int:
+        return len(self.fragments)
+
+    def search(
+        self, embedding: Sequence[float], top_k: int, similarity_threshold: float
+    ) -> list[tuple[DocumentFragment, float]]:
+        """
+        Find the :top_k: nearest fragments by cosine distance, then keep those
+        with a similarity of at least :similarity_threshold:, like the SQL
+        query does.
+
+        Returns:
+            Each fragment with its cosine distance, nearest first.
+        """
+        if not len(self) or top_k <= 0:
+            return []
+
+        query = _normalized(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+        similarities = self.embeddings @ query
+
+        top_k = min(top_k, len(self))
+        nearest = np.argpartition(-similarities, top_k - 1)[:top_k]
+        nearest = nearest[np.argsort(-similarities[nearest])]
+
+        return [
+            (self.fragments[index], float(1 - similarities[index]))
+            for index in nearest
+            if similarities[index] >= similarity_threshold
+        ]
+
+
+def _normalized(matrix: Matrix) -> Matrix:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def get_local_index(path: Path) -> LocalVectorIndex:
+    """
+    The index saved at :path:, loaded once and again whenever its files
+    change (their modification time or size), e.g. after an ingestion.
+    """
+    version = _files_version(path)
+    loaded = _indexes.get(path)
+
+    if loaded is not None and loaded[0] == version:
+        return loaded[1]
+
+    try:
+        index = LocalVectorIndex.load(path)
+    except ValueError:
+        if loaded is None:
+            raise
+
+        # Read between the renames of a save: the files do not match yet, so
+        # the previous index is kept until they do.
+        return loaded[1]
+
+    _indexes[path] = (version, index)
+    return index
+
+
+def _files_version(path: Path) -> tuple[int, ...]:
+    stats = [path.with_name(f"{path.name}{suffix}").stat() for suffix in (".npy", ".json")]
+    return tuple(value for stat in stats for value in (stat.st_mtime_ns, stat.st_size))
+
+
+def export_from_bigquery(client: bigquery.Client, table_ref: str, path: Path) -> LocalVectorIndex:
+    """Copy the fragments table at :table_ref: into a local index saved at :path:."""
+    rows = client.query(
+        f"SELECT document_id, fragment_text, created_at, embedding FROM `{table_ref}`"
+    ).result()
+
+    index = LocalVectorIndex.from_embeddings(
+        (DocumentFragment.model_validate(dict(row.items())), row.embedding) for row in rows
+    )
+    index.save(path)
+
+    return index
+
+
+if __name__ == "__main__":
+    from chat.clients import create_bq_client
+    from env import env
+
+    environment = env()
+    index = export_from_bigquery(
+        create_bq_client(environment.project_id),
+        f"{environment.project_id}.{environment.dataset}.{environment.table}",
+        environment.rag_index,
+    )
+    print(f"Exported {len(index)} fragments to {environment.rag_index}")
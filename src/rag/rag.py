@@ -1,34 +1,161 @@
 # pyright: reportUnknownVariableType=false, reportUnknownMemberType=false
-from typing import cast, final
+import asyncio
+from collections.abc import Sequence
+import time
+from typing import assert_never, cast, final
 from google.cloud import bigquery
-from google.genai.types import ContentEmbedding
 
 from chat.types import Dependencies
-from rag.types import DocumentFragment, RAGQuery
+from rag.embedding_cache import EmbeddingCache, get_embedding_cache
+from rag.local_index import get_local_index
+from rag.types import DocumentFragment, RAGQueries, RAGQuery
+from repository.async_query import get_query_runner
+from telemetry import get_telemetry
+
+# The usual constant of reciprocal rank fusion: it dampens how much the first
+# places of a single ranking weigh over fragments that several rankings agree on.
+RRF_K = 60
+
+# How long the version of the corpus is trusted before it is read again.
+CORPUS_VERSION_TTL = 60.0
+
+_corpus_versions = dict[str, tuple[float, str]]()
 
 
 @final
 class RAGTool:
-    def __init__(self, deps: Dependencies, embedding_model: str = "models/embedding-001"):
+    def __init__(
+        self,
+        deps: Dependencies,
+        embedding_model: str = "models/embedding-001",
+        cache: EmbeddingCache | None = None,
+    ):
         self._deps = deps
         self._embedding_model = embedding_model
+        self._cache = cache or get_embedding_cache()
 
-    async def _get_embedding(self, text: str) -> ContentEmbedding | None:
-        response = await self._deps.google_client.models.embed_content(
-            model=self._embedding_model, contents=text, config={"task_type": "retrieval_query"}
-        )
-        return response.embeddings[0] if response.embeddings else None
+    async def _get_embeddings(
+        self, texts: Sequence[str], task_type: str = "retrieval_query"
+    ) -> list[list[float] | None]:
+        """
+        The embeddings of :texts:, in order. Those not cached are requested
+        together, in one call.
+        """
+        with get_telemetry().span("rag.embedding", texts=len(texts)) as span:
+            embeddings = [self._cache.get(self._embedding_model, task_type, text) for text in texts]
+            missing = [index for index, values in enumerate(embeddings) if values is None]
+            span.attributes["cached"] = len(texts) - len(missing)
+
+            if not missing:
+                return embeddings
+
+            response = await self._deps.google_client.models.embed_content(
+                model=self._embedding_model,
+                contents=[texts[index] for index in missing],
+                config={"task_type": task_type},
+            )
+
+        for index, embedding in zip(missing, response.embeddings or []):
+            if embedding.values:
+                embeddings[index] = embedding.values
+                self._cache.put(self._embedding_model, task_type, texts[index], embedding.values)
+
+        return embeddings
+
+    async def get_similarity_embedding(self, text: str) -> list[float] | None:
+        """The embedding of :text: to compare it with other texts, not to search with."""
+        [embedding_values] = await self._get_embeddings([text], "semantic_similarity")
+        return embedding_values
+
+    async def corpus_version(self) -> str:
+        """
+        A version of the fragments searched, which changes when they do: the
+        modification time and size of the local index, or of the BigQuery
+        table. It is read again at most every `CORPUS_VERSION_TTL` seconds.
+        """
+        env = self._deps.env
+        table_ref = f"{env.project_id}.{env.dataset}.{env.table}"
+        key = f"{env.rag}:{env.rag_index if env.rag == 'local' else table_ref}"
+        cached = _corpus_versions.get(key)
+
+        if cached is not None and time.monotonic() - cached[0] < CORPUS_VERSION_TTL:
+            return cached[1]
+
+        match env.rag:
+            case "local":
+                version = "-".join(
+                    f"{stat.st_mtime_ns}:{stat.st_size}"
+                    for stat in (
+                        env.rag_index.with_name(f"{env.rag_index.name}{suffix}").stat()
+                        for suffix in (".npy", ".json")
+                    )
+                )
+            case "bigquery":
+                table = await asyncio.to_thread(self._deps.bq_client.get_table, table_ref)
+                modified = table.modified.isoformat() if table.modified else ""
+                version = f"{modified}:{table.num_rows}"
+            case _:
+                assert_never(env.rag)
+
+        _corpus_versions[key] = (time.monotonic(), version)
+        return version
 
     async def retrieve_with_vector_search(
         self, rag_query: RAGQuery
     ) -> list[tuple[DocumentFragment, float]]:
-        query_embedding_obj = await self._get_embedding(rag_query.query)
+        [embedding_values] = await self._get_embeddings([rag_query.query])
 
-        if query_embedding_obj is None:
+        if embedding_values is None:
             return []
 
-        # The actual list of float values for the embedding
-        embedding_values = query_embedding_obj.values
+        return await self._search(embedding_values, rag_query)
+
+    async def retrieve_many(self, rag_queries: RAGQueries) -> list[tuple[DocumentFragment, float]]:
+        """
+        Search every query of :rag_queries: at once: their embeddings are
+        requested in one call and the searches run concurrently. The
+        fragments found are merged by reciprocal rank fusion.
+        """
+        embeddings = await self._get_embeddings(rag_queries.queries)
+        rankings = await asyncio.gather(
+            *(
+                self._search(
+                    embedding_values,
+                    RAGQuery(
+                        query=query,
+                        top_k=rag_queries.top_k,
+                        similarity_threshold=rag_queries.similarity_threshold,
+                    ),
+                )
+                for query, embedding_values in zip(rag_queries.queries, embeddings)
+                if embedding_values is not None
+            )
+        )
+
+        return reciprocal_rank_fusion(rankings)
+
+    async def _search(
+        self, embedding_values: list[float], rag_query: RAGQuery
+    ) -> list[tuple[DocumentFragment, float]]:
+        env = self._deps.env
+
+        match env.rag:
+            case "local":
+                # Loading and scanning a large index takes a while, and numpy
+                # releases the GIL while it multiplies.
+                return await asyncio.to_thread(
+                    lambda: get_local_index(env.rag_index).search(
+                        embedding_values, rag_query.top_k, rag_query.similarity_threshold
+                    )
+                )
+            case "bigquery":
+                return await self._search_bigquery(embedding_values, rag_query)
+
+        assert_never(env.rag)
+
+    async def _search_bigquery(
+        self, embedding_values: list[float], rag_query: RAGQuery
+    ) -> list[tuple[DocumentFragment, float]]:
         env = self._deps.env
 
         # 1. The SQL query now uses named placeholders (@param_name) instead of f-string formatting for values.
@@ -57,11 +184,34 @@ class RAGTool:
 
         # 3. Pass the query and the job_config to the client.
         #    The client library will now safely handle parameter substitution.
-        query_job = self._deps.bq_client.query(bq_query, job_config=job_config)
-        results = query_job.result()
+        #    It runs on the query thread pool, so a slow search does not block other sessions.
+        results = await get_query_runner().query(self._deps.bq_client, bq_query, job_config)
         documents = list[tuple[DocumentFragment, float]]()
 
         for row in results:
             documents.append((DocumentFragment.model_validate(row.base), cast(float, row.distance)))
 
         return documents
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[tuple[DocumentFragment, float]]], k: int = RRF_K
+) -> list[tuple[DocumentFragment, float]]:
+    """
+    Merge :rankings: of fragments, best first, into one. Each fragment scores
+    1 / (:k: + rank) in each ranking it is in, and fragments are sorted by
+    their total. A fragment found several times is kept once, with its
+    lowest distance.
+    """
+    scores = dict[tuple[str, str], float]()
+    best = dict[tuple[str, str], tuple[DocumentFragment, float]]()
+
+    for ranking in rankings:
+        for rank, (fragment, distance) in enumerate(ranking, start=1):
+            key = (fragment.document_id, fragment.fragment_text)
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank)
+
+            if key not in best or distance < best[key][1]:
+                best[key] = (fragment, distance)
+
+    return [best[key] for key in sorted(scores, key=scores.__getitem__, reverse=True)]
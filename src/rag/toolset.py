@@ -1,10 +1,14 @@
+import logging
+
 from pydantic_ai import RunContext
 from pydantic_ai.toolsets import FunctionToolset
 
 from chat.types import Citation, Dependencies
 from rag.rag import RAGTool
-from rag.types import DocumentFragment, RAGQuery
+from rag.types import DocumentFragment, RAGQueries, RAGQuery
+
 
+logger = logging.getLogger(__name__)
 
 rag_toolset = FunctionToolset[Dependencies](max_retries=3)
 
@@ -20,13 +24,42 @@ async def query_rag(ctx: RunContext[Dependencies], input: RAGQuery) -> list[tupl
     Returns:
         A list of each relevant match, its nearby context, and its distance.
     """
-    print(f"{input = }")
+    logger.debug("input = %r", input)
     tool = RAGTool(deps=ctx.deps)
     result = await tool.retrieve_with_vector_search(input)
-    print(f"{result = }")
+    logger.debug("result = %r", result)
+
+    for document, _ in result:
+        ctx.deps.quotes.add(Citation(
+            author=document.document_id,
+            text=document.fragment_text
+        ))
+
+    return result
+
+
+@rag_toolset.tool
+async def query_rag_many(
+    ctx: RunContext[Dependencies], input: RAGQueries
+) -> list[tuple[DocumentFragment, float]]:
+    """
+    Query the same RAG as `query_rag` with several queries at once. Prefer it
+    to calling `query_rag` several times, e.g. to search different aspects of
+    a question, or different phrasings of it.
+
+    Args:
+        input: The queries and their configuration.
+    Returns:
+        The relevant matches of every query, without repeats, the most
+        relevant to the most queries first, with their distance.
+    """
+    logger.debug("input = %r", input)
+    tool = RAGTool(deps=ctx.deps)
+    result = await tool.retrieve_many(input)
+    logger.debug("result = %r", result)
 
     for document, _ in result:
-        ctx.deps.quotes.append(Citation(
+        ctx.deps.quotes.add(Citation(
             author=document.document_id,
             text=document.fragment_text
         ))
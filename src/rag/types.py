@@ -16,3 +16,15 @@ class RAGQuery(BaseModel):
     query: str
     top_k: int = Field(default=3, description="Number of most relevant documents to retrieve")
     similarity_threshold: float = Field(default=0.3, description="Minimum similarity threshold")
+
+
+class RAGQueries(BaseModel):
+    """Several queries to search in the knowledge database (RAG) at once."""
+
+    queries: list[str] = Field(
+        min_length=1,
+        max_length=10,
+        description="Different questions or phrasings, each searched on its own",
+    )
+    top_k: int = Field(default=3, description="Number of most relevant documents per query")
+    similarity_threshold: float = Field(default=0.3, description="Minimum similarity threshold")
@@ -0,0 +1,98 @@
+# pyright: reportUnknownMemberType=false, reportUnknownVariableType=false
+from __future__ import annotations
+import asyncio
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from functools import cache
+from typing import final
+
+from google.cloud import bigquery
+
+from telemetry import get_telemetry
+
+
+@final
+class AsyncQueryRunner:
+    """
+    Runs blocking BigQuery calls on a bounded thread pool so they do not stall
+    the event loop shared by every session.
+
+    At most `max_concurrency` calls run at once; the rest wait in line. Each
+    call is given up on after `timeout` seconds, unless a different timeout
+    is passed.
+    """
+
+    def __init__(self, *, max_concurrency: int = 8, timeout: float = 30.0) -> None:
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="bigquery"
+        )
+
+    async def run[T](self, func: Callable[[], T], *, timeout: float | None = None) -> T:
+        """Run :func: on the pool and wait for it without blocking the loop."""
+        # In the caller's context, so its spans are the parents of those of :func:.
+        context = contextvars.copy_context()
+        future = asyncio.get_running_loop().run_in_executor(self._executor, context.run, func)
+        return await asyncio.wait_for(future, timeout or self.timeout)
+
+    async def query(
+        self,
+        client: bigquery.Client,
+        query: str,
+        job_config: bigquery.QueryJobConfig | None = None,
+        *,
+        timeout: float | None = None,
+    ) -> list[bigquery.Row]:
+        """Run :query: and fetch every row."""
+        timeout = timeout or self.timeout
+        return await self.run(
+            lambda: run_query(client, query, job_config, timeout=timeout), timeout=timeout
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_query(
+    client: bigquery.Client,
+    query: str,
+    job_config: bigquery.QueryJobConfig | None = None,
+    *,
+    timeout: float | None = None,
+) -> list[bigquery.Row]:
+    """
+    Run :query: and fetch every row, blocking. The bytes it scanned are
+    recorded in its span and added to the `bigquery_bytes_processed` counter.
+    """
+    return list(iter_query(client, query, job_config, timeout=timeout))
+
+
+def iter_query(
+    client: bigquery.Client,
+    query: str,
+    job_config: bigquery.QueryJobConfig | None = None,
+    *,
+    timeout: float | None = None,
+    page_size: int | None = None,
+) -> Iterator[bigquery.Row]:
+    """
+    Run :query: and yield its rows, fetching `page_size` of them at a time,
+    so only one page is in memory. The span times the query, not the reads.
+    """
+    telemetry = get_telemetry()
+
+    with telemetry.span("bigquery.query") as span:
+        query_job = client.query(query, job_config=job_config)
+        rows = query_job.result(timeout=timeout, page_size=page_size)
+        bytes_processed = query_job.total_bytes_processed or 0
+        span.attributes["bytes_processed"] = bytes_processed
+
+    telemetry.increment("bigquery_bytes_processed", bytes_processed)
+    telemetry.increment("bigquery_queries")
+    yield from rows
+
+
+@cache
+def get_query_runner() -> AsyncQueryRunner:
+    return AsyncQueryRunner()
@@ -1,18 +1,40 @@
 # pyright: reportUnknownMemberType=false, reportUnknownVariableType=false
 from __future__ import annotations
+from collections.abc import Iterable
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import io
+import logging
 from google.cloud import bigquery
 
+from repository.async_query import AsyncQueryRunner, get_query_runner, run_query
+from repository.partitioning import LAYOUTS, partition_filter
 from repository.types import ConversationCreationModel, ConversationModel, MessageModel
+from repository.write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
 
 
 class ConversationRepository:
     """Repository implementation for the conversations table in BigQuery."""
 
-    def __init__(self, client: bigquery.Client, project_id: str, dataset_id: str):
+    def __init__(
+        self,
+        client: bigquery.Client,
+        project_id: str,
+        dataset_id: str,
+        writer: WriteBehindQueue | None = None,
+        runner: AsyncQueryRunner | None = None,
+        lookback: timedelta | None = None,
+    ):
+        """
+        :param lookback: Si se especifica, sólo se leen los mensajes de ese
+            tiempo atrás en adelante, así sólo se leen sus particiones.
+        """
         self.client: bigquery.Client = client
+        self.writer: WriteBehindQueue | None = writer
+        self.runner: AsyncQueryRunner = runner or get_query_runner()
+        self.lookback: timedelta | None = lookback
         self.table_ref: str = f"{project_id}.{dataset_id}.conversations"
         self.table_child_ref: str = f"{project_id}.{dataset_id}.messages"
         self.id_column: str = "conversation_id"
@@ -29,6 +51,11 @@ class ConversationRepository:
         data = ConversationCreationModel(
             conversation_id=conversation_id, user_id=user_id, started_at=datetime.now(timezone.utc)
         )
+
+        if self.writer is not None:
+            self.writer.enqueue(self.table_ref, data)
+            return conversation_id
+
         json_data = data.model_dump_json()
 
 
@@ -47,12 +74,59 @@ class ConversationRepository:
 
         # Espera a que el trabajo de carga termine.
         _ = load_job.result()
-        print(f"Conversation created successfully with ID: {conversation_id}")
+        logger.debug("Conversation created successfully with ID: %s", conversation_id)
         return conversation_id
 
-    def read(self, record_id: str) -> ConversationModel | None:
+    def read(self, record_id: str, *, last: int | None = None) -> ConversationModel | None:
+        """Lee una conversación con sus mensajes en una sola consulta.
+
+        :param record_id: El ID de la conversación.
+        :param last: Si se especifica, sólo se leen los últimos :last: mensajes.
+        :return: La conversación (aunque no tenga mensajes), o None si no existe.
+        """
+        query, job_config = self._read_query(record_id, last)
+        return _conversation_from_rows(run_query(self.client, query, job_config))
+
+    async def aread(self, record_id: str, *, last: int | None = None) -> ConversationModel | None:
+        """Como `read`, sin bloquear el event loop."""
+        query, job_config = self._read_query(record_id, last)
+        return _conversation_from_rows(await self.runner.query(self.client, query, job_config))
+
+    def read_since(self, conversation_id: str, after_timestamp: datetime) -> list[MessageModel]:
+        """Lee los mensajes de una conversación posteriores a :after_timestamp:, en orden."""
+        query, job_config = self._read_since_query(conversation_id, after_timestamp)
+        results = run_query(self.client, query, job_config)
+
+        return [_message_from_row(row) for row in results]
+
+    async def aread_since(
+        self, conversation_id: str, after_timestamp: datetime
+    ) -> list[MessageModel]:
+        """Como `read_since`, sin bloquear el event loop."""
+        query, job_config = self._read_since_query(conversation_id, after_timestamp)
+        results = await self.runner.query(self.client, query, job_config)
+
+        return [_message_from_row(row) for row in results]
+
+    def read_last(self, conversation_id: str, n: int) -> list[MessageModel]:
+        """Lee los últimos :n: mensajes de una conversación, en orden."""
+        query, job_config = self._read_last_query(conversation_id, n)
+        results = run_query(self.client, query, job_config)
+
+        return [_message_from_row(row) for row in results][::-1]
+
+    async def aread_last(self, conversation_id: str, n: int) -> list[MessageModel]:
+        """Como `read_last`, sin bloquear el event loop."""
+        query, job_config = self._read_last_query(conversation_id, n)
+        results = await self.runner.query(self.client, query, job_config)
+
+        return [_message_from_row(row) for row in results][::-1]
+
+    def _read_query(self, record_id: str, last: int | None) -> tuple[str, bigquery.QueryJobConfig]:
+        limit = "ORDER BY timestamp DESC LIMIT @last" if last is not None else ""
+        partition, partition_parameters = self._messages_partition()
         query = f"""
-                    SELECT 
+                    SELECT
                         t1.conversation_id,
                         t1.user_id,
                         t1.started_at,
@@ -61,48 +135,98 @@ class ConversationRepository:
                         t2.message_text,
                         t2.timestamp AS message_timestamp
                     FROM `{self.table_ref}` AS t1
-                    JOIN `{self.table_child_ref}` AS t2
+                    LEFT JOIN (
+                        SELECT *
+                        FROM `{self.table_child_ref}`
+                        WHERE conversation_id = @record_id {partition}
+                        {limit}
+                    ) AS t2
                     ON t1.conversation_id = t2.conversation_id
-                    WHERE t1.conversation_id = @record_id 
+                    WHERE t1.conversation_id = @record_id
                     ORDER BY t2.timestamp ASC"""
 
-        job_config = bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("record_id", "STRING", record_id)]
+        query_parameters = [
+            bigquery.ScalarQueryParameter("record_id", "STRING", record_id),
+            *partition_parameters,
+        ]
+
+        if last is not None:
+            query_parameters.append(bigquery.ScalarQueryParameter("last", "INT64", last))
+
+        return query, bigquery.QueryJobConfig(query_parameters=query_parameters)
+
+    def _read_since_query(
+        self, conversation_id: str, after_timestamp: datetime
+    ) -> tuple[str, bigquery.QueryJobConfig]:
+        partition, partition_parameters = self._messages_partition()
+        query = f"""
+                    SELECT *
+                    FROM `{self.table_child_ref}`
+                    WHERE conversation_id = @conversation_id AND timestamp > @after_timestamp
+                        {partition}
+                    ORDER BY timestamp ASC"""
+
+        return query, bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("conversation_id", "STRING", conversation_id),
+                bigquery.ScalarQueryParameter("after_timestamp", "TIMESTAMP", after_timestamp),
+                *partition_parameters,
+            ]
+        )
+
+    def _read_last_query(self, conversation_id: str, n: int) -> tuple[str, bigquery.QueryJobConfig]:
+        partition, partition_parameters = self._messages_partition()
+        query = f"""
+                    SELECT *
+                    FROM `{self.table_child_ref}`
+                    WHERE conversation_id = @conversation_id {partition}
+                    ORDER BY timestamp DESC
+                    LIMIT @n"""
+
+        return query, bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("conversation_id", "STRING", conversation_id),
+                bigquery.ScalarQueryParameter("n", "INT64", n),
+                *partition_parameters,
+            ]
         )
-        query_job = self.client.query(query, job_config=job_config)
-        results = query_job.result()
-
-        if not results.total_rows:
-            return None
-
-        first_row = next(results)
-
-        conversation_data = {
-            "conversation_id": first_row.conversation_id,
-            "user_id": first_row.user_id,
-            "started_at": first_row.started_at,
-            "messages": [],
-        }
-
-        query_job = self.client.query(query, job_config=job_config)
-        for row in query_job.result():
-            if row.message_id:
-                message_data = {
-                    "message_id": row.message_id,
-                    "conversation_id": row.conversation_id,
-                    "sender": row.sender,
-                    "message_text": (row.message_text),
-                    "timestamp": row.message_timestamp,
-                }
-                validated_message = MessageModel.model_validate(message_data).model_dump()
-                _ = conversation_data["messages"].append(validated_message)
-
-        return ConversationModel.model_validate(conversation_data)
+
+    def _messages_partition(self) -> tuple[str, list[bigquery.ScalarQueryParameter]]:
+        # Conversations are few and clustered by id, so only the messages
+        # are limited to the partitions of the lookback.
+        return partition_filter(LAYOUTS["messages"].partition_column, self.lookback)
 
     def delete(self, record_id: str) -> bool:
         query = f"DELETE FROM `{self.table_ref}` WHERE {self.id_column} = @record_id"
         job_config = bigquery.QueryJobConfig(
             query_parameters=[bigquery.ScalarQueryParameter("record_id", "STRING", record_id)]
         )
-        _ = self.client.query(query, job_config=job_config).result()
+        _ = run_query(self.client, query, job_config)
         return True
+
+
+def _conversation_from_rows(rows: Iterable[bigquery.Row]) -> ConversationModel | None:
+    conversation: ConversationModel | None = None
+
+    for row in rows:
+        if conversation is None:
+            conversation = ConversationModel(
+                conversation_id=row.conversation_id,
+                user_id=row.user_id,
+                started_at=row.started_at,
+            )
+
+        if row.message_id:
+            conversation.messages.append(_message_from_row(row, "message_timestamp"))
+
+    return conversation
+
+
+def _message_from_row(row: bigquery.Row, timestamp_column: str = "timestamp") -> MessageModel:
+    return MessageModel.model_validate({
+        "message_id": row.message_id,
+        "conversation_id": row.conversation_id,
+        "sender": row.sender,
+        "message_text": row.message_text,
+        "timestamp": row[timestamp_column],
+    })
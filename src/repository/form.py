@@ -1,29 +1,77 @@
 from __future__ import annotations
 import uuid
-from datetime import datetime, date
+import base64
+from datetime import datetime, date, timedelta, timezone
 import io
+import json
+import logging
+import tempfile
+from collections.abc import Iterable, Iterator
 from typing import Literal, Tuple
 
 from google.cloud import bigquery
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from message import MessageModel
 from forms.test_form import IthakaEvaluationSupportForm, Evaluator, UcuCommunityMember, Faculty, Stage, ProfileType,SupportType, Mentor, FollowUpPerson
+from repository.async_query import iter_query, run_query
+from repository.partitioning import LAYOUTS, ensure_columns, partition_filter
+
+logger = logging.getLogger(__name__)
+
+# Lo que ocupa en memoria un lote de forms antes de pasar a disco.
+SPOOL_SIZE = 16 * 1024 * 1024
+SCAN_PAGE_SIZE = 1000
+
+# Columnas agregadas a la tabla después de creada, con su tipo en BigQuery.
+ADDED_COLUMNS = {"updated_at": "TIMESTAMP"}
+
+# Las tablas a las que ya se les agregaron `ADDED_COLUMNS`.
+_migrated_tables = set[str]()
+
+# Los forms guardados antes de que existiera `updated_at` lo tienen en NULL:
+# se ordenan como si se hubieran guardado en esta fecha, antes que los demás.
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_UPDATED_AT = "COALESCE(updated_at, @epoch)"
+_EPOCH_PARAMETER = bigquery.ScalarQueryParameter("epoch", "TIMESTAMP", EPOCH)
+
+
+type IndexedField = Literal["idea", "sponsor", "name", "date_of_completion"]
 
 
 class FormModel(IthakaEvaluationSupportForm):
     form_id: str
-    message_id: str
+    message_id: str | None = None
+    # Forms are never updated in place: every save appends a new version.
+    # None for forms saved before the column existed.
+    updated_at: datetime | None = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class FormPage(BaseModel):
+    forms: list[FormModel]
+    # Para pedir la página siguiente; None si es la última.
+    next_page_token: str | None = None
 
 
 class FormRepository:
     """Repository implementation for the froms table in BigQuery."""
 
-    def __init__(self, client: bigquery.Client, project_id: str, dataset_id: str):
+    def __init__(
+        self,
+        client: bigquery.Client,
+        project_id: str,
+        dataset_id: str,
+        *,
+        lookback: timedelta | None = None,
+    ):
+        """
+        :param lookback: Si se especifica, sólo se leen los forms guardados de
+            ese tiempo atrás en adelante, así sólo se leen sus particiones.
+        """
         self.client: bigquery.Client = client
         self.table_ref: str = f"{project_id}.{dataset_id}.forms"
         self.id_column: str = "form_id"
         self.participant_column: str = "name"
+        self.lookback: timedelta | None = lookback
 
     def create(self,
                message_id: str,
@@ -63,7 +111,14 @@ class FormRepository:
                          follow_up_personnel=follow_up_personnel,
                          internal_comments=internal_comments,
                          message_for_applicant=message_for_applicant)
-        json_data = data.model_dump_json()
+        self.save(data)
+        logger.debug("Formulario creado con ID: %s", new_id)
+        return new_id
+
+    def save(self, form: FormModel) -> None:
+        """Guarda una nueva versión de :form:, que reemplaza a las anteriores con su ID."""
+        self._migrate()
+        json_data = form.model_dump_json()
 
         jsonl_data = io.BytesIO(f"{json_data}\n".encode('utf-8'))
 
@@ -79,27 +134,201 @@ class FormRepository:
         )
 
         _ = load_job.result()
-        print(f"Formulario creado con ID: {new_id}")
-        return new_id
 
-    def read(self, name: str) -> FormModel | None:
-        query = (f"""
+    def save_many(self, forms: Iterable[FormModel]) -> int:
+        """
+        Guarda una nueva versión de cada uno de :forms: con un solo load job.
+        Los forms se escriben a un archivo temporal, no se tienen en memoria.
+
+        :return: Cuántos forms se guardaron.
+        """
+        count = 0
+
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as jsonl_data:
+            for form in forms:
+                _ = jsonl_data.write(f"{form.model_dump_json()}\n".encode('utf-8'))
+                count += 1
+
+            if count == 0:
+                return 0
+
+            _ = jsonl_data.seek(0)
+            self._migrate()
+            job_config = bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+                write_disposition=bigquery.WriteDisposition.WRITE_APPEND
+            )
+            load_job = self.client.load_table_from_file(
+                jsonl_data,
+                self.table_ref,
+                job_config=job_config
+            )
+            _ = load_job.result()
+
+        logger.debug("%d formularios guardados en %s", count, self.table_ref)
+        return count
+
+    def _migrate(self) -> None:
+        """Agrega `ADDED_COLUMNS` a la tabla, una vez por proceso, antes de escribir."""
+        if self.table_ref not in _migrated_tables:
+            _ = ensure_columns(self.client, self.table_ref, ADDED_COLUMNS)
+            _migrated_tables.add(self.table_ref)
+
+    def read_by_id(self, form_id: str) -> FormModel | None:
+        """
+        :return: La última versión del form con ID :form_id:, o None si no existe.
+        """
+        partition, partition_parameters = self._partition()
+        query = f"""
                     SELECT *
                     FROM `{self.table_ref}`
-                    WHERE `{self.participant_column}` = @name LIMIT 1""")
+                    WHERE {self.id_column} = @form_id {partition}
+                    ORDER BY {_UPDATED_AT} DESC
+                    LIMIT 1"""
 
         job_config = bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("name", "STRING", name)]
+            query_parameters=[
+                bigquery.ScalarQueryParameter("form_id", "STRING", form_id),
+                _EPOCH_PARAMETER,
+                *partition_parameters,
+            ]
         )
-        query_job = self.client.query(query, job_config=job_config)
-        results = list(query_job.result())
+        results = run_query(self.client, query, job_config)
 
         return FormModel.model_validate(dict(results[0].items())) if results else None
 
+    def find(self, field: IndexedField, value: str | date, *, limit: int = 100) -> list[FormModel]:
+        """
+        :param field: El campo por el que se busca.
+        :param value: El valor que debe tener :field: en la última versión del form.
+        :return: Hasta :limit: forms, los completados más recientemente primero.
+        """
+        value_type = "DATE" if field == "date_of_completion" else "STRING"
+        query, parameters = self._latest_query(
+            f"{field} = @value", "date_of_completion DESC, form_id"
+        )
+        query += "\n                    LIMIT @limit"
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("value", value_type, value),
+                bigquery.ScalarQueryParameter("limit", "INT64", limit),
+                *parameters,
+            ]
+        )
+        results = run_query(self.client, query, job_config)
+
+        return [FormModel.model_validate(dict(row.items())) for row in results]
+
+    def list_by_name(
+        self, name: str, *, page_size: int = 50, page_token: str | None = None
+    ) -> FormPage:
+        """
+        Lista los forms de :name:, los guardados más recientemente primero.
+
+        :param page_token: El `next_page_token` de la página anterior, o None
+            para la primera.
+        """
+        condition = f"`{self.participant_column}` = @name"
+        parameters = [
+            bigquery.ScalarQueryParameter("name", "STRING", name),
+            # Uno más, para saber si hay otra página.
+            bigquery.ScalarQueryParameter("limit", "INT64", page_size + 1),
+        ]
+
+        if page_token is not None:
+            updated_at, form_id = json.loads(base64.urlsafe_b64decode(page_token))
+            condition += (
+                f" AND ({_UPDATED_AT} < @after_updated_at"
+                f" OR ({_UPDATED_AT} = @after_updated_at AND form_id > @after_form_id))"
+            )
+            parameters += [
+                bigquery.ScalarQueryParameter(
+                    "after_updated_at", "TIMESTAMP", datetime.fromisoformat(updated_at)
+                ),
+                bigquery.ScalarQueryParameter("after_form_id", "STRING", form_id),
+            ]
+
+        query, partition_parameters = self._latest_query(condition, f"{_UPDATED_AT} DESC, form_id")
+        query += "\n                    LIMIT @limit"
+        job_config = bigquery.QueryJobConfig(query_parameters=[*parameters, *partition_parameters])
+        forms = [
+            FormModel.model_validate(dict(row.items()))
+            for row in run_query(self.client, query, job_config)
+        ]
+
+        if len(forms) <= page_size:
+            return FormPage(forms=forms)
+
+        last = forms[page_size - 1]
+        next_page_token = base64.urlsafe_b64encode(
+            json.dumps([(last.updated_at or EPOCH).isoformat(), last.form_id]).encode()
+        ).decode()
+
+        return FormPage(forms=forms[:page_size], next_page_token=next_page_token)
+
+    def scan(
+        self, field: IndexedField | None = None, value: str | date | None = None
+    ) -> Iterator[FormModel]:
+        """
+        Recorre la última versión de cada form, de a una página por vez.
+
+        :param field: Si se especifica, sólo los forms cuyo :field: es :value:.
+        """
+        parameters = list[bigquery.ScalarQueryParameter]()
+        condition = "TRUE"
+
+        if field is not None:
+            condition = f"{field} = @value"
+            value_type = "DATE" if field == "date_of_completion" else "STRING"
+            parameters.append(bigquery.ScalarQueryParameter("value", value_type, value))
+
+        query, partition_parameters = self._latest_query(condition, self.id_column)
+        job_config = bigquery.QueryJobConfig(query_parameters=[*parameters, *partition_parameters])
+
+        for row in iter_query(self.client, query, job_config, page_size=SCAN_PAGE_SIZE):
+            yield FormModel.model_validate(dict(row.items()))
+
+    def read(self, name: str) -> FormModel | None:
+        """
+        :return: El form de :name: guardado más recientemente, o None si no hay.
+        """
+        page = self.list_by_name(name, page_size=1)
+        return page.forms[0] if page.forms else None
+
+    def _latest_query(
+        self, condition: str, order: str
+    ) -> tuple[str, list[bigquery.ScalarQueryParameter]]:
+        """
+        Consulta por la última versión de los forms que cumplen :condition:,
+        ordenados por :order:.
+        """
+        partition, parameters = self._partition()
+        # Sólo cuenta la última versión de cada form, aunque una anterior cumpla.
+        query = f"""
+                    SELECT *
+                    FROM (
+                        SELECT *, ROW_NUMBER() OVER (
+                            PARTITION BY {self.id_column} ORDER BY {_UPDATED_AT} DESC
+                        ) AS version
+                        FROM `{self.table_ref}`
+                        WHERE {self.id_column} IN (
+                            SELECT {self.id_column}
+                            FROM `{self.table_ref}`
+                            WHERE {condition} {partition}
+                        ) {partition}
+                    )
+                    WHERE version = 1 AND {condition}
+                    ORDER BY {order}"""
+
+        return query, [_EPOCH_PARAMETER, *parameters]
+
+    def _partition(self) -> tuple[str, list[bigquery.ScalarQueryParameter]]:
+        return partition_filter(LAYOUTS["forms"].partition_column, self.lookback)
+
     def delete(self, record_id: str) -> bool:
         query = f"DELETE FROM `{self.table_ref}` WHERE {self.id_column} = @record_id"
         job_config = bigquery.QueryJobConfig(
             query_parameters=[bigquery.ScalarQueryParameter("record_id", "STRING", record_id)]
         )
-        _ = self.client.query(query, job_config=job_config).result()
+        _ = run_query(self.client, query, job_config)
         return True
@@ -1,18 +1,41 @@
 from __future__ import annotations
 from collections.abc import Sequence
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import io
+import logging
 from google.cloud import bigquery
 from pydantic_ai.messages import ModelMessage
 
+from repository.async_query import AsyncQueryRunner, get_query_runner, run_query
+from repository.partitioning import LAYOUTS, partition_filter
 from repository.types import MessageModel, SenderType
+from repository.write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
 
 class MessageRepository:
     """Repository implementation for the messages table in BigQuery."""
 
-    def __init__(self, client: bigquery.Client, project_id: str, dataset_id: str):
+    def __init__(
+        self,
+        client: bigquery.Client,
+        project_id: str,
+        dataset_id: str,
+        writer: WriteBehindQueue | None = None,
+        runner: AsyncQueryRunner | None = None,
+        lookback: timedelta | None = None,
+    ):
+        """
+        :param writer: If set, created messages are buffered and written in
+            batches in the background instead of one load job each.
+        :param lookback: If set, only messages from this long ago on are read,
+            so only their partitions are scanned.
+        """
         self.client: bigquery.Client = client
+        self.writer: WriteBehindQueue | None = writer
+        self.runner: AsyncQueryRunner = runner or get_query_runner()
+        self.lookback: timedelta | None = lookback
         self.table_ref: str = f"{project_id}.{dataset_id}.messages"
         self.id_column: str = "message_id"
 
@@ -31,6 +54,11 @@ class MessageRepository:
             timestamp=datetime.now(timezone.utc),
             message_text=list(content),
         )
+
+        if self.writer is not None:
+            self.writer.enqueue(self.table_ref, data)
+            return new_id
+
         json_data = data.model_dump_json()
 
         jsonl_data = io.BytesIO(f"{json_data}\n".encode())
@@ -47,24 +75,40 @@ class MessageRepository:
         )
 
         _ = load_job.result()
-        print(f"Message created successfully with ID: {new_id}")
+        logger.debug("Message created successfully with ID: %s", new_id)
         return new_id
 
     def read(self, record_id: str) -> MessageModel | None:
-        query = f"SELECT * FROM `{self.table_ref}` WHERE {self.id_column} = @record_id LIMIT 1"
-        job_config = bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("record_id", "STRING", record_id)]
-        )
-        query_job = self.client.query(query, job_config=job_config)
-        results = list(query_job.result())
+        query, job_config = self._read_query(record_id)
+        results = run_query(self.client, query, job_config)
 
         return MessageModel.model_validate(dict(results[0].items())) if results else None
 
+    async def aread(self, record_id: str) -> MessageModel | None:
+        query, job_config = self._read_query(record_id)
+        results = await self.runner.query(self.client, query, job_config)
+
+        return MessageModel.model_validate(dict(results[0].items())) if results else None
+
+    def _read_query(self, record_id: str) -> tuple[str, bigquery.QueryJobConfig]:
+        partition, partition_parameters = partition_filter(
+            LAYOUTS["messages"].partition_column, self.lookback
+        )
+        query = (f"SELECT * FROM `{self.table_ref}` "
+                 f"WHERE {self.id_column} = @record_id {partition} LIMIT 1")
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("record_id", "STRING", record_id),
+                *partition_parameters,
+            ]
+        )
+        return query, job_config
+
     def delete(self, record_id: str) -> bool:
         query = f"DELETE FROM `{self.table_ref}` WHERE {self.id_column} = @record_id"
         job_config = bigquery.QueryJobConfig(
             query_parameters=[bigquery.ScalarQueryParameter("record_id", "STRING", record_id)]
         )
 
-        _ = self.client.query(query, job_config=job_config).result()
+        _ = run_query(self.client, query, job_config)
         return True
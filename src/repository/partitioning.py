@@ -0,0 +1,150 @@
+from __future__ import annotations
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import logging
+
+from google.cloud import bigquery
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TableLayout:
+    """Cómo se particiona (por día) y agrupa una tabla."""
+
+    partition_column: str
+    clustering: tuple[str, ...]
+
+    @property
+    def partition_expression(self) -> str:
+        return f"DATE({self.partition_column})"
+
+
+LAYOUTS = {
+    "conversations": TableLayout("started_at", ("conversation_id", "user_id")),
+    "messages": TableLayout("timestamp", ("conversation_id", "message_id")),
+    "forms": TableLayout("updated_at", ("form_id", "name")),
+}
+
+
+def partition_filter(
+    column: str, lookback: timedelta | None
+) -> tuple[str, list[bigquery.ScalarQueryParameter]]:
+    """
+    Condición que limita una consulta a las particiones de los últimos
+    :lookback:, para que BigQuery no lea las demás.
+
+    :param column: La columna por la que se particiona.
+    :return: La condición (vacía si :lookback: es None), que empieza con AND,
+        y sus parámetros.
+    """
+    if lookback is None:
+        return "", []
+
+    since = datetime.now(timezone.utc) - lookback
+
+    return f"AND {column} >= @partition_since", [
+        bigquery.ScalarQueryParameter("partition_since", "TIMESTAMP", since)
+    ]
+
+
+def ensure_columns(
+    client: bigquery.Client, table_ref: str, columns: Mapping[str, str]
+) -> list[str]:
+    """
+    Agrega a :table_ref: las columnas de :columns: (nombre y tipo de BigQuery)
+    que todavía no tenga, como NULLABLE. Las cargas NDJSON rechazan los campos
+    que no están en el esquema de la tabla. Las filas que ya estaban quedan
+    con NULL en ellas.
+
+    :return: Las columnas agregadas.
+    """
+    table = client.get_table(table_ref)
+    known = {field.name for field in table.schema}
+    added = [
+        bigquery.SchemaField(name, field_type, mode="NULLABLE")
+        for name, field_type in columns.items()
+        if name not in known
+    ]
+
+    if added:
+        table.schema = [*table.schema, *added]
+        _ = client.update_table(table, ["schema"])
+        logger.info("Added %s to %s", ", ".join(field.name for field in added), table_ref)
+
+    return [field.name for field in added]
+
+
+def apply_layout(client: bigquery.Client, table_ref: str, layout: TableLayout) -> bool:
+    """
+    Particiona y agrupa la tabla :table_ref: según :layout:, si no lo está.
+
+    BigQuery no permite particionar una tabla existente, así que se copia a
+    una tabla nueva que reemplaza a la original. Las filas escritas durante la
+    copia se pierden: hay que hacerlo con la aplicación detenida.
+
+    :return: Si la tabla cambió.
+    """
+    # Para tablas de antes de que existiera la columna, como `forms.updated_at`.
+    _ = ensure_columns(client, table_ref, {layout.partition_column: "TIMESTAMP"})
+
+    table = client.get_table(table_ref)
+    partitioning = table.time_partitioning
+    clustering = list(layout.clustering)
+
+    if partitioning is not None and partitioning.field == layout.partition_column:
+        if table.clustering_fields == clustering:
+            return False
+
+        # El agrupamiento sí se puede cambiar en el lugar.
+        table.clustering_fields = clustering
+        _ = client.update_table(table, ["clustering_fields"])
+        logger.info("Clustered %s by %s", table_ref, ", ".join(clustering))
+        return True
+
+    staging_ref = f"{table_ref}_partitioned"
+    script = f"""
+        CREATE TABLE `{staging_ref}`
+        PARTITION BY {layout.partition_expression}
+        CLUSTER BY {", ".join(clustering)}
+        AS SELECT * FROM `{table_ref}`;
+        DROP TABLE `{table_ref}`;
+        ALTER TABLE `{staging_ref}` RENAME TO `{table_ref.split(".")[-1]}`;"""
+
+    _ = client.query(script).result()
+    logger.info(
+        "Partitioned %s by %s and clustered it by %s",
+        table_ref,
+        layout.partition_expression,
+        ", ".join(clustering),
+    )
+    return True
+
+
+def apply_layouts(client: bigquery.Client, project_id: str, dataset_id: str) -> list[str]:
+    """
+    Aplica `LAYOUTS` a las tablas del dataset.
+
+    :return: Las tablas que cambiaron.
+    """
+    changed = list[str]()
+
+    for table, layout in LAYOUTS.items():
+        table_ref = f"{project_id}.{dataset_id}.{table}"
+
+        if apply_layout(client, table_ref, layout):
+            changed.append(table_ref)
+
+    return changed
+
+
+if __name__ == "__main__":
+    from chat.clients import create_bq_client
+    from env import env
+
+    environment = env()
+    changed = apply_layouts(
+        create_bq_client(environment.project_id), environment.project_id, environment.dataset
+    )
+    print(f"Changed {len(changed)} tables: {', '.join(changed) or 'none'}")
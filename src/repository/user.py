@@ -5,13 +5,24 @@ import uuid
 
 from google.cloud import bigquery
 
+from repository.async_query import AsyncQueryRunner, get_query_runner, run_query
 from repository.types import UserModel
+from repository.write_behind import WriteBehindQueue
 
 class UserRepository:
     """Repository implementation for the users table in BigQuery."""
 
-    def __init__(self, client: bigquery.Client, project_id: str, dataset_id: str):
+    def __init__(
+        self,
+        client: bigquery.Client,
+        project_id: str,
+        dataset_id: str,
+        writer: WriteBehindQueue | None = None,
+        runner: AsyncQueryRunner | None = None,
+    ):
         self.client: bigquery.Client = client
+        self.writer: WriteBehindQueue | None = writer
+        self.runner: AsyncQueryRunner = runner or get_query_runner()
         self.table_ref: str = f"{project_id}.{dataset_id}.users"
         self.id_column: str = "user_id"
 
@@ -19,6 +30,11 @@ class UserRepository:
         # Crea un nuevo usuario con un ID autonumérico.
         new_id = str(uuid.uuid4())
         data = UserModel(user_id=new_id)
+
+        if self.writer is not None:
+            self.writer.enqueue(self.table_ref, data)
+            return new_id
+
         json_data = data.model_dump_json()
 
         jsonl_data = io.BytesIO(f"{json_data}\n".encode())
@@ -38,15 +54,24 @@ class UserRepository:
         return new_id
 
     def read(self, record_id: str) -> UserModel | None:
+        query, job_config = self._read_query(record_id)
+        results = run_query(self.client, query, job_config)
+
+        return UserModel.model_validate(dict(results[0].items())) if results else None
+
+    async def aread(self, record_id: str) -> UserModel | None:
+        query, job_config = self._read_query(record_id)
+        results = await self.runner.query(self.client, query, job_config)
+
+        return UserModel.model_validate(dict(results[0].items())) if results else None
+
+    def _read_query(self, record_id: str) -> tuple[str, bigquery.QueryJobConfig]:
         query = (f"SELECT * FROM `{self.table_ref}` "
                  f"WHERE {self.id_column} = @record_id LIMIT 1")
         job_config = bigquery.QueryJobConfig(
             query_parameters=[bigquery.ScalarQueryParameter("record_id", "STRING", record_id)]
         )
-        query_job = self.client.query(query, job_config=job_config)
-        results = list(query_job.result())
-
-        return UserModel.model_validate(dict(results[0].items())) if results else None
+        return query, job_config
 
     def delete(self, record_id: str) -> bool:
         query = (f"DELETE FROM `{self.table_ref}` "
@@ -54,5 +79,5 @@ class UserRepository:
         job_config = bigquery.QueryJobConfig(
             query_parameters=[bigquery.ScalarQueryParameter("record_id", "STRING", record_id)]
         )
-        _ = self.client.query(query, job_config=job_config).result()
+        _ = run_query(self.client, query, job_config)
         return True
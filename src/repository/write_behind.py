@@ -0,0 +1,166 @@
+# pyright: reportUnknownMemberType=false
+from __future__ import annotations
+import atexit
+from collections.abc import Callable
+import io
+import logging
+import queue
+import threading
+import time
+from typing import final
+
+from google.cloud import bigquery
+from pydantic import BaseModel
+
+from telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+
+@final
+class WriteBehindQueue:
+    """
+    Buffers rows for BigQuery tables and writes them in the background.
+
+    Rows from every table and every session share one buffer. They are written
+    every `flush_interval` seconds, or as soon as `max_batch_rows` are waiting,
+    as a single NDJSON load job per table. Failed loads are retried with
+    exponential backoff. The buffer holds at most `max_buffered_rows`; once it
+    is full, e.g. while BigQuery is slow or failing, rows enqueued are dropped
+    and logged. `enqueue` is called from the event loop, which must not wait
+    for room.
+
+    Everything still buffered is written when the process exits.
+    """
+
+    def __init__(
+        self,
+        client: bigquery.Client,
+        *,
+        flush_interval: float = 1.0,
+        max_batch_rows: int = 500,
+        max_buffered_rows: int = 10_000,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.client: bigquery.Client = client
+        self._flush_interval = flush_interval
+        self._max_batch_rows = max_batch_rows
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._sleep = sleep
+        self._queue = queue.Queue[tuple[str, str] | None](maxsize=max_buffered_rows)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+        _ = atexit.register(self.close)
+
+    def enqueue(self, table_ref: str, row: BaseModel) -> None:
+        """Buffer :row: to be appended to :table_ref:, or drop it if the buffer is full."""
+        self._start()
+
+        try:
+            self._queue.put_nowait((table_ref, row.model_dump_json()))
+        except queue.Full:
+            logger.error("Write buffer full, dropping a row for %s", table_ref)
+            get_telemetry().increment("bigquery_rows_dropped")
+
+    def flush(self) -> None:
+        """Block until every row enqueued so far has been written (or given up on)."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Write everything that is buffered and stop the background thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+
+        if thread is None:
+            return
+
+        self._queue.put(None)
+        thread.join()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="bigquery-write-behind", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            stop = first is None
+            batch = [] if first is None else [first]
+            deadline = time.monotonic() + self._flush_interval
+
+            while not stop and len(batch) < self._max_batch_rows:
+                timeout = deadline - time.monotonic()
+
+                if timeout <= 0:
+                    break
+
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            # Whatever was still buffered when close() was called.
+            while stop:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if item is not None:
+                    batch.append(item)
+                else:
+                    self._queue.task_done()
+
+            self._write(batch)
+
+            for _ in range(len(batch) + 1 if stop else len(batch)):
+                self._queue.task_done()
+
+            if stop:
+                return
+
+    def _write(self, batch: list[tuple[str, str]]) -> None:
+        rows_by_table = dict[str, list[str]]()
+
+        for table_ref, row in batch:
+            rows_by_table.setdefault(table_ref, []).append(row)
+
+        for table_ref, rows in rows_by_table.items():
+            self._load(table_ref, "".join(f"{row}\n" for row in rows).encode(), len(rows))
+
+    def _load(self, table_ref: str, data: bytes, row_count: int) -> None:
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        )
+
+        for attempt in range(self._max_retries + 1):
+            try:
+                with get_telemetry().span("bigquery.load", table=table_ref, rows=row_count):
+                    load_job = self.client.load_table_from_file(
+                        io.BytesIO(data), table_ref, job_config=job_config
+                    )
+                    _ = load_job.result()
+                return
+            except Exception as error:
+                if attempt == self._max_retries:
+                    logger.error("Dropping %d rows for %s: %r", row_count, table_ref, error)
+                    return
+
+                logger.warning("Load of %d rows for %s failed: %r", row_count, table_ref, error)
+
+                self._sleep(self._backoff * 2**attempt)
@@ -0,0 +1,293 @@
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import secrets
+import threading
+import time
+from typing import Any, Literal, final
+
+type AttributeValue = str | int | float | bool
+type Status = Literal["ok", "error"]
+
+SERVICE_NAME = "ithaka"
+
+# Upper bounds, in seconds, of the histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_span = ContextVar["Span | None"]("current_span", default=None)
+
+
+@dataclass
+class Span:
+    """A timed operation, with the fields of an OpenTelemetry span."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start_ns: int
+    end_ns: int = 0
+    status: Status = "ok"
+    attributes: dict[str, AttributeValue] = field(default_factory=dict)
+
+    @property
+    def seconds(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def to_otlp(self) -> dict[str, Any]:
+        """The span as OTLP/JSON, what an OpenTelemetry collector receives."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 1 if self.status == "ok" else 2},
+        }
+
+
+@dataclass
+class Histogram:
+    counts: list[int] = field(default_factory=lambda: [0] * len(BUCKETS))
+    total: float = 0.0
+    count: int = 0
+    errors: int = 0
+
+    def observe(self, seconds: float) -> None:
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[index] += 1
+
+        self.total += seconds
+        self.count += 1
+
+
+@final
+class Telemetry:
+    """
+    Records spans in process and aggregates their durations by name, so they
+    can be exported without an OpenTelemetry collector.
+
+    The last `max_spans` spans are kept, to be exported as OTLP/JSON; the
+    durations of every span are kept as Prometheus histograms. Counters are
+    kept for totals that are not durations, like bytes scanned, and gauges
+    for current values, like the connections in use, read when exported.
+    """
+
+    def __init__(self, *, max_spans: int = 2048) -> None:
+        self._lock = threading.Lock()
+        self._spans = deque[Span](maxlen=max_spans)
+        self._histograms = dict[str, Histogram]()
+        self._counters = dict[str, float]()
+        self._gauges = dict[str, Callable[[], float]]()
+
+    @contextmanager
+    def span(self, name: str, **attributes: AttributeValue) -> Iterator[Span]:
+        """
+        Time the block as a span named :name:, a child of the span the block
+        runs in (if any). It is marked as failed if the block raises.
+        """
+        parent = _current_span.get()
+        span = _child(parent, name, time.time_ns(), attributes)
+        token = _current_span.set(span)
+
+        try:
+            yield span
+        except Exception:
+            span.status = "error"
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Async generators may be resumed in another context than
+                # the one they started in.
+                _ = _current_span.set(parent)
+
+            self.record(span)
+
+    def record(self, span: Span) -> None:
+        """Keep a finished :span:."""
+        with self._lock:
+            self._spans.append(span)
+            histogram = self._histograms.setdefault(span.name, Histogram())
+            histogram.observe(span.seconds)
+
+            if span.status == "error":
+                histogram.errors += 1
+
+    def record_since(self, name: str, start_ns: int, **attributes: AttributeValue) -> Span:
+        """
+        Keep a span named :name: from :start_ns: until now, for durations
+        that do not fit in a block, like the time to the first token.
+        """
+        span = _child(_current_span.get(), name, start_ns, attributes)
+        span.end_ns = time.time_ns()
+        self.record(span)
+        return span
+
+    def increment(self, counter: str, amount: float = 1) -> None:
+        """Add :amount: to :counter:, exported as `ithaka_<counter>_total`."""
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    def counter(self, counter: str) -> float:
+        with self._lock:
+            return self._counters.get(counter, 0)
+
+    def gauge(self, gauge: str, read: Callable[[], float]) -> None:
+        """
+        Export what :read: returns as `ithaka_<gauge>`, replacing the gauge of
+        that name if any. It is called on every export, so it must be quick.
+        """
+        with self._lock:
+            self._gauges[gauge] = read
+
+    def spans(self) -> list[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def to_otlp(self) -> dict[str, Any]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [span.to_otlp() for span in self.spans()],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def to_prometheus(self) -> str:
+        """The durations in the Prometheus text exposition format."""
+        metric = f"{SERVICE_NAME}_span_duration_seconds"
+        errors = f"{SERVICE_NAME}_span_errors_total"
+        lines = [
+            f"# HELP {metric} Duration of the spans, by name.",
+            f"# TYPE {metric} histogram",
+        ]
+
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+
+            for name, histogram in histograms:
+                label = f'span="{name}"'
+
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {count}')
+
+                lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum{{{label}}} {histogram.total}")
+                lines.append(f"{metric}_count{{{label}}} {histogram.count}")
+
+            lines.append(f"# HELP {errors} Spans that raised, by name.")
+            lines.append(f"# TYPE {errors} counter")
+
+            for name, histogram in histograms:
+                lines.append(f'{errors}{{span="{name}"}} {histogram.errors}')
+
+            for counter, value in sorted(self._counters.items()):
+                lines.append(f"# TYPE {SERVICE_NAME}_{counter}_total counter")
+                lines.append(f"{SERVICE_NAME}_{counter}_total {value}")
+
+            gauges = sorted(self._gauges.items())
+
+        for gauge, read in gauges:
+            try:
+                value = read()
+            except Exception:
+                logging.getLogger(__name__).exception("Could not read gauge %s", gauge)
+                continue
+
+            lines.append(f"# TYPE {SERVICE_NAME}_{gauge} gauge")
+            lines.append(f"{SERVICE_NAME}_{gauge} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _child(
+    parent: Span | None, name: str, start_ns: int, attributes: dict[str, AttributeValue]
+) -> Span:
+    return Span(
+        name=name,
+        trace_id=parent.trace_id if parent is not None else secrets.token_hex(16),
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id if parent is not None else None,
+        start_ns=start_ns,
+        attributes=dict(attributes),
+    )
+
+
+def _otlp_attribute(key: str, value: AttributeValue) -> dict[str, Any]:
+    match value:
+        case bool():
+            typed = {"boolValue": value}
+        case int():
+            typed = {"intValue": str(value)}
+        case float():
+            typed = {"doubleValue": value}
+        case str():
+            typed = {"stringValue": value}
+
+    return {"key": key, "value": typed}
+
+
+@cache
+def get_telemetry() -> Telemetry:
+    return Telemetry()
+
+
+def serve_metrics(telemetry: Telemetry, host: str, port: int) -> ThreadingHTTPServer:
+    """
+    Serve :telemetry: on a background thread: the histograms on `/metrics`,
+    for Prometheus, and the latest spans on `/spans`, as OTLP/JSON.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            match self.path:
+                case "/metrics":
+                    body = telemetry.to_prometheus().encode()
+                    content_type = "text/plain; version=0.0.4"
+                case "/spans":
+                    body = json.dumps(telemetry.to_otlp()).encode()
+                    content_type = "application/json"
+                case _:
+                    self.send_error(404)
+                    return
+
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            _ = self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logging.getLogger(__name__).debug(format, *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+def setup_logging(level: str) -> None:
+    """Log to stderr from :level: up (e.g. `INFO`), unless logging is set up already."""
+    logging.basicConfig(
+        level=level.upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
@@ -1,53 +1,162 @@
+# The chat stack (pydantic_ai, the Google clients and the toolsets) takes
+# seconds to import, so it is only imported once the UI needs it.
+from __future__ import annotations
+import asyncio
 from collections.abc import AsyncIterable
 import mimetypes
 from pathlib import Path
-from typing import assert_never
+from typing import TYPE_CHECKING, assert_never
+from uuid import NAMESPACE_URL, uuid4, uuid5
 
+import gradio
 from gradio import Component
-from pydantic_ai import BinaryContent
-from pydantic_ai.messages import UserPromptPart
-from chat.factory import BotFactory
+from env import Environment, env
 from ui.details import render_quotes
 from ui.types import OutputDir, Renderable, UserInput
 from ui.file_renderer import render_binary
+from ui.sessions import SessionPool
 
+if TYPE_CHECKING:
+    from pydantic_ai.messages import FileUrl
+
+    from chat.bot import Bot
+    from chat.factory import BotFactory
+    from chat.types import Answer
 
-def handle_file(file_path: Path) -> BinaryContent | None:
-    path = Path(file_path)
 
-    file_data = path.read_bytes()
+def handle_file(file_path: Path) -> FileUrl | None:
+    """
+    Copy an upload to the blob store, in chunks, and get a reference to it
+    for the prompt.
+    """
+    from chat.blobs import BlobTooLargeError, get_blob_store
+
+    path = Path(file_path)
 
     mimetype, _ = mimetypes.guess_type(path)
 
     if mimetype is None:
         return None
 
-    return BinaryContent(data=file_data, media_type=mimetype)
+    environment = env()
+    blobs = get_blob_store(environment.blob_dir, environment.upload_max_bytes)
+
+    try:
+        return blobs.put(path, mimetype)
+    except BlobTooLargeError as error:
+        raise gradio.Error(str(error)) from error
+
+
+# Replaceable, e.g. by benchmarks that run against fake clients. Made by
+# `get_factory` when first needed.
+factory: BotFactory | None = None
+
 
+def get_factory() -> BotFactory:
+    """The factory of the bots, importing the chat stack the first time."""
+    global factory
 
-def get_bot():
-    return BotFactory().default()
+    if factory is None:
+        from chat.factory import BotFactory
+
+        factory = BotFactory()
+
+    return factory
+
+
+def warm_up() -> None:
+    """Import the chat stack and create its clients, ahead of the first message."""
+    from chat.clients import warm_up
+
+    _ = get_factory()
+    warm_up(env())
+
+
+def close() -> None:
+    """Close the clients of the chat stack, if it was imported."""
+    if factory is None:
+        return
 
+    from chat.clients import close_clients
 
-async def ui_to_chat(message: UserInput) -> AsyncIterable[Renderable]:
-    files = [handle_file(Path(file)) for file in message["files"]]
+    close_clients()
+
+
+async def get_bot() -> Bot:
+    """
+    The bot of the configured conversation. Every session chatting in it
+    shares this one, so they all send the model the same history.
+    """
+    return await conversations.get(env().conversation_id)
+
+
+async def get_session_bot(session_id: str) -> Bot:
+    environment = env()
+
+    match environment.serve:
+        case "single":
+            return await get_bot()
+        case "multi":
+            return await get_factory().from_env(session_env(environment, session_id))
+        case _:
+            assert_never(environment.serve)
+
+
+def session_env(environment: Environment, session_id: str) -> Environment:
+    """
+    The environment of a UI session when serving many users: the user id is
+    derived from the session, and the conversation is a new one.
+    """
+    return environment.model_copy(
+        update={
+            "user_id": str(uuid5(NAMESPACE_URL, f"session:{session_id}")),
+            "conversation_id": str(uuid4()),
+        }
+    )
+
+
+sessions = SessionPool(get_session_bot)
+# One bot per conversation when sessions share it, i.e. in "single" mode.
+conversations = SessionPool(lambda _conversation_id: get_factory().default())
+
+
+async def ui_to_chat(
+    message: UserInput, session_id: str | None = None
+) -> AsyncIterable[Renderable]:
+    files = [await asyncio.to_thread(handle_file, Path(file)) for file in message["files"]]
     files = [file for file in files if file]
 
+    from pydantic_ai.messages import UserPromptPart
+
     user_prompt = UserPromptPart(files + [message["text"]])
 
-    response = get_bot().answer(user_prompt)
+    bot = await get_bot() if session_id is None else await sessions.get(session_id)
 
+    async for renderable in render_answers(bot.answer(user_prompt)):
+        yield renderable
+
+
+async def render_answers(answers: AsyncIterable[Answer]) -> AsyncIterable[Renderable]:
+    """
+    Turn the answers of `Bot.answer` into what Gradio displays. Gradio wants
+    the whole message on every update, so text deltas are put back together
+    here.
+    """
     chunk = None
     content = None
+    text = list[str]()
 
-    async for chunk in response:
+    async for chunk in answers:
         content = chunk.content
         match content.kind:
             case "text":
                 content = content.text
+            case "delta":
+                if content.text:
+                    text.append(content.text)
+
+                content = "".join(text)
             case "binary":
-                # Untested, also, horribly, terribly inefficient. Shameful.
-                # Disgraceful.
                 content = assistant(render_binary(content))
             case _:
                 assert_never(content.kind)
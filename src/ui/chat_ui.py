@@ -1,19 +1,44 @@
 from collections.abc import AsyncGenerator
 import gradio
 
-from ui.bridge import ui_to_chat
+from env import env
+from telemetry import get_telemetry, serve_metrics, setup_logging
+from ui import bridge
+from ui.bridge import sessions, ui_to_chat
+from ui.media_cache import get_media_cache
 from ui.types import Renderable, UserInput
 
 
-async def resolve(message: UserInput, _history: list[str]) -> AsyncGenerator[Renderable]:
-    async for chunk in ui_to_chat(message):
+async def resolve(
+    message: UserInput, _history: list[str], request: gradio.Request
+) -> AsyncGenerator[Renderable]:
+    async for chunk in ui_to_chat(message, request.session_hash):
         yield chunk
 
 
-def main():
+def close_session(request: gradio.Request) -> None:
+    if request.session_hash is not None:
+        sessions.drop(request.session_hash)
+
+
+def main(
+    *,
+    server_name: str | None = None,
+    server_port: int | None = None,
+    metrics_port: int | None = None,
+):
     """
-    Sets up and launches the Gradio Chat Interface.
+    Sets up and launches the Gradio Chat Interface, on the host and port of
+    the environment unless others are given. Timings are served on
+    :metrics_port:, or on the one of the environment.
     """
+    environment = env()
+    setup_logging(environment.log_level)
+    metrics_port = metrics_port or environment.metrics_port
+
+    if metrics_port is not None:
+        _ = serve_metrics(get_telemetry(), server_name or environment.host, metrics_port)
+
     demo = gradio.ChatInterface(
         fn=resolve,
         multimodal=True,
@@ -23,8 +48,28 @@ def main():
         flagging_options=["Like", "Spam", "Inappropriate", "Other"],
         textbox=gradio.MultimodalTextbox(sources=["microphone", "upload"]),
     )
+    demo.unload(close_session)
+    _ = demo.queue(
+        default_concurrency_limit=environment.concurrency_limit,
+        max_size=environment.max_queue,
+    )
+
+    _ = demo.launch(
+        server_name=server_name or environment.host,
+        server_port=server_port or environment.port,
+        # Binary answers are served from the media cache.
+        allowed_paths=[str(get_media_cache().root)],
+        prevent_thread_lock=True,
+    )
+    # Once the server is up, so it does not wait for it, but likely before
+    # the first message does.
+    with get_telemetry().span("ui.warm_up"):
+        bridge.warm_up()
 
-    _ = demo.launch()
+    try:
+        demo.block_thread()
+    finally:
+        bridge.close()
 
 
 if __name__ == "__main__":
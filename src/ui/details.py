@@ -1,10 +1,14 @@
+from __future__ import annotations
 from collections.abc import Sequence
-from typing import assert_never
+from functools import lru_cache
+from typing import TYPE_CHECKING, assert_never
 import gradio
 
-from chat.types import Citation, Link, Quote
 from html import escape
 
+if TYPE_CHECKING:
+    from chat.types import Citation, Link, Quote
+
 
 HTML = str
 
@@ -35,11 +39,14 @@ def render_link(link: Link) -> HTML:
 
 
 
+# Quotes are immutable, so the HTML of those retrieved again is reused.
+@lru_cache(maxsize=1024)
 def render_quote(quote: Quote) -> HTML:
-    match quote:
-        case Link():
+    # By tag, so the chat types are not imported before they are used.
+    match quote.tag:
+        case "link":
             return render_link(quote)
-        case Citation():
+        case "citation":
             return render_citation(quote)
 
     assert_never(quote)
@@ -1,29 +1,27 @@
-import base64
+from __future__ import annotations
+from typing import TYPE_CHECKING
 import gradio as gr
 
-from pydantic_ai import BinaryContent
+from ui.media_cache import get_media_cache
 
-def to_data_uri(data: bytes, media_type: str) -> str:
-    """Encodes binary data into a Base64 data URI."""
-    base64_data = base64.b64encode(data).decode('utf-8')
-    return f"data:{media_type};base64,{base64_data}"
+if TYPE_CHECKING:
+    from pydantic_ai import BinaryContent
+
+def to_path(content: BinaryContent) -> str:
+    """Writes binary content to the media cache, so Gradio can serve it as a file."""
+    return str(get_media_cache().put(content.data, content.media_type))
 
 def render_video(content: BinaryContent) -> gr.Video:
-    data_uri = to_data_uri(content.data, content.media_type)
-    return gr.Video(value=data_uri)
+    return gr.Video(value=to_path(content))
 
 def render_audio(content: BinaryContent) -> gr.Audio:
-    data_uri = to_data_uri(content.data, content.media_type)
-    return gr.Audio(value=data_uri)
+    return gr.Audio(value=to_path(content))
 
 def render_image(content: BinaryContent) -> gr.Image:
-    data_uri = to_data_uri(content.data, content.media_type)
-    return gr.Image(value=data_uri, show_label=False)
+    return gr.Image(value=to_path(content), show_label=False)
 
 def render_file(content: BinaryContent) -> gr.File:
-    data_uri = to_data_uri(content.data, content.media_type)
-
-    return gr.File(value=data_uri)
+    return gr.File(value=to_path(content))
 
 def render_binary(content: BinaryContent) -> gr.Component:
     if content.is_video:
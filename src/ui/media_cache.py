@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from functools import cache
+import hashlib
+import mimetypes
+import os
+from pathlib import Path
+import tempfile
+import threading
+from typing import final
+
+DEFAULT_DIR = Path(tempfile.gettempdir()) / "ithaka-media"
+
+
+@final
+class MediaCache:
+    """
+    Directory of the binary answers handed to Gradio, so they are passed as
+    file paths Gradio can serve instead of inlined as data URIs.
+
+    Files are named by the SHA-256 of their bytes, so an answer repeated is
+    written once. When the files take more than `max_bytes`, the least
+    recently used are deleted.
+    """
+
+    def __init__(self, root: Path = DEFAULT_DIR, *, max_bytes: int = 512 * 1024 * 1024) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes = OrderedDict[Path, int]()
+        self._total = 0
+
+        root.mkdir(parents=True, exist_ok=True)
+
+        # Pick up what previous runs left, oldest first.
+        for path in sorted(root.iterdir(), key=lambda path: path.stat().st_mtime):
+            if path.is_file():
+                self._sizes[path] = path.stat().st_size
+                self._total += self._sizes[path]
+
+    def put(self, data: bytes, media_type: str) -> Path:
+        """Write :data: unless it is already cached, and get its path."""
+        # Gradio picks how to play a file from its extension.
+        subtype = media_type.split("/")[-1]
+        extension = mimetypes.guess_extension(media_type) or (
+            f".{subtype}" if subtype.isalnum() else ""
+        )
+        path = self.root / f"{hashlib.sha256(data).hexdigest()}{extension}"
+
+        with self._lock:
+            if path in self._sizes and path.exists():
+                self._sizes.move_to_end(path)
+                os.utime(path)
+                return path
+
+            with tempfile.NamedTemporaryFile(dir=self.root, delete=False) as temporary:
+                _ = temporary.write(data)
+
+            _ = Path(temporary.name).replace(path)
+
+            self._total += len(data) - self._sizes.pop(path, 0)
+            self._sizes[path] = len(data)
+            self._evict()
+
+        return path
+
+    def _evict(self) -> None:
+        # The newest file is kept even if it alone is over the limit.
+        while self._total > self.max_bytes and len(self._sizes) > 1:
+            path, size = self._sizes.popitem(last=False)
+            path.unlink(missing_ok=True)
+            self._total -= size
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+
+@cache
+def get_media_cache() -> MediaCache:
+    return MediaCache()
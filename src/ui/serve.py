@@ -0,0 +1,194 @@
+import asyncio
+import multiprocessing
+import signal
+import sys
+from typing import assert_never, final
+import zlib
+
+from env import env
+from telemetry import setup_logging
+from ui import chat_ui
+
+type Address = tuple[str, int]
+
+BUFFER_SIZE = 64 * 1024
+# Names the worker a browser is kept on, as its index.
+AFFINITY_COOKIE = "gradio_worker"
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while data := await reader.read(BUFFER_SIZE):
+            writer.write(data)
+            await writer.drain()
+
+        if writer.can_write_eof():
+            writer.write_eof()
+    except (ConnectionError, OSError):
+        writer.close()
+
+
+async def _read_head(reader: asyncio.StreamReader) -> bytes | None:
+    """The start line and headers of the next HTTP message, if there is one."""
+    try:
+        return await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        return None
+
+
+def _headers(head: bytes, name: str) -> list[str]:
+    lines = head.decode("latin-1").split("\r\n")[1:]
+    return [
+        value.strip()
+        for key, _, value in (line.partition(":") for line in lines)
+        if key.strip().lower() == name
+    ]
+
+
+@final
+class AffinityProxy:
+    """
+    Forwards HTTP connections to one of several Gradio workers, always the
+    same one for a given browser.
+
+    Gradio keeps the queue and the state of a session in the process that
+    serves it, so every request of a session must reach the same worker. The
+    worker is the one named by the `AFFINITY_COOKIE` of the first request of
+    a connection. Without it, one is picked from the client address (the
+    first of `X-Forwarded-For`, if given) and the cookie is set on the
+    response, so the browser keeps reaching it even if its address changes.
+    Past that first request the connections are piped as they are, so
+    server-sent events and websockets go through untouched.
+
+    A reverse proxy in front of this one must pass the cookie on and must not
+    reuse a connection to it for several clients: they would all be taken to
+    the worker of the first one.
+    """
+
+    def __init__(self, backends: list[Address]) -> None:
+        self.backends = backends
+
+    def backend(self, head: bytes, client_host: str) -> tuple[int, bool]:
+        """
+        The index of the worker for the request with :head:, from :client_host:,
+        and whether the cookie naming it has to be set.
+        """
+        for cookies in _headers(head, "cookie"):
+            for cookie in cookies.split(";"):
+                name, _, value = cookie.strip().partition("=")
+
+                if name == AFFINITY_COOKIE and value.isdigit() and int(value) < len(self.backends):
+                    return int(value), False
+
+        forwarded = _headers(head, "x-forwarded-for")
+        host = forwarded[0].split(",")[0].strip() if forwarded else client_host
+        return zlib.crc32(host.encode()) % len(self.backends), True
+
+    async def handle(
+        self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter
+    ) -> None:
+        head = await _read_head(client_reader)
+
+        if head is None:
+            client_writer.close()
+            return
+
+        peer = client_writer.get_extra_info("peername")
+        index, set_cookie = self.backend(head, peer[0] if peer else "")
+        host, port = self.backends[index]
+
+        try:
+            backend_reader, backend_writer = await asyncio.open_connection(host, port)
+        except OSError:
+            client_writer.close()
+            return
+
+        try:
+            backend_writer.write(head)
+            _ = await asyncio.gather(
+                _pipe(client_reader, backend_writer),
+                self._respond(backend_reader, client_writer, index if set_cookie else None),
+            )
+        finally:
+            backend_writer.close()
+            client_writer.close()
+
+    async def _respond(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, index: int | None
+    ) -> None:
+        """Pipe the responses, setting the cookie to :index: on the first, if given."""
+        if index is not None:
+            head = await _read_head(reader)
+
+            if head is None:
+                writer.close()
+                return
+
+            status, _, headers = head.partition(b"\r\n")
+            cookie = f"Set-Cookie: {AFFINITY_COOKIE}={index}; Path=/; HttpOnly; SameSite=Lax"
+            writer.write(b"\r\n".join([status, cookie.encode(), headers]))
+
+        await _pipe(reader, writer)
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle, host, port)
+
+        async with server:
+            await server.serve_forever()
+
+
+def _run_worker(host: str, port: int, metrics_port: int | None) -> None:
+    chat_ui.main(server_name=host, server_port=port, metrics_port=metrics_port)
+
+
+def serve_workers(workers: int, host: str, port: int, metrics_port: int | None = None) -> None:
+    """
+    Run :workers: UI processes on the ports after :port:, behind a proxy
+    listening on :port:. Each worker serves its timings on its own port from
+    :metrics_port: on, if given.
+    """
+    backends = [("127.0.0.1", port + 1 + index) for index in range(workers)]
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=_run_worker,
+            args=(*backend, metrics_port + index if metrics_port is not None else None),
+            daemon=True,
+        )
+        for index, backend in enumerate(backends)
+    ]
+
+    for process in processes:
+        process.start()
+
+    # Stop the workers too when the proxy is terminated.
+    _ = signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    try:
+        asyncio.run(AffinityProxy(backends).serve(host, port))
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+def main() -> None:
+    environment = env()
+    setup_logging(environment.log_level)
+
+    match environment.serve:
+        case "single":
+            # Every session shares one conversation, which several processes
+            # cannot safely append to.
+            chat_ui.main()
+        case "multi":
+            if environment.workers > 1:
+                serve_workers(
+                    environment.workers,
+                    environment.host,
+                    environment.port,
+                    environment.metrics_port,
+                )
+            else:
+                chat_ui.main()
+        case _:
+            assert_never(environment.serve)
@@ -0,0 +1,92 @@
+from __future__ import annotations
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+import time
+from typing import TYPE_CHECKING, final
+
+if TYPE_CHECKING:
+    from chat.bot import Bot
+
+
+@dataclass
+class _Session:
+    # A task, so concurrent messages of a new session share one hydration.
+    bot: asyncio.Task[Bot]
+    last_used: float
+
+
+@final
+class SessionPool:
+    """
+    Keeps one warm `Bot` per UI session, so the user and the conversation are
+    hydrated once per session instead of once per message.
+
+    Sessions are kept in least recently used order. Those idle for longer than
+    `idle_timeout` seconds are dropped, and when there are more than
+    `max_sessions` the least recently used ones are dropped too.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], Awaitable[Bot]],
+        *,
+        max_sessions: int = 256,
+        idle_timeout: float = 30 * 60,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._factory = factory
+        self._max_sessions = max_sessions
+        self._idle_timeout = idle_timeout
+        self._clock = clock
+        self._sessions = OrderedDict[str, _Session]()
+
+    async def get(self, session_id: str) -> Bot:
+        """
+        Get the bot for :session_id:, creating it if the session is new or
+        was evicted.
+        """
+        now = self._clock()
+        self._evict_idle(now)
+
+        session = self._sessions.get(session_id)
+
+        if session is None:
+            bot = asyncio.ensure_future(self._factory(session_id))
+            session = self._sessions[session_id] = _Session(bot=bot, last_used=now)
+
+            while len(self._sessions) > self._max_sessions:
+                _ = self._sessions.popitem(last=False)
+        else:
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+
+        try:
+            # Shielded, so a cancelled message does not cancel the hydration
+            # other messages of the session may be waiting on.
+            return await asyncio.shield(session.bot)
+        except Exception:
+            # Do not keep a failed hydration around; the next message retries.
+            if self._sessions.get(session_id) is session:
+                del self._sessions[session_id]
+            raise
+
+    def drop(self, session_id: str) -> None:
+        _ = self._sessions.pop(session_id, None)
+
+    def _evict_idle(self, now: float) -> None:
+        # Sessions are ordered by last use, so the idle ones are at the front.
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+
+            if now - session.last_used < self._idle_timeout:
+                return
+
+            del self._sessions[session_id]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
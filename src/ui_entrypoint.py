@@ -1,8 +1,8 @@
-from ui import chat_ui
+from ui import serve
 
 
 def main():
-    chat_ui.main()
+    serve.main()
 
 
 if __name__ == "__main__":
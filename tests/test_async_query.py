@@ -0,0 +1,68 @@
+"""
+`AsyncQueryRunner` against a fake client whose every call takes a while:
+slow queries must not stall the event loop, and must time out.
+
+    uv run python -m unittest discover tests
+"""
+
+import asyncio
+import sys
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fakes.bigquery import FakeBigQueryClient  # noqa: E402
+from repository.async_query import AsyncQueryRunner  # noqa: E402
+
+TICK = 0.01
+
+
+async def tick_until(done: asyncio.Event) -> tuple[int, float]:
+    """Sleep `TICK` at a time until :done:, like a token stream."""
+    ticks = 0
+    longest = 0.0
+    last = time.perf_counter()
+
+    while not done.is_set():
+        await asyncio.sleep(TICK)
+        now = time.perf_counter()
+        longest = max(longest, now - last)
+        last = now
+        ticks += 1
+
+    return ticks, longest
+
+
+class AsyncQueryRunnerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_queries_do_not_block_the_loop(self) -> None:
+        client = FakeBigQueryClient(latency=0.3)
+        runner = AsyncQueryRunner(max_concurrency=4, timeout=5)
+        self.addCleanup(runner.close)
+        done = asyncio.Event()
+        ticker = asyncio.create_task(tick_until(done))
+
+        rows = await asyncio.gather(*(runner.query(client, "SELECT 1 AS one") for _ in range(4)))
+        done.set()
+        ticks, longest = await ticker
+
+        self.assertEqual([[row.one for row in result] for result in rows], [[1]] * 4)
+        # Blocking the loop would leave a single pause of the whole 0.3 s.
+        self.assertGreater(ticks, 10)
+        self.assertLess(longest, 0.15)
+
+    async def test_timeout(self) -> None:
+        client = FakeBigQueryClient(latency=1.0)
+        runner = AsyncQueryRunner(timeout=5)
+        self.addCleanup(runner.close)
+        start = time.perf_counter()
+
+        with self.assertRaises(TimeoutError):
+            _ = await runner.query(client, "SELECT 1", timeout=0.1)
+
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
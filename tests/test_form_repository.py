@@ -0,0 +1,69 @@
+"""
+`FormRepository` against the fake BigQuery client, on a `forms` table from
+before `updated_at` existed: the forms saved then must still be read.
+
+    uv run python -m unittest discover tests
+"""
+
+import io
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fakes.bigquery import FakeBigQueryClient  # noqa: E402
+from repository.form import FormModel, FormRepository  # noqa: E402
+
+
+def form(form_id: str) -> FormModel:
+    return FormModel(
+        form_id=form_id,
+        name="Evaluador",
+        idea=f"Idea {form_id}",
+        sponsor="Sponsor",
+        ucu_community_members=("Alumno/a", None),
+        stage=("Ideación", None),
+        profile_type=["Impacto Social"],
+        potential_support=["Valida Lab UCU"],
+        follow_up_personnel=("No", None),
+        internal_comments="Comentarios.",
+        message_for_applicant="Gracias por postularte.",
+    )
+
+
+class LegacyFormTest(unittest.TestCase):
+    def setUp(self) -> None:
+        columns = [name for name in FormModel.model_fields if name != "updated_at"]
+        self.client = FakeBigQueryClient({"p.d.forms": columns})
+        legacy = form("legacy").model_dump_json(exclude={"updated_at"})
+        _ = self.client.load_table_from_file(io.BytesIO(f"{legacy}\n".encode()), "p.d.forms")
+        self.repository = FormRepository(self.client, "p", "d")
+        self.repository.save(form("new"))
+
+    def test_read_by_id(self) -> None:
+        legacy = self.repository.read_by_id("legacy")
+
+        assert legacy is not None
+        self.assertIsNone(legacy.updated_at)
+
+    def test_list_by_name(self) -> None:
+        first = self.repository.list_by_name("Evaluador", page_size=1)
+        second = self.repository.list_by_name(
+            "Evaluador", page_size=1, page_token=first.next_page_token
+        )
+
+        self.assertEqual([saved.form_id for saved in first.forms], ["new"])
+        self.assertEqual([saved.form_id for saved in second.forms], ["legacy"])
+        self.assertIsNone(second.next_page_token)
+
+    def test_find_and_scan(self) -> None:
+        found = self.repository.find("sponsor", "Sponsor")
+        scanned = list(self.repository.scan())
+
+        self.assertEqual({saved.form_id for saved in found}, {"legacy", "new"})
+        self.assertEqual({saved.form_id for saved in scanned}, {"legacy", "new"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Resuming a conversation against the fake BigQuery and Gemini clients: only
+what the history strategy may send is loaded, and the model must still get
+the system prompt when the start of the conversation is not.
+
+    uv run python -m unittest discover tests
+"""
+
+import sys
+import tempfile
+import unittest
+from collections.abc import AsyncIterator
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from pydantic_ai.messages import (  # noqa: E402
+    ModelMessage,
+    ModelRequest,
+    SystemPromptPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel  # noqa: E402
+
+from chat.clients import close_clients  # noqa: E402
+import chat.memory  # noqa: E402
+from chat.memory import LOG_TAIL_SIZE, close_logs  # noqa: E402
+from fakes.backend import FakeBackend  # noqa: E402
+
+WINDOW = 8
+
+
+class ResumeTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.system_prompts = list[int]()
+
+    def model(self) -> FunctionModel:
+        """A model that counts the system prompts it is sent."""
+
+        async def stream(messages: list[ModelMessage], _info: AgentInfo) -> AsyncIterator[str]:
+            self.system_prompts.append(
+                sum(
+                    isinstance(part, SystemPromptPart)
+                    for message in messages
+                    if isinstance(message, ModelRequest)
+                    for part in message.parts
+                )
+            )
+            yield "Hola."
+
+        return FunctionModel(stream_function=stream)
+
+    async def resume(self, backend: FakeBackend, turns: int, loaded: int) -> None:
+        """Chat :turns: turns, then resume with a new bot, which must load :loaded: messages."""
+        environment = backend.session_environment()
+
+        with backend.model(self.model()):
+            bot = await backend.bot(environment)
+
+            # Each turn stores the user message and the answer.
+            for turn in range(turns):
+                async for _ in bot.answer(UserPromptPart(f"Pregunta {turn}")):
+                    pass
+
+            self.restart()
+            bot = await backend.bot(environment)
+            self.assertEqual(len(bot.get_dependencies().conversation.messages), loaded)
+
+            async for _ in bot.answer(UserPromptPart("¿Seguís ahí?")):
+                pass
+
+        self.assertEqual(self.system_prompts[0], 1)
+        self.assertEqual(self.system_prompts[-1], 1)
+
+    def restart(self) -> None:
+        """Write what is buffered and forget what the process keeps."""
+        close_clients()
+        close_logs()
+
+    def backend(self, **variables: str) -> FakeBackend:
+        variables = {"HISTORY": "window", "HISTORY_MAX_MESSAGES": str(WINDOW), **variables}
+        return FakeBackend.create(self.directory, fragments=10, **variables)
+
+    async def test_bigquery(self) -> None:
+        await self.resume(self.backend(), WINDOW // 2 + 1, WINDOW)
+
+    async def test_local(self) -> None:
+        with mock.patch.object(chat.memory, "MEMORY_DIR", self.directory):
+            await self.resume(self.backend(MEMORY="local"), WINDOW // 2 + 1, WINDOW)
+
+    async def test_all(self) -> None:
+        # Past what a conversation log keeps in memory, too.
+        turns = LOG_TAIL_SIZE // 2 + 1
+
+        with mock.patch.object(chat.memory, "MEMORY_DIR", self.directory):
+            await self.resume(self.backend(MEMORY="local", HISTORY="all"), turns, 2 * turns)
+
+
+if __name__ == "__main__":
+    unittest.main()
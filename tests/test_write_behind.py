@@ -0,0 +1,54 @@
+"""
+`WriteBehindQueue` against a fake client whose loads hang: once the buffer
+is full, `enqueue` must drop rows instead of waiting for room.
+
+    uv run python -m unittest discover tests
+"""
+
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from pydantic import BaseModel  # noqa: E402
+
+from fakes.bigquery import FakeBigQueryClient  # noqa: E402
+from repository.write_behind import WriteBehindQueue  # noqa: E402
+
+
+class Row(BaseModel):
+    n: int
+
+
+class WriteBehindQueueTest(unittest.TestCase):
+    def test_full_buffer_does_not_block(self) -> None:
+        released = threading.Event()
+        # Every call waits until released (or a second), like a slow BigQuery.
+        client = FakeBigQueryClient(
+            {"p.d.rows": ["n"]}, latency=1, sleep=lambda _: released.wait(1)
+        )
+        writer = WriteBehindQueue(
+            client, flush_interval=0.01, max_batch_rows=1, max_buffered_rows=2
+        )
+        self.addCleanup(writer.close)
+        self.addCleanup(released.set)
+        start = time.perf_counter()
+
+        for n in range(10):
+            writer.enqueue("p.d.rows", Row(n=n))
+
+        self.assertLess(time.perf_counter() - start, 0.1)
+
+        released.set()
+        writer.flush()
+        [row] = client.query("SELECT COUNT(*) AS count FROM `p.d.rows`").result()
+
+        # The buffered rows and the one being loaded; the others were dropped.
+        self.assertIn(row.count, (2, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()